@@ -1,34 +1,20 @@
-import json
+import sys
 from datetime import datetime
 
-import pandas as pd
-
-
-def get_recovery_df():
-    with open("resources/BTCUSD_20231030.json", "r") as f:
-        p = json.load(f)
-    [i.update(i['o']) for i in p]  # format
-    df = pd.DataFrame(p)
-    df['t'] = df['t'].apply(lambda x: datetime.fromtimestamp(x))
-    rename_cols = {"t": "date", "o": "open", "h": "high", "l": "low", "c": "close"}
-    df = df.rename(columns=rename_cols)
-    df = df.set_index('date')
-    df = df.loc[(df.index >= datetime(2011, 9, 1))]  # where nans disappear
-    return df
-
+from src import settings
+from src.utils import price_ingestion
 
 if __name__ == '__main__':
+    # python cmd_create_btcusd_pickle.py [JSON_DUMP [CSV_DUMP [CHUNK_SIZE]]]
+    # streams the dumps into the price store, only candles newer than the stored ones are appended
+    json_path = sys.argv[1] if len(sys.argv) > 1 else "resources/BTCUSD_20231030.json"
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else "resources/crypto_price_202310282152.csv"
+    chunk_size = int(sys.argv[3]) if len(sys.argv) > 3 else price_ingestion.DEFAULT_CHUNK_SIZE
     print("Start")
-    df = pd.read_csv("resources/crypto_price_202310282152.csv")
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.set_index('date')
-    
-    rec_df = get_recovery_df()
-    rec_df = rec_df.tz_localize('Europe/Rome', ambiguous='infer').tz_convert(None) # To UTC and remove tz
-    
-    # fill prices
-    rec_df.loc[rec_df[rec_df['open'].isna()].index, :] = df.loc[rec_df[rec_df['open'].isna()].index, ['open', 'high', 'low', 'close']]
-    # r_diff = df['date'].diff().iloc[1:].apply(lambda x: x.value / (60 * 60 * 10**9))
-    rec_df = rec_df.reset_index()
-    pd.to_pickle(rec_df, "resources/BTCUSD_price.pickle")
-    print("Done")
+    counts = price_ingestion.ingest(
+        "BTCUSD",
+        price_ingestion.iter_json_chunks(json_path, chunk_size),
+        fill_chunks=price_ingestion.iter_csv_chunks(csv_path, chunk_size),  # fill prices
+        start_date=datetime(2011, 9, 1),  # where nans disappear
+    )
+    print(f"Done: {counts['appended']} candles appended, {counts['filled']} filled in {settings.PRICE_STORE_DIR}")
@@ -0,0 +1,28 @@
+import argparse
+import time
+from datetime import datetime
+
+from src.utils import synthetic_prices
+
+if __name__ == '__main__':
+    # python cmd_generate_prices.py PAIR BARS [--model gbm|jump_diffusion|regime_switching] [--step SEC] [--seed N]
+    parser = argparse.ArgumentParser(description="Write a synthetic OHLC series into the price store")
+    parser.add_argument('pair', help="stored series name, e.g. SYN-USD")
+    parser.add_argument('bars', type=int)
+    parser.add_argument('--model', choices=list(synthetic_prices.PRESETS), default="gbm")
+    parser.add_argument('--start', type=datetime.fromisoformat, default=datetime(2010, 1, 1))
+    parser.add_argument('--step', type=int, default=3600, help="seconds between bars")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--gap-probability', type=float, default=0.)
+    parser.add_argument('--gap-length', type=float, default=1.)
+    parser.add_argument('--nan-probability', type=float, default=0.)
+    parser.add_argument('--store-dir', help="settings.PRICE_STORE_DIR by default")
+    args = parser.parse_args()
+
+    market = synthetic_prices.SyntheticMarket(start=args.start, step=args.step, seed=args.seed,
+                                              gap_probability=args.gap_probability, gap_length=args.gap_length,
+                                              nan_probability=args.nan_probability,
+                                              **synthetic_prices.PRESETS[args.model])
+    start = time.perf_counter()
+    series = market.write(args.pair, args.bars, args.store_dir)
+    print(f"Done: {series} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,10 @@
+import sys
+
+from src import settings
+from src.utils import token_utils
+
+if __name__ == '__main__':
+    # python cmd_refresh_token_catalog.py [SYMBOL ...]
+    print("Start")
+    count = token_utils.refresh_token_catalog(sys.argv[1:])
+    print(f"Done: {count} tokens in {settings.TOKEN_CATALOG_FILE}")
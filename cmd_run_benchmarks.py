@@ -0,0 +1,36 @@
+import argparse
+import sys
+import tempfile
+
+from src import backtest_benchmark, settings
+
+if __name__ == '__main__':
+    # python cmd_run_benchmarks.py [--save] [--repeat N] [--scale X] [--tolerance T] [CASE ...]
+    parser = argparse.ArgumentParser(description="Engine throughput and memory benchmarks on synthetic prices")
+    parser.add_argument('cases', nargs='*', help="cases to run, all by default")
+    parser.add_argument('--baseline', default=settings.BENCHMARK_BASELINE_FILE)
+    parser.add_argument('--save', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--output', help="also write the results to this file")
+    parser.add_argument('--repeat', type=int, default=backtest_benchmark.DEFAULT_REPEAT)
+    parser.add_argument('--scale', type=float, default=1.)
+    parser.add_argument('--tolerance', type=float, default=backtest_benchmark.DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        cases = backtest_benchmark.get_cases(work_dir, args.scale)
+        results = backtest_benchmark.run_suite(cases, args.repeat, args.cases)
+
+    try:
+        baseline = backtest_benchmark.read_results(args.baseline)
+    except FileNotFoundError:
+        baseline = {}
+    report = backtest_benchmark.compare(results, baseline, args.tolerance)
+    print(report.to_string(float_format=lambda v: f"{v:,.3f}"))
+    if args.output:
+        backtest_benchmark.write_results(results, args.output, scale=args.scale)
+    if args.save:
+        backtest_benchmark.write_results(results, args.baseline, scale=args.scale)
+        print(f"Baseline saved to {args.baseline}")
+    elif report["regression"].any():
+        print(f"Regressions: {', '.join(report.index[report['regression']])}")
+        sys.exit(1)
@@ -0,0 +1,297 @@
+"""
+Reproducible throughput and memory benchmarks on synthetic prices, no network involved.
+Every case is timed `repeat` times (best and median kept), then run once more under tracemalloc for its peak.
+Results are written as JSON and compared with a baseline written by a previous run.
+"""
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List
+
+import pandas as pd
+
+from src.backtest_engine import StrategyTester
+from src.markets.mock_market import MockMarket
+from src.models.token import Pair, PairSpotPrice, TokenAmount
+from src.services import formula_service
+from src.strategies.base_strategy import DollarCostAveragingStrategy, HodlStrategy
+from src.utils import price_store, price_utils, token_utils
+from src.utils.synthetic_prices import SyntheticMarket
+
+START_DATE = datetime(2020, 1, 1)
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.2  # relative slowdown (or memory growth) flagged as a regression
+# bars (or operations) of every case at scale 1
+ENGINE_BARS = 24 * 90
+VALUATION_BARS = 24 * 90
+ARITHMETIC_OPERATIONS = 20_000
+INDICATOR_BARS = 24 * 365 * 2
+LOADING_BARS = 24 * 365 * 5
+GENERATION_BARS = 24 * 365 * 10
+
+
+def get_synthetic_ohlc(periods: int, start: datetime = START_DATE, seed: int = 0) -> pd.DataFrame:
+    """
+    Seeded hourly geometric brownian motion, same columns and index name as the tests price fixtures
+    """
+    return SyntheticMarket(start=start, seed=seed).generate(periods)
+
+
+def get_pair() -> Pair:
+    return Pair(token_utils.get_token_info("BTC"), token_utils.get_token_info("USD"))
+
+
+class BenchmarkCase:
+    """
+    `setup` prepares the inputs (not timed) and returns the timed function,
+    `units` is the work done by one call of it (bars, operations)
+    """
+    name: str
+    setup: Callable[[], Callable[[], None]]
+    units: int
+    unit: str
+    scale: float  # get_cases scale
+
+    def __init__(self, **params):
+        self.name = params['name']
+        self.setup = params['setup']
+        self.units = params['units']
+        self.unit = params.get('unit', "bars")
+        self.scale = params.get('scale', 1.)
+
+    def __repr__(self):
+        return f"BenchmarkCase[{self.name} {self.units} {self.unit}]"
+
+
+class BenchmarkResult:
+    name: str
+    unit: str
+    units: int
+    scale: float
+    repeat: int
+    best: float  # seconds
+    median: float
+    peak_bytes: int
+
+    def __init__(self, **params):
+        self.name = params['name']
+        self.unit = params['unit']
+        self.units = params['units']
+        self.scale = params.get('scale', 1.)
+        self.repeat = params['repeat']
+        self.best = params['best']
+        self.median = params['median']
+        self.peak_bytes = params['peak_bytes']
+
+    @property
+    def throughput(self) -> float:
+        # units per second of the best run
+        return self.units / self.best if self.best else float("inf")
+
+    def to_dict(self) -> dict:
+        return {"unit": self.unit, "units": self.units, "scale": self.scale, "repeat": self.repeat, "best": self.best,
+                "median": self.median, "throughput": self.throughput, "peak_bytes": self.peak_bytes}
+
+    @classmethod
+    def from_dict(cls, name: str, data: dict) -> "BenchmarkResult":
+        return cls(name=name, **{k: v for k, v in data.items() if k != "throughput"})
+
+
+def _engine_case(strategy_cls, bars: int) -> Callable[[], Callable[[], None]]:
+    def setup():
+        pair = get_pair()
+        df = get_synthetic_ohlc(bars + 24)
+        price_utils.PriceRegistry().register(pair, price_store.OhlcSeries.from_df(str(pair), df))
+        start = START_DATE + timedelta(hours=1)
+
+        def run():
+            tester = StrategyTester(strategy=strategy_cls(), pair=pair, start_test_date=start,
+                                    end_test_date=start + timedelta(hours=bars), show_progress=False)
+            tester.start_strategy_test()
+        return run
+    return setup
+
+
+def _token_amount_case(operations: int) -> Callable[[], Callable[[], None]]:
+    def setup():
+        pair = get_pair()
+        amounts = [TokenAmount(pair.base, Decimal(i + 1) / 1000) for i in range(operations)]
+        price = PairSpotPrice(pair=pair, price="8000.12")
+        fee = Decimal("0.0024")
+
+        def run():
+            total = TokenAmount(pair.base, 0)
+            for amount in amounts:
+                total = total + amount - amount * fee
+                total / 2
+                amount * price
+        return run
+    return setup
+
+
+def _valuation_case(bars: int) -> Callable[[], Callable[[], None]]:
+    def setup():
+        pair = get_pair()
+        df = get_synthetic_ohlc(bars)
+        price_utils.PriceRegistry().register(pair, price_store.OhlcSeries.from_df(str(pair), df))
+        dates = list(df.index.to_pydatetime())
+
+        def run():
+            market = MockMarket({"BTC": "0.1", "USD": "1000"})
+            balance = market.connector.get_account_balance(execution_date=dates[0])
+            for dt in dates:
+                market.get_account_balance_value(balance, dt)
+        return run
+    return setup
+
+
+def _indicators_case(bars: int) -> Callable[[], Callable[[], None]]:
+    def setup():
+        df = get_synthetic_ohlc(bars)
+
+        def run():
+            formula_service.get_ema(df["Close"])
+            formula_service.get_ma(df["Close"])
+            formula_service.get_rsi(df["Close"])
+            formula_service.get_stoch(df)
+            formula_service.get_atr(df)
+        return run
+    return setup
+
+
+def _price_loading_case(bars: int, work_dir: str) -> Callable[[], Callable[[], None]]:
+    def setup():
+        pair_name = "BENCH-USD"
+        df = get_synthetic_ohlc(bars).reset_index()
+        df.columns = ["date", "open", "high", "low", "close"]
+        price_store.write_series(pair_name, df, work_dir)
+        dates = pd.DatetimeIndex(df["date"])
+
+        def run():
+            series = price_store.read_series(pair_name, work_dir)
+            series.get_candles(dates)
+            series.to_df()
+        return run
+    return setup
+
+
+def _generation_case(bars: int, work_dir: str) -> Callable[[], Callable[[], None]]:
+    def setup():
+        market = SyntheticMarket(seed=0, gap_probability=1e-4, gap_length=12, nan_probability=1e-4)
+
+        def run():
+            market.write("SYNTHETIC-USD", bars, work_dir)
+        return run
+    return setup
+
+
+def get_cases(work_dir: str, scale: float = 1.) -> List[BenchmarkCase]:
+    """
+    The suite, `scale` multiplies the size of every case.
+    `work_dir` holds the price stores of the loading and generation cases.
+    """
+    def size(n: int) -> int:
+        return max(int(n * scale), 10)
+
+    cases = [
+        BenchmarkCase(name="engine_hodl", setup=_engine_case(HodlStrategy, size(ENGINE_BARS)),
+                      units=size(ENGINE_BARS)),
+        BenchmarkCase(name="engine_dca", setup=_engine_case(DollarCostAveragingStrategy, size(ENGINE_BARS)),
+                      units=size(ENGINE_BARS)),
+        BenchmarkCase(name="token_amount_arithmetic", setup=_token_amount_case(size(ARITHMETIC_OPERATIONS)),
+                      units=size(ARITHMETIC_OPERATIONS), unit="operations"),
+        BenchmarkCase(name="account_balance_value", setup=_valuation_case(size(VALUATION_BARS)),
+                      units=size(VALUATION_BARS)),
+        BenchmarkCase(name="formula_indicators", setup=_indicators_case(size(INDICATOR_BARS)),
+                      units=size(INDICATOR_BARS)),
+        BenchmarkCase(name="price_loading", setup=_price_loading_case(size(LOADING_BARS), work_dir),
+                      units=size(LOADING_BARS)),
+        BenchmarkCase(name="synthetic_prices", setup=_generation_case(size(GENERATION_BARS), work_dir),
+                      units=size(GENERATION_BARS)),
+    ]
+    for case in cases:
+        case.scale = scale
+    return cases
+
+
+def run_case(case: BenchmarkCase, repeat: int = DEFAULT_REPEAT) -> BenchmarkResult:
+    run = case.setup()
+    # warm up: lazy imports, resampling and feature caches are not what is measured
+    run()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return BenchmarkResult(name=case.name, unit=case.unit, units=case.units, scale=case.scale, repeat=repeat,
+                           best=min(timings), median=statistics.median(timings), peak_bytes=peak_bytes)
+
+
+def run_suite(cases: Iterable[BenchmarkCase], repeat: int = DEFAULT_REPEAT,
+              names: Iterable[str] = None) -> Dict[str, BenchmarkResult]:
+    names = set(names or [])
+    return {case.name: run_case(case, repeat) for case in cases if not names or case.name in names}
+
+
+def write_results(results: Dict[str, BenchmarkResult], path: str, **meta):
+    data = {
+        "created": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        **meta,
+        "results": {name: result.to_dict() for name, result in results.items()},
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as json_file:
+        json.dump(data, json_file, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_results(path: str) -> Dict[str, BenchmarkResult]:
+    with open(path) as json_file:
+        data = json.load(json_file)
+    # baselines written before results had a scale have it in the file meta only
+    return {name: BenchmarkResult.from_dict(name, {"scale": data.get("scale", 1.), **result})
+            for name, result in data["results"].items()}
+
+
+def compare(results: Dict[str, BenchmarkResult], baseline: Dict[str, BenchmarkResult],
+            tolerance: float = DEFAULT_TOLERANCE, memory_tolerance: float = None) -> pd.DataFrame:
+    """
+    One row per case: best time and peak memory against the baseline, `regression` if either grew
+    by more than its tolerance. Cases of a different size than their baseline are compared by throughput,
+    their peak memory is not compared (fixed costs do not scale with the case) and `note` says so.
+    """
+    memory_tolerance = tolerance if memory_tolerance is None else memory_tolerance
+    rows = []
+    for name, result in results.items():
+        row = {"case": name, "throughput": result.throughput, "unit": f"{result.unit}/s",
+               "best": result.best, "peak_bytes": result.peak_bytes}
+        base = baseline.get(name)
+        if base is not None:
+            row["baseline_throughput"] = base.throughput
+            row["time_ratio"] = base.throughput / result.throughput if result.throughput else float("inf")
+            if result.scale != base.scale or result.units != base.units:
+                row["memory_ratio"] = float("nan")
+                row["note"] = f"scale {result.scale:g} vs baseline {base.scale:g}, memory not compared"
+                memory_regression = False
+            else:
+                row["memory_ratio"] = result.peak_bytes / base.peak_bytes if base.peak_bytes else 1.
+                memory_regression = row["memory_ratio"] > 1 + memory_tolerance
+            row["regression"] = row["time_ratio"] > 1 + tolerance or memory_regression
+        else:
+            row["regression"] = False
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("case")
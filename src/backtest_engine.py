@@ -1,18 +1,23 @@
-import copy
-from datetime import datetime, timedelta
+from datetime import datetime
+import os
+import pickle
+import random
 import time
-from typing import List
+from typing import List, Union
 
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
 
+from src import settings
+from src.backtest_recorder import ResultRecorder
 from src.markets.mock_market import MockMarket
-from src.models.strategy import StrategyAction, StrategyTestResult
-from src.models.token import Pair
+from src.models.strategy import StrategyAction, StrategySignal, StrategyTestResult
+from src.models.token import Pair, Token
 from src.models.user import AccountBalance
 from src.services import formula_service
 from src.strategies.base_strategy import Strategy
-from src.utils import enums, timeseries_utils
+from src.utils import enums, profiling_utils, timeseries_utils
+from src.utils.exception_utils import NotEnoughMoneyException
 
 
 class TestResult:
@@ -39,7 +44,21 @@ class StrategyTester:
     strategy: Strategy
     pair: Pair
     market: MockMarket
-    results: List[TestResult]
+    show_progress: bool
+    results: ResultRecorder
+    # checkpoints: the whole tester is pickled every checkpoint_every bars and resumed with StrategyTester.resume
+    checkpoint_path: str
+    checkpoint_every: int
+    segment_bars: int  # bars run before returning (after a checkpoint), the whole test if None
+    cursor: int  # next bar to run
+    run_params: dict
+    random_state: tuple
+    # instrumentation, see profiling_utils
+    profile: bool
+    profile_cprofile: bool
+    profile_tracemalloc: bool
+    profile_report_path: str
+    profile_report: dict
 
     def __init__(self, **params):
         self.test_date_start = params.get('start_test_date', datetime(2018, 1, 1))
@@ -47,42 +66,198 @@ class StrategyTester:
         self.period = params.get('period', enums.TimeseriesPeriodEnum.ONE_HOURS)
         self.strategy = params['strategy']
         self.pair = params['pair']
-        self.market = MockMarket(params.get('initial_balance'))
-        self.results = []
-
-    def start_strategy_test(self, **params) -> List[TestResult]:
-        end_date = timeseries_utils.get_previous_period_end(self.test_date_end, self.period)
-        date_range = timeseries_utils.get_period_range(self.test_date_start, end_date, self.period)
-        
-        with tqdm(total=100, miniters=1) as pbar:
-            for execution_date in (self.test_date_start + timedelta(seconds=n) for n in date_range):
-                # update mrkt
-                # create action
-                action = self.strategy.execute(pair=self.pair, execute_date=execution_date, **params)
-                # action to order
-                order = self.strategy.action_to_order(action)
-                # execute order on mrkt
-                created_order = self.market.add_order(execution_date=execution_date, order=order)
-                # get balance
-                account_balance: AccountBalance = self.market.get_account_balance(execution_date=execution_date)
-                execution_date_cp = copy.deepcopy(execution_date)
-                account_balance_cp = copy.deepcopy(account_balance)
-                action_cp = copy.deepcopy(action)
-                # append test result
-                test_res = TestResult(execution_date=execution_date_cp, balance=account_balance_cp, action=action_cp)
-                self.results.append(test_res)
-                pbar.update(date_range.step / date_range.stop * 100)
+        self.market = MockMarket(params.get('initial_balance'), self.period)
+        self.show_progress = params.get('show_progress', True)
+        self.results_spill_dir = params.get('results_spill_dir')
+        # in memory until start_strategy_test, which clears the spill dir of a previous run
+        self.results = ResultRecorder()
+        self.checkpoint_path = params.get('checkpoint_path')
+        self.checkpoint_every = params.get('checkpoint_every', settings.BACKTEST_CHECKPOINT_BARS)
+        self.segment_bars = params.get('segment_bars')
+        self.cursor = 0
+        self.run_params = {}
+        self.random_state = None
+        self.profile = params.get('profile', settings.BACKTEST_PROFILE)
+        self.profile_cprofile = params.get('profile_cprofile', False)
+        self.profile_tracemalloc = params.get('profile_tracemalloc', False)
+        self.profile_report_path = params.get('profile_report_path')
+        self.profile_report = None
 
+    def start_strategy_test(self, **params) -> ResultRecorder:
+        dates = self.get_dates()
+        self.results = ResultRecorder(capacity=len(dates), spill_dir=self.results_spill_dir)
+        self.cursor = 0
+        self.run_params = params
+        return self._run(dates)
+
+    @classmethod
+    def resume(cls, checkpoint_path: str, **params) -> "StrategyTester":
+        """
+        Load the tester saved in `checkpoint_path` and run it from its last checkpoint,
+        `params` override the saved settings (e.g. segment_bars or show_progress)
+        """
+        with open(checkpoint_path, "rb") as checkpoint_file:
+            tester: StrategyTester = pickle.load(checkpoint_file)
+        for key, value in params.items():
+            setattr(tester, key, value)
+        tester.checkpoint_path = checkpoint_path
+        if tester.random_state:
+            random.setstate(tester.random_state[0])
+            np.random.set_state(tester.random_state[1])
+        tester.results.discard_unknown_chunks()
+        tester._run(tester.get_dates())
+        return tester
+
+    @property
+    def is_complete(self) -> bool:
+        return self.cursor >= len(self.get_dates())
+
+    def checkpoint(self):
+        """
+        Pickle the whole tester: bar cursor, market (balance and orders), strategy, results so far, random states.
+        Result chunks spilled to results_spill_dir are not in the file, resuming needs that directory too.
+        """
+        self.random_state = (random.getstate(), np.random.get_state())
+        tmp_path = f"{self.checkpoint_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as checkpoint_file:
+            pickle.dump(self, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _run(self, dates: pd.DatetimeIndex) -> ResultRecorder:
+        params = self.run_params
+        end = len(dates) if self.segment_bars is None else min(len(dates), self.cursor + self.segment_bars)
+        profiler = profiling_utils.StageProfiler()
+        if self.profile:
+            profiler.start(cprofile=self.profile_cprofile, trace_memory=self.profile_tracemalloc)
+
+        from tqdm import tqdm
+        try:
+            with tqdm(total=len(dates), initial=self.cursor, miniters=1, disable=not self.show_progress) as pbar:
+                for execution_date in dates[self.cursor:end].to_pydatetime():
+                    with profiler.stage("strategy"):
+                        # update mrkt
+                        if self.strategy.indicators:
+                            self.strategy.update_indicators(self.market.get_candle(self.pair, execution_date))
+                        # create action
+                        action = self.strategy.execute(pair=self.pair, execute_date=execution_date, **params)
+                        # action to order
+                        order = self.strategy.action_to_order(action)
+                    with profiler.stage("orders"):
+                        # execute order on mrkt, rebalancing strategies may return many orders
+                        if isinstance(order, list):
+                            created_order = self.market.add_orders(execution_date=execution_date, orders=order)
+                        else:
+                            created_order = self.market.add_order(execution_date=execution_date, order=order)
+                    with profiler.stage("balance"):
+                        # get balance
+                        account_balance: AccountBalance = self.market.get_account_balance(execution_date=execution_date)
+                    with profiler.stage("recording"):
+                        # record test result
+                        self.results.record(execution_date, account_balance, action)
+                    pbar.update(1)
+                    self.cursor += 1
+                    if self.checkpoint_path and (self.cursor % self.checkpoint_every == 0 or self.cursor == end):
+                        with profiler.stage("checkpoint"):
+                            self.checkpoint()
+        finally:
+            if self.profile:
+                self.profile_report = profiler.stop()
+        if self.profile and self.profile_report_path:
+            profiling_utils.write_report(self.profile_report, self.profile_report_path)
         return self.results
 
-    def test_result_to_df(self, test_result: List[TestResult] = None) -> pd.DataFrame:
-        if not test_result:
+    def get_dates(self) -> pd.DatetimeIndex:
+        return timeseries_utils.get_test_dates(self.test_date_start, self.test_date_end, self.period)
+
+    def test_result_to_df(self, test_result: Union[ResultRecorder, List[TestResult], pd.DataFrame] = None) -> pd.DataFrame:
+        if test_result is None or len(test_result) == 0:
             test_result = self.results
+        if isinstance(test_result, pd.DataFrame):
+            return test_result
+        if isinstance(test_result, ResultRecorder):
+            return test_result.to_df()
         return pd.DataFrame([dict(r) for r in test_result])
 
-    def evaluate_result(self, test_result: dict, **params) -> StrategyTestResult:
+    def evaluate_result(self, test_result=None, **params) -> StrategyTestResult:
+        """
+        Time weighted rates of return for `horizon` (every horizon if not given) and formula_service.get_metrics
+        """
         result = StrategyTestResult(test_result)
         horizon: enums.TimeseriesHorizonEnum = params.get('horizon')
-        test_result_series = self.test_result_to_df(test_result)
-        setattr(result, str(horizon), formula_service.get_time_weighted_rate_of_return(test_result_series, horizon))
+        test_result_df = self.test_result_to_df(test_result)
+        values = test_result_df.set_index('execution_date')['value']
+        for h in [horizon] if horizon else enums.TimeseriesHorizonEnum:
+            setattr(result, str(h), formula_service.get_time_weighted_rate_of_return(values, h))
+        result.metrics = formula_service.get_metrics(test_result_df, risk_free_rate=params.get('risk_free_rate', 0.))
         return result
+
+
+class VectorizedStrategyTester(StrategyTester):
+    """
+    Alternative engine mode: the strategy emits a StrategySignal for the whole period grid and
+    fills, fees and the equity curve are computed with numpy in one pass.
+    Only MARKET orders with CURRENCY quantities are supported, results are float64 instead of Decimal.
+    """
+    results: pd.DataFrame
+
+    def start_strategy_test(self, **params) -> pd.DataFrame:
+        dates = self.get_dates()
+        candles = self.market.get_candles(pair=self.pair, dates=dates)
+        signal: StrategySignal = self.strategy.generate_signal(pair=self.pair, dates=dates, prices=candles, **params)
+        if len(signal) != len(dates):
+            raise ValueError(f"signal has {len(signal)} bars, expected {len(dates)}")
+
+        account_balance: AccountBalance = self.market.get_account_balance(execution_date=self.test_date_start)
+        base, quote = self.pair.base, self.pair.quote
+        price = np.round(candles.to_numpy(dtype=np.float64).mean(axis=1), _get_decimals(quote))
+
+        # fills
+        direction = signal.direction
+        if signal.qty_unit_type == enums.QtyUnitTypeEnum.QUOTE:
+            base_qty = np.round(signal.qty / price, _get_decimals(base))
+        else:
+            base_qty = signal.qty
+        quote_qty = np.round(base_qty * price, _get_decimals(quote))
+        is_buy = direction == enums.OrderDirectionEnum.BUY.value
+        is_sell = direction == enums.OrderDirectionEnum.SELL.value
+        fee_rate = float(settings.MOCK_MARKET_FEE) / 100
+        base_delta = np.where(is_buy, base_qty * (1 - fee_rate), np.where(is_sell, -base_qty, 0.))
+        quote_delta = np.where(is_buy, -quote_qty, np.where(is_sell, quote_qty * (1 - fee_rate), 0.))
+
+        # balances and equity curve
+        amounts = {}
+        value = np.zeros(len(dates))
+        for token_amount in account_balance.balance:
+            token = token_amount.token
+            amount = np.full(len(dates), float(token_amount.amount))
+            if token == base:
+                amount += np.cumsum(base_delta)
+            if token == quote:
+                amount += np.cumsum(quote_delta)
+            if not settings.NEGATIVE_BALANCE_AMOUNT and (amount < 0).any():
+                raise NotEnoughMoneyException()
+            amounts[token.symbol] = amount
+            value += amount * self._get_marks(token, dates, price)
+
+        actions = np.array([str(d) for d in enums.OrderDirectionEnum], dtype=object)
+        action_index = {d.value: i for i, d in enumerate(enums.OrderDirectionEnum)}
+        self.results = pd.DataFrame({
+            "execution_date": dates,
+            "value": value,
+            **amounts,
+            "action": actions[np.vectorize(action_index.get, otypes=[np.intp])(direction)],
+        })
+        return self.results
+
+    def _get_marks(self, token: Token, dates: pd.DatetimeIndex, pair_price: np.ndarray) -> np.ndarray:
+        if token.symbol == settings.ACCOUNT_BALANCE_CURRENCY:
+            return np.ones(len(dates))
+        if token == self.pair.base and self.pair.quote.symbol == settings.ACCOUNT_BALANCE_CURRENCY:
+            return pair_price
+        pair = Pair(token, settings.ACCOUNT_BALANCE_CURRENCY_TOKEN_INFO)
+        candles = self.market.get_candles(pair=pair, dates=dates)
+        return np.round(candles.to_numpy(dtype=np.float64).mean(axis=1), _get_decimals(pair.quote))
+
+
+def _get_decimals(token: Token) -> int:
+    return -token.min_size.as_tuple().exponent
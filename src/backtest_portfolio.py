@@ -0,0 +1,125 @@
+from datetime import datetime
+from typing import Dict, List
+
+import pandas as pd
+
+from src.backtest_recorder import ResultRecorder
+from src.markets.mock_market import MockMarket
+from src.models.candle import Candle
+from src.models.token import Pair
+from src.models.user import AccountBalance
+from src.services import formula_service
+from src.strategies.base_strategy import Strategy
+from src.utils import enums, price_utils, timeseries_utils
+
+
+class Sleeve:
+    """
+    One strategy trading one pair on an account, sleeves with the same `account` share its balance
+    """
+    name: str
+    strategy: Strategy
+    pair: Pair
+    account: str
+    initial_balance: dict
+
+    def __init__(self, **params):
+        self.strategy = params['strategy']
+        self.pair = params['pair']
+        self.name = params.get('name', f"{self.strategy}_{self.pair}")
+        # own account if not shared
+        self.account = params.get('account', self.name)
+        self.initial_balance = params.get('initial_balance')
+
+    def __repr__(self):
+        return f"Sleeve[{self.name} {self.pair} @{self.account}]"
+
+
+class PortfolioTester:
+    """
+    Many strategy / pair sleeves tested in a single pass: one clock over the period grid,
+    the candle of every pair is looked up once per bar whatever the number of sleeves trading it,
+    every account is valued once per bar. Results are recorded per sleeve (the balance of its account).
+    """
+    test_date_start: datetime
+    test_date_end: datetime
+    period: enums.TimeseriesPeriodEnum
+    sleeves: List[Sleeve]
+    markets: Dict[str, MockMarket]  # by account
+    prices: price_utils.PriceRegistry
+    show_progress: bool
+    results: Dict[str, ResultRecorder]  # by sleeve name
+
+    def __init__(self, **params):
+        self.test_date_start = params.get('start_test_date', datetime(2018, 1, 1))
+        self.test_date_end = min(params.get('end_test_date', datetime.utcnow()), datetime.utcnow())
+        self.period = params.get('period', enums.TimeseriesPeriodEnum.ONE_HOURS)
+        self.sleeves = params['sleeves']
+        names = [sleeve.name for sleeve in self.sleeves]
+        if len(set(names)) != len(names):
+            raise ValueError(f"sleeve names must be unique: {names}")
+        # same prices and period for every account: the mark of a pair is looked up once per bar for all of them
+        marks = {}
+        self.markets = {}
+        for sleeve in self.sleeves:
+            if sleeve.account not in self.markets:
+                initial_balance = sleeve.initial_balance or params.get('initial_balance')
+                self.markets[sleeve.account] = MockMarket(initial_balance, self.period, marks=marks)
+        self.prices = price_utils.PriceRegistry()
+        self.show_progress = params.get('show_progress', True)
+        self.results = {}
+
+    def start_strategy_test(self, **params) -> Dict[str, ResultRecorder]:
+        dates = self.get_dates()
+        self.results = {sleeve.name: ResultRecorder(capacity=len(dates)) for sleeve in self.sleeves}
+        # pairs whose candles are needed by streaming indicators
+        indicator_pairs = list({sleeve.pair: None for sleeve in self.sleeves if sleeve.strategy.indicators})
+
+        from tqdm import tqdm
+        with tqdm(total=len(dates), miniters=1, disable=not self.show_progress) as pbar:
+            for execution_date in dates.to_pydatetime():
+                candles: Dict[Pair, Candle] = {pair: self.prices.get_candle(pair, execution_date, self.period)
+                                               for pair in indicator_pairs}
+                actions = {}
+                for sleeve in self.sleeves:
+                    strategy = sleeve.strategy
+                    if strategy.indicators:
+                        strategy.update_indicators(candles[sleeve.pair])
+                    action = actions[sleeve.name] = strategy.execute(pair=sleeve.pair, execute_date=execution_date,
+                                                                     **params)
+                    order = strategy.action_to_order(action)
+                    market = self.markets[sleeve.account]
+                    if isinstance(order, list):
+                        market.add_orders(execution_date=execution_date, orders=order)
+                    else:
+                        market.add_order(execution_date=execution_date, order=order)
+                balances: Dict[str, AccountBalance] = {
+                    account: market.get_account_balance(execution_date=execution_date)
+                    for account, market in self.markets.items()}
+                for sleeve in self.sleeves:
+                    self.results[sleeve.name].record(execution_date, balances[sleeve.account], actions[sleeve.name])
+                pbar.update(1)
+
+        return self.results
+
+    def get_dates(self) -> pd.DatetimeIndex:
+        return timeseries_utils.get_test_dates(self.test_date_start, self.test_date_end, self.period)
+
+    def test_result_to_df(self, name: str) -> pd.DataFrame:
+        return self.results[name].to_df()
+
+    def get_account_result(self, account: str) -> pd.DataFrame:
+        # every sleeve of an account records the same balance
+        sleeve = next(sleeve for sleeve in self.sleeves if sleeve.account == account)
+        return self.test_result_to_df(sleeve.name).drop(columns="action")
+
+    def evaluate_result(self, **params) -> pd.DataFrame:
+        """
+        formula_service.get_metrics of every sleeve, one row per sleeve
+        """
+        rows = []
+        for sleeve in self.sleeves:
+            metrics = formula_service.get_metrics(self.test_result_to_df(sleeve.name),
+                                                  risk_free_rate=params.get('risk_free_rate', 0.))
+            rows.append({"sleeve": sleeve.name, "pair": str(sleeve.pair), "account": sleeve.account, **metrics})
+        return pd.DataFrame(rows).set_index("sleeve")
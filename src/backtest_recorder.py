@@ -0,0 +1,152 @@
+import glob
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.models.strategy import StrategyAction
+from src.models.user import AccountBalance
+from src.utils import enums, timeseries_utils
+
+DEFAULT_CHUNK_SIZE = 1 << 16  # bars
+ACTION_NAMES = {d.value: str(d) for d in enums.OrderDirectionEnum}
+
+
+class ResultRecorder:
+    """
+    Columnar per-bar results: execution date, balance value, token amounts (as integer token quanta)
+    and action direction, written into preallocated arrays that grow in chunks.
+    With `spill_dir` every full chunk is written to disk as an .npz file and the buffer is reused.
+    A spill dir holds the chunks of one recorder, chunks left there by a previous one are removed.
+    """
+    chunk_size: int
+    spill_dir: Optional[str]
+    size: int  # bars in the buffer
+    spilled: int  # bars written to disk
+    chunks: int  # chunk files written to disk
+    symbols: List[str]
+    exponents: Dict[str, int]
+    date: np.ndarray  # int64 epoch seconds
+    value: np.ndarray  # float64
+    action: np.ndarray  # int8 OrderDirectionEnum values
+    units: Dict[str, np.ndarray]  # int64 token quanta
+
+    def __init__(self, capacity: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE, spill_dir: str = None):
+        self.chunk_size = chunk_size
+        self.spill_dir = spill_dir
+        self.size = 0
+        self.spilled = 0
+        self.chunks = 0
+        self.symbols = []
+        self.exponents = {}
+        capacity = min(capacity, chunk_size) if spill_dir and capacity else capacity or chunk_size
+        self.date = np.empty(capacity, dtype=np.int64)
+        self.value = np.empty(capacity, dtype=np.float64)
+        self.action = np.empty(capacity, dtype=np.int8)
+        self.units = {}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self.discard_unknown_chunks()
+
+    def __len__(self):
+        return self.spilled + self.size
+
+    @property
+    def capacity(self) -> int:
+        return len(self.date)
+
+    def record(self, execution_date: datetime, account_balance: AccountBalance, action: StrategyAction):
+        if self.size == self.capacity:
+            if self.spill_dir and self.size >= self.chunk_size:
+                self.spill()
+            else:
+                self._grow(self.capacity + self.chunk_size)
+        i = self.size
+        self.date[i] = timeseries_utils.datetime_to_epoch(execution_date)
+        self.value[i] = account_balance.value
+        self.action[i] = action.direction.value
+        for token_amount in account_balance.balance:
+            column = self.units.get(token_amount.token.symbol)
+            if column is None:
+                column = self._add_symbol(token_amount.token.symbol, token_amount.token.exponent)
+            column[i] = token_amount.units
+        self.size += 1
+
+    def _add_symbol(self, symbol: str, exponent: int) -> np.ndarray:
+        self.symbols.append(symbol)
+        self.exponents[symbol] = exponent
+        column = self.units[symbol] = np.zeros(self.capacity, dtype=np.int64)
+        return column
+
+    def _grow(self, capacity: int):
+        self.date = np.resize(self.date, capacity)
+        self.value = np.resize(self.value, capacity)
+        self.action = np.resize(self.action, capacity)
+        for symbol in self.symbols:
+            self.units[symbol] = np.resize(self.units[symbol], capacity)
+
+    def spill(self):
+        """
+        Write the buffered bars to the next chunk file and empty the buffer
+        """
+        if not self.size:
+            return
+        chunk = self._get_columns(slice(0, self.size))
+        np.savez(self._get_chunk_path(self.chunks), **chunk)
+        self.chunks += 1
+        self.spilled += self.size
+        self.size = 0
+
+    def __getstate__(self):
+        # buffers are pickled up to the recorded bars, they grow again on the next record
+        state = self.__dict__.copy()
+        rows = slice(0, self.size)
+        state.update(date=self.date[rows].copy(), value=self.value[rows].copy(), action=self.action[rows].copy(),
+                     units={symbol: column[rows].copy() for symbol, column in self.units.items()})
+        return state
+
+    def discard_unknown_chunks(self):
+        """
+        Remove the chunk files spilled after this recorder state was saved (a resumed checkpoint)
+        """
+        if not self.spill_dir:
+            return
+        for path in glob.glob(os.path.join(self.spill_dir, "chunk_*.npz")):
+            if int(os.path.basename(path)[6:-4]) >= self.chunks:
+                os.remove(path)
+
+    def _get_chunk_path(self, chunk: int) -> str:
+        return os.path.join(self.spill_dir, f"chunk_{chunk:05d}.npz")
+
+    def _get_columns(self, rows: slice) -> Dict[str, np.ndarray]:
+        columns = {"date": self.date[rows], "value": self.value[rows], "action": self.action[rows]}
+        for symbol in self.symbols:
+            columns[f"units_{symbol}"] = self.units[symbol][rows]
+        return columns
+
+    def _iter_chunks(self):
+        for i in range(self.chunks):
+            with np.load(self._get_chunk_path(i)) as chunk:
+                yield {k: chunk[k] for k in chunk.files}
+        yield self._get_columns(slice(0, self.size))
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        Same columns as StrategyTester.test_result_to_df: execution_date, value, one column per token, action
+        """
+        chunks = list(self._iter_chunks())
+        date = np.concatenate([c["date"] for c in chunks])
+        df = {
+            "execution_date": date.astype("datetime64[s]").astype("datetime64[ns]"),
+            "value": np.concatenate([c["value"] for c in chunks]),
+        }
+        for symbol in self.symbols:
+            # tokens added after a spill have no column in older chunks
+            units = np.concatenate([c.get(f"units_{symbol}", np.zeros(len(c["date"]), dtype=np.int64))
+                                    for c in chunks])
+            df[symbol] = units * 10. ** self.exponents[symbol]
+        action = np.concatenate([c["action"] for c in chunks])
+        df["action"] = pd.Categorical.from_codes(action + 1, [ACTION_NAMES[v] for v in (-1, 0, 1)]).astype(object)
+        return pd.DataFrame(df)
@@ -0,0 +1,139 @@
+import itertools
+import random
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Type
+
+import numpy as np
+import pandas as pd
+
+from src.backtest_engine import StrategyTester, VectorizedStrategyTester
+from src.models.token import Pair
+from src.services import formula_service
+from src.strategies.base_strategy import Strategy
+from src.utils import enums, price_utils
+
+
+class SweepTask:
+    """
+    One StrategyTester run of a parameter sweep, must stay picklable
+    """
+    task_id: int
+    strategy_cls: Type[Strategy]
+    strategy_params: dict
+    pair: Pair
+    start_test_date: datetime
+    end_test_date: datetime
+    period: enums.TimeseriesPeriodEnum
+    initial_balance: dict
+    vectorized: bool
+    seed: int
+
+    def __init__(self, **params):
+        self.task_id = params['task_id']
+        self.strategy_cls = params['strategy_cls']
+        self.strategy_params = params.get('strategy_params', {})
+        self.pair = params['pair']
+        self.start_test_date = params['start_test_date']
+        self.end_test_date = params['end_test_date']
+        self.period = params.get('period', enums.TimeseriesPeriodEnum.ONE_HOURS)
+        self.initial_balance = params.get('initial_balance')
+        self.vectorized = params.get('vectorized', True)
+        self.seed = params.get('seed', 0)
+
+    def __repr__(self):
+        return f"SweepTask[{self.task_id} {self.strategy_cls.__name__}{self.strategy_params} " \
+               f"{self.start_test_date:%Y-%m-%d}/{self.end_test_date:%Y-%m-%d}]"
+
+
+class SweepResult:
+    task: SweepTask
+    result: pd.DataFrame
+    metrics: dict
+    elapsed: float
+
+    def __init__(self, **params):
+        self.task = params['task']
+        self.result = params['result']
+        self.metrics = params['metrics']
+        self.elapsed = params['elapsed']
+
+    def __iter__(self):
+        yield "task_id", self.task.task_id
+        yield "start_test_date", self.task.start_test_date
+        yield "end_test_date", self.task.end_test_date
+        for k, v in self.task.strategy_params.items():
+            yield k, v
+        for k, v in self.metrics.items():
+            yield k, v
+        yield "elapsed", self.elapsed
+
+
+def build_tasks(strategy_cls: Type[Strategy], pair: Pair, windows: Sequence[Tuple[datetime, datetime]],
+                param_grid: Dict[str, Sequence] = None, seed: int = 0, **params) -> List[SweepTask]:
+    """
+    Cartesian product of date windows and strategy parameters, every task gets its own seed
+    derived from `seed` so a sweep is reproducible whatever the scheduling order
+    """
+    param_grid = param_grid or {}
+    combinations = [dict(zip(param_grid, values)) for values in itertools.product(*param_grid.values())]
+    grid = list(itertools.product(windows, combinations))
+    seeds = np.random.SeedSequence(seed).generate_state(len(grid))
+    return [SweepTask(task_id=task_id, strategy_cls=strategy_cls, strategy_params=strategy_params, pair=pair,
+                      start_test_date=start, end_test_date=end, seed=int(task_seed), **params)
+            for task_id, (((start, end), strategy_params), task_seed) in enumerate(zip(grid, seeds))]
+
+
+def get_summary_metrics(result: pd.DataFrame) -> dict:
+    return formula_service.get_metrics(result)
+
+
+def run_task(task: SweepTask) -> SweepResult:
+    random.seed(task.seed)
+    np.random.seed(task.seed)
+    start = time.perf_counter()
+    tester_cls = VectorizedStrategyTester if task.vectorized else StrategyTester
+    tester = tester_cls(start_test_date=task.start_test_date, end_test_date=task.end_test_date, period=task.period,
+                        strategy=task.strategy_cls(**task.strategy_params), pair=task.pair,
+                        initial_balance=task.initial_balance, show_progress=False)
+    tester.start_strategy_test()
+    result = tester.test_result_to_df()
+    return SweepResult(task=task, result=result, metrics=get_summary_metrics(result),
+                       elapsed=time.perf_counter() - start)
+
+
+def init_worker(pairs: List[Pair], period: enums.TimeseriesPeriodEnum = None):
+    # map the price store once per worker, pages are shared with every other process,
+    # and resample it to `period` once if every task runs on that period
+    registry = price_utils.PriceRegistry()
+    for pair in pairs:
+        registry.get_series(pair, period)
+
+
+def run_sweep(tasks: Iterable[SweepTask], max_workers: int = None, executor: Executor = None) -> Iterator[SweepResult]:
+    """
+    Run `tasks` over a process pool and yield results as they complete.
+    max_workers=1 runs in process, which is handy to debug a sweep.
+    """
+    tasks = list(tasks)
+    if max_workers == 1 and executor is None:
+        for task in tasks:
+            yield run_task(task)
+        return
+
+    pairs = list({task.pair: None for task in tasks})
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(pairs,))
+    try:
+        futures = [executor.submit(run_task, task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+
+
+def sweep_to_df(results: Iterable[SweepResult]) -> pd.DataFrame:
+    return pd.DataFrame([dict(r) for r in results]).sort_values("task_id").reset_index(drop=True)
@@ -0,0 +1,157 @@
+"""
+Walk-forward optimization: the period grid is split into rolling train / test windows,
+strategy parameters are picked on every train window (a sweep of the parameter grid) and run on the
+test window that follows it. Test windows do not overlap, their equity curves are stitched into one
+out-of-sample curve.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Sequence, Type
+
+import numpy as np
+import pandas as pd
+
+from src.backtest_sweep import SweepResult, SweepTask, build_tasks, init_worker, run_sweep, sweep_to_df
+from src.models.token import Pair
+from src.services import formula_service
+from src.strategies.base_strategy import Strategy
+from src.utils import enums, timeseries_utils
+
+
+class WalkForwardWindow:
+    window_id: int
+    train_start: datetime
+    train_end: datetime  # last bar, included
+    test_start: datetime
+    test_end: datetime
+
+    def __init__(self, **params):
+        self.window_id = params['window_id']
+        self.train_start = params['train_start']
+        self.train_end = params['train_end']
+        self.test_start = params['test_start']
+        self.test_end = params['test_end']
+
+    def __iter__(self):
+        yield "window_id", self.window_id
+        yield "train_start", self.train_start
+        yield "train_end", self.train_end
+        yield "test_start", self.test_start
+        yield "test_end", self.test_end
+
+    def __repr__(self):
+        return f"WalkForwardWindow[{self.window_id} {self.train_start:%Y-%m-%d %H}/{self.train_end:%Y-%m-%d %H} " \
+               f"> {self.test_start:%Y-%m-%d %H}/{self.test_end:%Y-%m-%d %H}]"
+
+
+class WalkForwardResult:
+    windows: List[WalkForwardWindow]
+    in_sample: pd.DataFrame  # sweep_to_df of every train run
+    metrics: pd.DataFrame  # one row per window: dates, picked parameters, in-sample score, out-of-sample metrics
+    equity: pd.DataFrame  # stitched out-of-sample curve: execution_date, window_id, value
+    summary: dict  # formula_service.get_metrics of the stitched curve
+
+    def __init__(self, **params):
+        self.windows = params['windows']
+        self.in_sample = params['in_sample']
+        self.metrics = params['metrics']
+        self.equity = params['equity']
+        self.summary = params['summary']
+
+
+def get_windows(start_date: datetime, end_date: datetime, period: enums.TimeseriesPeriodEnum,
+                train_bars: int, test_bars: int, step_bars: int = None) -> List[WalkForwardWindow]:
+    """
+    Rolling windows over the StrategyTester grid of [start_date, end_date]: `train_bars` bars followed by
+    `test_bars` bars, every `step_bars` bars (`test_bars` by default, so that test windows are contiguous).
+    The last test window is cut at end_date.
+    """
+    step_bars = step_bars or test_bars
+    if train_bars < 1 or test_bars < 1 or step_bars < 1:
+        raise ValueError("train_bars, test_bars and step_bars must be positive")
+    dates = timeseries_utils.get_test_dates(start_date, end_date, period).to_pydatetime()
+    windows = []
+    for offset in range(0, len(dates) - train_bars, step_bars):
+        test_end = min(offset + train_bars + test_bars, len(dates)) - 1
+        windows.append(WalkForwardWindow(window_id=len(windows), train_start=dates[offset],
+                                         train_end=dates[offset + train_bars - 1],
+                                         test_start=dates[offset + train_bars], test_end=dates[test_end]))
+    return windows
+
+
+def stitch_equity(results: Sequence[SweepResult]) -> pd.DataFrame:
+    """
+    Out-of-sample curves chained in date order: every window starts from the last value of the previous one
+    """
+    frames = []
+    value = None
+    for res in sorted(results, key=lambda r: r.task.start_test_date):
+        values = res.result['value'].astype(float).to_numpy()
+        if not len(values):
+            continue
+        scale = value / values[0] if value is not None and values[0] else 1.
+        frames.append(pd.DataFrame({"execution_date": pd.DatetimeIndex(res.result['execution_date']),
+                                    "window_id": res.task.task_id, "value": values * scale}))
+        value = frames[-1]["value"].iloc[-1]
+    if not frames:
+        return pd.DataFrame(columns=["execution_date", "window_id", "value"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _get_score(res: SweepResult, objective: str, maximize: bool) -> float:
+    score = res.metrics.get(objective)
+    if score is None or np.isnan(score):
+        return -np.inf
+    return score if maximize else -score
+
+
+def run_walk_forward(strategy_cls: Type[Strategy], pair: Pair, windows: Sequence[WalkForwardWindow],
+                     param_grid: Dict[str, Sequence] = None, objective: str = "sharpe_ratio", maximize: bool = True,
+                     max_workers: int = None, seed: int = 0, **params) -> WalkForwardResult:
+    """
+    Sweep `param_grid` on every train window, run the best parameters (by the `objective` metric of
+    formula_service.get_metrics) on its test window. Train runs of every window, then test runs, are spread
+    over one process pool (max_workers=1 runs in process). Workers keep their price series and FeatureCache
+    between runs, strategies reading indicators with formula_service.get_feature_window compute them once.
+    `params` are SweepTask params (period, initial_balance, vectorized).
+    """
+    windows = list(windows)
+    if not windows:
+        raise ValueError("no walk-forward window")
+    period = params.get('period', enums.TimeseriesPeriodEnum.ONE_HOURS)
+    train_tasks = build_tasks(strategy_cls, pair, [(w.train_start, w.train_end) for w in windows],
+                              param_grid=param_grid, seed=seed, **params)
+    window_by_start = {w.train_start: w for w in windows}
+    window_by_id = {w.window_id: w for w in windows}
+
+    executor = None
+    if max_workers != 1:
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=([pair], period))
+    try:
+        train_results = list(run_sweep(train_tasks, max_workers=max_workers, executor=executor))
+        by_window: Dict[int, List[SweepResult]] = {w.window_id: [] for w in windows}
+        for res in sorted(train_results, key=lambda r: r.task.task_id):
+            by_window[window_by_start[res.task.start_test_date].window_id].append(res)
+        # first parameters of the grid win ties
+        best = {window_id: max(results, key=lambda r: _get_score(r, objective, maximize))
+                for window_id, results in by_window.items()}
+
+        seeds = np.random.SeedSequence([seed, len(train_tasks)]).generate_state(len(windows))
+        test_tasks = [SweepTask(task_id=w.window_id, strategy_cls=strategy_cls,
+                                strategy_params=best[w.window_id].task.strategy_params, pair=pair,
+                                start_test_date=w.test_start, end_test_date=w.test_end, seed=int(task_seed), **params)
+                      for w, task_seed in zip(windows, seeds)]
+        test_results = list(run_sweep(test_tasks, max_workers=max_workers, executor=executor))
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    rows = []
+    for res in sorted(test_results, key=lambda r: r.task.task_id):
+        window = window_by_id[res.task.task_id]
+        rows.append({**dict(window), **res.task.strategy_params,
+                     f"in_sample_{objective}": best[window.window_id].metrics.get(objective), **res.metrics})
+    equity = stitch_equity(test_results)
+    return WalkForwardResult(windows=windows, in_sample=sweep_to_df(train_results),
+                             metrics=pd.DataFrame(rows).set_index("window_id"), equity=equity,
+                             summary=formula_service.get_metrics(equity) if len(equity) else {"bars": 0})
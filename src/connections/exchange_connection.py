@@ -0,0 +1,221 @@
+"""
+Async connector to an exchange speaking newline delimited JSON over TCP (see services.fake_exchange):
+a request is {"id", "account", "method", "params"}, its response {"id", "result"}
+or {"id", "error": {"type", "message"}}.
+Connections are pooled and shared by every connector given the same pool, a connection serves one request at a time.
+"""
+import asyncio
+import itertools
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Tuple
+
+from src import settings
+from src.connections.interface import AsyncConnectorInterface
+from src.models.order import Order
+from src.models.token import Pair, PairSpotPrice, TokenAmount
+from src.models.user import AccountBalance
+from src.utils import enums, exception_utils, token_utils
+
+ORDER_DATES = ('open_time', 'close_time', 'start_time', 'expire_time')
+ORDER_INFO = ('qty_executed', 'cost', 'fee', 'exec_price', 'stop_price', 'limit_price')
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+def _to_str(value: Optional[Any]) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def to_iso(value: Optional[datetime]) -> Optional[str]:
+    return None if value is None else value.isoformat()
+
+
+def from_iso(value: Optional[str]) -> Optional[datetime]:
+    return None if value is None else datetime.fromisoformat(value)
+
+
+def pair_to_str(pair: Pair) -> str:
+    return f"{pair.base.symbol}/{pair.quote.symbol}"
+
+
+def pair_from_str(value: str) -> Pair:
+    return token_utils.PairFactory().get_pair_by_name(*value.split("/"))
+
+
+def order_to_dict(order: Order) -> dict:
+    data = {"order_id": order.order_id, "pair": pair_to_str(order.pair), "direction": order.direction.name}
+    if order.direction == enums.OrderDirectionEnum.HODL:
+        return data
+    data.update({
+        "order_type": order.order_type.name,
+        "qty": str(order.qty),
+        "qty_unit_type": order.qty_unit_type.name,
+        "qty_type": order.qty_type.name,
+        "price": _to_str(order.price),
+        "price2": _to_str(order.price2),
+        "leverage": order.leverage,
+        "status": order.status.name,
+        **{field: to_iso(getattr(order, field)) for field in ORDER_DATES},
+        **{field: _to_str(getattr(order.info, field)) for field in ORDER_INFO},
+    })
+    return data
+
+
+def order_from_dict(data: dict) -> Order:
+    params = dict(data, pair=pair_from_str(data["pair"]), direction=enums.OrderDirectionEnum[data["direction"]])
+    if params["direction"] != enums.OrderDirectionEnum.HODL:
+        params.update({
+            "order_type": enums.OrderTypeEnum[data["order_type"]],
+            "qty_unit_type": enums.QtyUnitTypeEnum[data["qty_unit_type"]],
+            "qty_type": enums.QtyTypeEnum[data["qty_type"]],
+            "status": enums.OrderStatusEnum[data["status"]],
+            **{field: from_iso(data[field]) for field in ORDER_DATES},
+        })
+    order = Order(**params)
+    order.set_order_id(data["order_id"])
+    return order
+
+
+def balance_to_dict(account_balance: AccountBalance) -> dict:
+    return {"balance": {t.token.symbol: str(t.amount) for t in account_balance.balance}}
+
+
+def balance_from_dict(data: dict) -> AccountBalance:
+    return AccountBalance([TokenAmount(token_utils.get_token_info(symbol), Decimal(amount))
+                           for symbol, amount in data["balance"].items()])
+
+
+def price_to_dict(price: PairSpotPrice) -> dict:
+    return {"pair": pair_to_str(price.pair), "price": str(price.price)}
+
+
+def price_from_dict(data: dict) -> PairSpotPrice:
+    return PairSpotPrice(pair=pair_from_str(data["pair"]), price=data["price"])
+
+
+def error_from_dict(data: dict) -> BaseException:
+    # the exchange raises the exceptions of exception_utils, anything else is an ExchangeException
+    error_cls = getattr(exception_utils, data["type"], None)
+    if not isinstance(error_cls, type) or not issubclass(error_cls, BaseException):
+        error_cls = exception_utils.ExchangeException
+    return error_cls(data["message"])
+
+
+class ConnectionPool:
+    """
+    Up to `max_size` connections to host:port, opened on demand and reused. Callers beyond max_size wait
+    for a free connection. A connection interrupted during a request is closed, not reused,
+    idle connections closed by the exchange are dropped.
+    """
+    host: str
+    port: int
+    max_size: int
+    opened: int  # connections opened so far
+
+    def __init__(self, host: str, port: int, max_size: int = None):
+        self.host = host
+        self.port = port
+        self.max_size = max_size or settings.EXCHANGE_POOL_SIZE
+        self.opened = 0
+        self._idle: List[Connection] = []
+        self._semaphore = asyncio.Semaphore(self.max_size)
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self._semaphore:
+            connection = None
+            while self._idle and connection is None:
+                connection = self._idle.pop()
+                if connection[0].at_eof() or connection[1].is_closing():
+                    # closed by the exchange while idle
+                    connection[1].close()
+                    connection = None
+            if connection is None:
+                connection = await asyncio.open_connection(self.host, self.port)
+                self.opened += 1
+            try:
+                yield connection
+            except BaseException:
+                connection[1].close()
+                raise
+            self._idle.append(connection)
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        await asyncio.gather(*(writer.wait_closed() for _, writer in idle), return_exceptions=True)
+
+
+class ExchangeConnector(AsyncConnectorInterface):
+    """
+    Account `account` of the exchange behind `pool`. Orders sent are updated with the id, status and info
+    given by the exchange.
+    """
+    account: str
+    pool: ConnectionPool
+
+    def __init__(self, **params):
+        self.account = params['account']
+        self.pool = params.get('pool') or ConnectionPool(params['host'], params['port'], params.get('pool_size'))
+        self._ids = itertools.count()
+
+    async def _call(self, method: str, **params) -> Any:
+        request = {"id": next(self._ids), "account": self.account, "method": method, "params": params}
+        async with self.pool.connection() as (reader, writer):
+            writer.write(json.dumps(request).encode() + b"\n")
+            await writer.drain()
+            line = await reader.readline()
+            if not line:
+                # raised in the pool context, the connection is not reused
+                raise exception_utils.ExchangeException(f"{method}: connection closed by the exchange")
+        response = json.loads(line)
+        if "error" in response:
+            raise error_from_dict(response["error"])
+        return response["result"]
+
+    async def get_account_balance(self, **params) -> AccountBalance:
+        return balance_from_dict(await self._call("get_account_balance",
+                                                  execution_date=to_iso(params.get('execution_date'))))
+
+    async def get_open_orders(self, **params) -> List[Order]:
+        result = await self._call("get_open_orders", execution_date=to_iso(params.get('execution_date')))
+        return [order_from_dict(data) for data in result]
+
+    async def get_orders_info(self, **params) -> List[Order]:
+        result = await self._call("get_orders_info", execution_date=to_iso(params.get('execution_date')),
+                                  order_ids=params.get('order_ids'))
+        return [order_from_dict(data) for data in result]
+
+    async def add_order(self, **params) -> Order:
+        order: Order = params['order']
+        result = await self._call("add_order", execution_date=to_iso(params.get('execution_date')),
+                                  order=order_to_dict(order))
+        return _update_order(order, order_from_dict(result))
+
+    async def add_orders(self, **params) -> List[Order]:
+        orders: List[Order] = params['orders']
+        result = await self._call("add_orders", execution_date=to_iso(params.get('execution_date')),
+                                  orders=[order_to_dict(order) for order in orders])
+        return [_update_order(order, order_from_dict(data)) for order, data in zip(orders, result)]
+
+    async def get_instant_price(self, **params) -> PairSpotPrice:
+        return price_from_dict(await self._call("get_instant_price", pair=pair_to_str(params['pair']),
+                                                execution_date=to_iso(params.get('execution_date'))))
+
+    async def close(self):
+        await self.pool.close()
+
+
+def _update_order(order: Order, remote: Order) -> Order:
+    order.set_order_id(remote.order_id)
+    if remote.direction != enums.OrderDirectionEnum.HODL:
+        order.qty = remote.qty
+        order.qty_type = remote.qty_type
+        order.qty_unit_type = remote.qty_unit_type
+        order.status = remote.status
+        order.info = remote.info
+    return order
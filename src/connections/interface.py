@@ -20,6 +20,44 @@ class ConnectorInterface(ABC):
     def add_order(self, **params):
         raise NotImplementedError('not implemented')
 
+    def add_orders(self, **params):
+        # one add_order per order, connectors with a batch endpoint override it
+        orders = params.pop('orders')
+        return [self.add_order(order=order, **params) for order in orders]
+
     @abstractmethod
     def get_instant_price(self, **params):
         raise NotImplementedError('not implemented')
+
+
+class AsyncConnectorInterface(ABC):
+    """ ConnectorInterface for asyncio: every query is a coroutine, so many markets share one event loop """
+
+    @abstractmethod
+    async def get_account_balance(self, **params):
+        raise NotImplementedError('not implemented')
+
+    @abstractmethod
+    async def get_open_orders(self, **params):
+        raise NotImplementedError('not implemented')
+
+    @abstractmethod
+    async def get_orders_info(self, **params):
+        raise NotImplementedError('not implemented')
+
+    @abstractmethod
+    async def add_order(self, **params):
+        raise NotImplementedError('not implemented')
+
+    async def add_orders(self, **params):
+        # one add_order per order, in order, connectors with a batch endpoint override it
+        orders = params.pop('orders')
+        return [await self.add_order(order=order, **params) for order in orders]
+
+    @abstractmethod
+    async def get_instant_price(self, **params):
+        raise NotImplementedError('not implemented')
+
+    async def close(self):
+        # release connections, nothing to do for connectors without any
+        pass
@@ -1,17 +1,21 @@
 from typing import List
 
-from src.connections.interface import ConnectorInterface
+import pandas as pd
+
+from src.connections.interface import AsyncConnectorInterface, ConnectorInterface
+from src.models.candle import Candle
 from src.models.order import Order
 from src.models.token import PairSpotPrice
 from src.models.user import AccountBalance
 from src.services.mock_service import MockService
+from src.utils import enums
 
 
 class MockConnector(ConnectorInterface):
     service: MockService
 
-    def __init__(self, initial_balance: dict = None):
-        self.service = MockService(initial_balance)
+    def __init__(self, initial_balance: dict = None, period: enums.TimeseriesPeriodEnum = None):
+        self.service = MockService(initial_balance, period)
 
     def get_account_balance(self, **params) -> AccountBalance:
         return self.service.get_account_balance(execution_date=params.get('execution_date'))
@@ -25,5 +29,47 @@ class MockConnector(ConnectorInterface):
     def add_order(self, **params):
         return self.service.add_order(**params)
 
+    def add_orders(self, **params) -> List[Order]:
+        return self.service.add_orders(**params)
+
     def get_instant_price(self, **params) -> PairSpotPrice:
         return self.service.get_instant_price(**params)
+
+    def get_candle(self, **params) -> Candle:
+        return self.service.get_candle(**params)
+
+    def get_candles(self, **params) -> pd.DataFrame:
+        return self.service.get_candles(**params)
+
+
+class AsyncMockConnector(AsyncConnectorInterface):
+    """
+    MockConnector behind the async interface. The mock service does no I/O, calls run inline on the event loop
+    and every call is atomic with respect to the other coroutines.
+    """
+    connector: MockConnector
+
+    def __init__(self, initial_balance: dict = None, period: enums.TimeseriesPeriodEnum = None,
+                 connector: MockConnector = None):
+        self.connector = connector or MockConnector(initial_balance, period)
+
+    async def get_account_balance(self, **params) -> AccountBalance:
+        return self.connector.get_account_balance(**params)
+
+    async def get_open_orders(self, **params) -> List[Order]:
+        return self.connector.get_open_orders(**params)
+
+    async def get_orders_info(self, **params) -> List[Order]:
+        return self.connector.get_orders_info(**params)
+
+    async def add_order(self, **params) -> Order:
+        return self.connector.add_order(**params)
+
+    async def add_orders(self, **params) -> List[Order]:
+        return self.connector.add_orders(**params)
+
+    async def get_instant_price(self, **params) -> PairSpotPrice:
+        return self.connector.get_instant_price(**params)
+
+    async def get_candle(self, **params) -> Candle:
+        return self.connector.get_candle(**params)
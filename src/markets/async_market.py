@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Sequence
+
+from src.connections.interface import AsyncConnectorInterface
+from src.markets.interface import AsyncMarketInterface, normalize_order_quantity
+from src.models.order import Order
+from src.models.token import Pair, PairSpotPrice, Token, TokenAmount
+from src.models.user import AccountBalance
+from src.services.valuation_service import PortfolioValuation
+from src.utils import enums
+
+
+class AsyncMarket(AsyncMarketInterface):
+    """
+    MockMarket over an AsyncConnectorInterface (AsyncMockConnector, ExchangeConnector).
+    The prices and balance needed by the valuation and the order normalization are fetched first, concurrently,
+    then the same synchronous code as MockMarket runs on them.
+    """
+    connector: AsyncConnectorInterface
+    valuation: PortfolioValuation
+
+    def __init__(self, connector: AsyncConnectorInterface, currency: Token = None):
+        self.connector = connector
+        self.valuation = PortfolioValuation(self._get_mark, currency)
+        self._marks: Dict[Pair, PairSpotPrice] = {}  # fetched for the bar being valued
+
+    def _get_mark(self, pair: Pair, execution_date: datetime) -> PairSpotPrice:
+        return self._marks[pair]
+
+    async def get_account_balance(self, **params) -> AccountBalance:
+        execution_date = params['execution_date']
+        account_balance = await self.connector.get_account_balance(execution_date=execution_date)
+        account_balance.value = await self.get_account_balance_value(account_balance, execution_date)
+        return account_balance
+
+    async def get_account_balance_value(self, account_balance: AccountBalance, execution_date: datetime) -> Decimal:
+        currency = self.valuation.currency
+        # marks already looked up for this bar are kept by the valuation
+        pairs = [Pair(token_amount.token, currency) for token_amount in account_balance.balance
+                 if token_amount.units and token_amount.token.symbol != currency.symbol]
+        pairs = [pair for pair in pairs if self.valuation.marks.get(pair, (None,))[0] != execution_date]
+        self._marks = await self.get_instant_prices(pairs, execution_date)
+        return self.valuation.update(account_balance, execution_date)
+
+    async def get_open_orders(self, **params) -> List[Order]:
+        return await self.connector.get_open_orders(**params)
+
+    async def get_orders_info(self, execution_date: datetime, order_ids: List[str] = None) -> List[Order]:
+        return await self.connector.get_orders_info(execution_date=execution_date, order_ids=order_ids)
+
+    async def get_instant_price(self, pair: Pair, execution_date: datetime) -> PairSpotPrice:
+        return await self.connector.get_instant_price(pair=pair, execution_date=execution_date)
+
+    async def get_instant_prices(self, pairs: Sequence[Pair], execution_date: datetime) -> Dict[Pair, PairSpotPrice]:
+        prices = await asyncio.gather(*(self.get_instant_price(pair, execution_date) for pair in pairs))
+        return dict(zip(pairs, prices))
+
+    async def add_order(self, execution_date: datetime, order: Order) -> Order:
+        if order.direction == enums.OrderDirectionEnum.HODL:
+            return order
+        await self.normalize_input_order(order=order, execution_date=execution_date)
+        if order.qty == Decimal("0"):
+            return order
+        return await self.connector.add_order(execution_date=execution_date, order=order)
+
+    async def add_orders(self, execution_date: datetime, orders: List[Order]) -> List[Order]:
+        """
+        MockMarket.add_orders: percentages are of one balance snapshot taken before the batch,
+        the price of every pair is fetched once
+        """
+        batch = [order for order in orders if order.direction != enums.OrderDirectionEnum.HODL]
+        balance = None
+        if any(order.qty_type == enums.QtyTypeEnum.PERCENTAGE for order in batch):
+            balance = await self._get_balance(execution_date)
+        quoted = list({order.pair: None for order in batch if order.qty_unit_type == enums.QtyUnitTypeEnum.QUOTE})
+        prices = await self.get_instant_prices(quoted, execution_date)
+        for order in batch:
+            await self.normalize_input_order(order=order, execution_date=execution_date, balance=balance,
+                                             prices=prices)
+        batch = [order for order in batch if order.qty != Decimal("0")]
+        if batch:
+            await self.connector.add_orders(execution_date=execution_date, orders=batch)
+        return orders
+
+    async def normalize_input_order(self, order: Order, execution_date: datetime, balance: Dict[str, Decimal] = None,
+                                    prices: Dict[Pair, PairSpotPrice] = None) -> Order:
+        if order.qty_type == enums.QtyTypeEnum.PERCENTAGE and balance is None:
+            balance = await self._get_balance(execution_date)
+        price = None
+        if order.qty_unit_type == enums.QtyUnitTypeEnum.QUOTE:
+            price = (prices or {}).get(order.pair) or await self.get_instant_price(order.pair, execution_date)
+        normalize_order_quantity(order, balance, price)
+        # initialize token amount for base currency
+        order.qty_token_amount = TokenAmount(order.pair.base, order.qty)
+        return order
+
+    async def _get_balance(self, execution_date: datetime) -> Dict[str, Decimal]:
+        account_balance = await self.connector.get_account_balance(execution_date=execution_date)
+        return {token_amount.token.symbol: token_amount.amount for token_amount in account_balance.balance}
+
+    async def close(self):
+        await self.connector.close()
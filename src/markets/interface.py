@@ -1,9 +1,13 @@
 from abc import ABC, abstractmethod
-from typing import List
+from decimal import Decimal
+from typing import Dict, List, Optional
 
-from src.connections.interface import ConnectorInterface
+from src.connections.interface import AsyncConnectorInterface, ConnectorInterface
 from src.models.order import Order
+from src.models.token import PairSpotPrice, Token, TokenAmount
 from src.models.user import AccountBalance
+from src.utils import enums
+from src.utils.exception_utils import InvalidQuantityException
 
 
 class MarketInterface(ABC):
@@ -26,6 +30,11 @@ class MarketInterface(ABC):
     def add_order(self, **params) -> Order:
         raise NotImplementedError('not implemented')
 
+    def add_orders(self, **params) -> List[Order]:
+        # one add_order per order, markets with a batch path override it
+        orders = params.pop('orders')
+        return [self.add_order(order=order, **params) for order in orders]
+
     def normalize_input_order(self, **params) -> Order:
         order: Order = params.pop('order')
         self.normalize_quantity(order=order, **params)
@@ -34,3 +43,64 @@ class MarketInterface(ABC):
     @abstractmethod
     def normalize_quantity(self, **params):
         raise NotImplementedError('not implemented')
+
+
+class AsyncMarketInterface(ABC):
+    """ MarketInterface for asyncio, over an AsyncConnectorInterface """
+    connector: AsyncConnectorInterface
+
+    @abstractmethod
+    async def get_account_balance(self, **params) -> AccountBalance:
+        raise NotImplementedError('not implemented')
+
+    @abstractmethod
+    async def get_open_orders(self, **params) -> List[Order]:
+        raise NotImplementedError('not implemented')
+
+    @abstractmethod
+    async def get_orders_info(self, **params) -> List[Order]:
+        raise NotImplementedError('not implemented')
+
+    @abstractmethod
+    async def add_order(self, **params) -> Order:
+        raise NotImplementedError('not implemented')
+
+    async def add_orders(self, **params) -> List[Order]:
+        # one add_order per order, in order, markets with a batch path override it
+        orders = params.pop('orders')
+        return [await self.add_order(order=order, **params) for order in orders]
+
+    @abstractmethod
+    async def get_instant_price(self, **params) -> PairSpotPrice:
+        raise NotImplementedError('not implemented')
+
+
+def normalize_order_quantity(order: Order, balance: Optional[Dict[str, Decimal]], price: Optional[PairSpotPrice]):
+    """
+    Turn the quantity of `order` into a CURRENCY amount of its base token.
+    `balance` (amount by symbol) is needed by PERCENTAGE quantities, `price` (of the order pair) by QUOTE ones.
+    """
+    if not order.qty_type.is_valid(order.qty):
+        raise InvalidQuantityException(f"{order.qty} is not a valid quantity for type {order.qty_type}.")
+    # init token_amount
+    if order.qty_unit_type == enums.QtyUnitTypeEnum.QUOTE:
+        token_amount_quote = TokenAmount(order.pair.quote, order.qty)
+        token_amount_base = TokenAmount(order.pair.base, "0")
+    elif order.qty_unit_type == enums.QtyUnitTypeEnum.BASE:
+        token_amount_quote = TokenAmount(order.pair.quote, "0")
+        token_amount_base = TokenAmount(order.pair.base, order.qty)
+    else:
+        raise InvalidQuantityException(f"{order.qty_unit_type} is not a valid order.qty_unit_type")
+
+    if order.qty_type == enums.QtyTypeEnum.PERCENTAGE:
+        token: Token = order.pair.__getattribute__(order.qty_unit_type.value.lower())
+        order.qty = order.qty / 100 * balance[token.symbol]
+        if order.qty_unit_type == enums.QtyUnitTypeEnum.QUOTE:
+            token_amount_quote.amount = order.qty
+        elif order.qty_unit_type == enums.QtyUnitTypeEnum.BASE:
+            token_amount_base.amount = order.qty
+        order.qty_type = order.qty_type.toggle()
+    if order.qty_unit_type == enums.QtyUnitTypeEnum.QUOTE:
+        token_amount_base = token_amount_quote / price
+        order.qty = token_amount_base.amount
+        order.qty_unit_type = order.qty_unit_type.toggle()
@@ -1,38 +1,49 @@
 from datetime import datetime
 from decimal import Decimal
-from typing import List
+from typing import Dict, List
+
+import pandas as pd
 
-from src import settings
 from src.connections.mock_connection import MockConnector
-from src.markets.interface import MarketInterface
+from src.markets.interface import MarketInterface, normalize_order_quantity
+from src.models.candle import Candle
 from src.models.order import Order
-from src.models.token import Pair, TokenAmount, Token
+from src.models.token import Pair, PairSpotPrice, TokenAmount
 from src.models.user import AccountBalance
+from src.services.valuation_service import PortfolioValuation
 from src.utils import enums
-from src.utils.exception_utils import InvalidQuantityException
+from src.utils.profiling_utils import StageProfiler
 
 
 class MockMarket(MarketInterface):
     connector: MockConnector
+    valuation: PortfolioValuation
 
-    def __init__(self, initial_balance: dict = None):
-        self.connector = MockConnector(initial_balance)
+    def __init__(self, initial_balance: dict = None, period: enums.TimeseriesPeriodEnum = None,
+                 marks: dict = None):
+        """
+        `marks` is a PortfolioValuation marks cache shared with other markets over the same prices
+        """
+        self.connector = MockConnector(initial_balance, period)
+        self.valuation = PortfolioValuation(self._get_mark, marks=marks)
 
     def get_account_balance(self, **params) -> AccountBalance:
         account_balance = self.connector.get_account_balance(execution_date=params.get('execution_date'))
         account_balance.value = self.get_account_balance_value(account_balance, execution_date=params['execution_date'])
         return account_balance
 
+    def _get_mark(self, pair: Pair, execution_date: datetime) -> PairSpotPrice:
+        return self.connector.get_instant_price(pair=pair, execution_date=execution_date)
+
     def get_account_balance_value(self, account_balance: AccountBalance, execution_date: datetime) -> Decimal:
-        total_value = Decimal("0")
-        for balance in account_balance.balance:
-            if balance.token.symbol == settings.ACCOUNT_BALANCE_CURRENCY:
-                last_price = Decimal("1")
-            else:
-                pair = Pair(balance.token, settings.ACCOUNT_BALANCE_CURRENCY_TOKEN_INFO)
-                last_price = self.connector.get_instant_price(pair=pair, execution_date=execution_date)
-            total_value += last_price * balance
-        return total_value
+        with StageProfiler().stage("valuation"):
+            return self.valuation.update(account_balance, execution_date)
+
+    def get_candle(self, pair: Pair, execution_date: datetime) -> Candle:
+        return self.connector.get_candle(pair=pair, execution_date=execution_date)
+
+    def get_candles(self, pair: Pair, dates: pd.DatetimeIndex) -> pd.DataFrame:
+        return self.connector.get_candles(pair=pair, dates=dates)
 
     def get_open_orders(self, **params) -> List[Order]:
         return self.connector.get_open_orders(**params)
@@ -43,42 +54,56 @@ class MockMarket(MarketInterface):
     def add_order(self, execution_date: datetime, order: Order):
         if order.direction == enums.OrderDirectionEnum.HODL:
             return order
-        self.normalize_input_order(order=order, execution_date=execution_date)
+        with StageProfiler().stage("normalization"):
+            self.normalize_input_order(order=order, execution_date=execution_date)
         if order.qty == Decimal("0"):
             return order
         return self.connector.add_order(execution_date=execution_date, order=order)
 
+    def add_orders(self, execution_date: datetime, orders: List[Order]) -> List[Order]:
+        """
+        add_order for many orders at once: percentages are of one balance snapshot taken before the batch,
+        the price of every pair is looked up once and the balance is updated once per token
+        """
+        batch = [order for order in orders if order.direction != enums.OrderDirectionEnum.HODL]
+        balance = None
+        if any(order.qty_type == enums.QtyTypeEnum.PERCENTAGE for order in batch):
+            account_balance = self.connector.get_account_balance(execution_date=execution_date)
+            balance = {token_amount.token.symbol: token_amount.amount for token_amount in account_balance.balance}
+        prices = {}
+        with StageProfiler().stage("normalization"):
+            for order in batch:
+                self.normalize_input_order(order=order, execution_date=execution_date, balance=balance,
+                                           prices=prices)
+        batch = [order for order in batch if order.qty != Decimal("0")]
+        if batch:
+            self.connector.add_orders(execution_date=execution_date, orders=batch)
+        return orders
+
+    def get_instant_price(self, pair: Pair, execution_date: datetime,
+                          prices: Dict[Pair, PairSpotPrice] = None) -> PairSpotPrice:
+        if prices is None:
+            return self.connector.get_instant_price(pair=pair, execution_date=execution_date)
+        if pair not in prices:
+            prices[pair] = self.connector.get_instant_price(pair=pair, execution_date=execution_date)
+        return prices[pair]
+
     def normalize_input_order(self, **params) -> Order:
         order = super().normalize_input_order(**params)
         # initialize token amount for base currency
         order.qty_token_amount = TokenAmount(order.pair.base, order.qty)
         return order
 
-    def normalize_quantity(self, order: Order, execution_date: datetime):
-        if not order.qty_type.is_valid(order.qty):
-            raise InvalidQuantityException(f"{order.qty} is not a valid quantity for type {order.qty_type}.")
-        # init token_amount
-        if order.qty_unit_type == enums.QtyUnitTypeEnum.QUOTE:
-            token_amount_quote = TokenAmount(order.pair.quote, order.qty)
-            token_amount_base = TokenAmount(order.pair.base, "0")
-        elif order.qty_unit_type == enums.QtyUnitTypeEnum.BASE:
-            token_amount_quote = TokenAmount(order.pair.quote, "0")
-            token_amount_base = TokenAmount(order.pair.base, order.qty)
-        else:
-            raise InvalidQuantityException(f"{order.qty_unit_type} is not a valid order.qty_unit_type")
-
-        if order.qty_type == enums.QtyTypeEnum.PERCENTAGE:
+    def normalize_quantity(self, order: Order, execution_date: datetime, balance: Dict[str, Decimal] = None,
+                           prices: Dict[Pair, PairSpotPrice] = None):
+        """
+        `balance` (amount by symbol) replaces the current account balance,
+        `prices` memoizes the pair prices across calls
+        """
+        if order.qty_type == enums.QtyTypeEnum.PERCENTAGE and balance is None:
             account_balance: AccountBalance = self.get_account_balance(execution_date=execution_date)
-            token: Token = order.pair.__getattribute__(order.qty_unit_type.value.lower())
-            balance = account_balance.get_token_amount_by_symbol(token.symbol)
-            order.qty = order.qty / 100 * balance
-            if order.qty_unit_type == enums.QtyUnitTypeEnum.QUOTE:
-                token_amount_quote.amount = order.qty
-            elif order.qty_unit_type == enums.QtyUnitTypeEnum.BASE:
-                token_amount_base.amount = order.qty
-            order.qty_type = order.qty_type.toggle()
+            balance = {token_amount.token.symbol: token_amount.amount for token_amount in account_balance.balance}
+        price = None
         if order.qty_unit_type == enums.QtyUnitTypeEnum.QUOTE:
-            pair_spot_price = self.connector.get_instant_price(pair=order.pair, execution_date=execution_date)
-            token_amount_base.amount = token_amount_quote / pair_spot_price
-            order.qty = token_amount_base.amount
-            order.qty_unit_type = order.qty_unit_type.toggle()
+            price = self.get_instant_price(order.pair, execution_date, prices)
+        normalize_order_quantity(order, balance, price)
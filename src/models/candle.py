@@ -0,0 +1,29 @@
+from datetime import datetime
+
+
+class Candle:
+    """
+    Lightweight OHLC bar, indexable like the pandas row it replaces (candle['Low'])
+    """
+    __slots__ = ('date', 'open', 'high', 'low', 'close')
+    date: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+
+    def __init__(self, date: datetime, open: float, high: float, low: float, close: float):
+        self.date = date
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+
+    def __getitem__(self, item: str) -> float:
+        return getattr(self, item.lower())
+
+    def __repr__(self):
+        return f"Candle[{self.date} O={self.open} H={self.high} L={self.low} C={self.close}]"
+
+    def mean(self) -> float:
+        return (self.open + self.high + self.low + self.close) / 4
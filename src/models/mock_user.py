@@ -15,13 +15,16 @@ class MockAccountBalance(AccountBalance):
         super().__init__(balance)
         self.update_date = datetime.utcnow()
 
-    def update_balance(self, token_symbol: str, amount: Union[int, float, str, Decimal], execution_date: datetime):
+    def update_balance(self, token_symbol: str, amount: Union[int, float, str, Decimal, TokenAmount],
+                       execution_date: datetime):
         token_amount: Optional[TokenAmount] = self.get_token_amount_by_symbol(token_symbol)
         if not token_amount:
             raise NotEnoughMoneyException()
 
-        if settings.NEGATIVE_BALANCE_AMOUNT or token_amount + amount >= 0:
-            token_amount.amount += amount
+        # balances are kept in whole token quanta
+        units = amount.units if isinstance(amount, TokenAmount) else token_amount.token.to_units(amount)
+        if settings.NEGATIVE_BALANCE_AMOUNT or token_amount.units + units >= 0:
+            token_amount.units += units
             self.update_date = execution_date
         else:
             raise NotEnoughMoneyException()
@@ -0,0 +1,73 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.models.order import Order
+from src.utils import enums
+
+OrderKey = Tuple[enums.OrderTypeEnum, enums.OrderDirectionEnum]
+
+
+class OrderBook:
+    """
+    Orders of a mock account.
+    Open orders are indexed by (order_type, direction), closed and canceled orders are moved to the archive,
+    every order can be found by order_id.
+    """
+    id_prefix: str
+    last_id: int  # a plain counter, the book is pickled by StrategyTester checkpoints
+    open_orders: Dict[OrderKey, Dict[str, Order]]
+    archive: Dict[str, Order]
+
+    def __init__(self, id_prefix: str = "MOCK_ORDER"):
+        self.id_prefix = id_prefix
+        self.last_id = 0
+        self.open_orders = {}
+        self.archive = {}
+        self._keys: Dict[str, OrderKey] = {}
+
+    def __len__(self):
+        return len(self._keys) + len(self.archive)
+
+    def next_order_id(self) -> str:
+        self.last_id += 1
+        return f"{self.id_prefix}_{self.last_id:08d}"
+
+    def add(self, order: Order) -> Order:
+        if order.order_id is None:
+            order.set_order_id(self.next_order_id())
+        if order.status in (enums.OrderStatusEnum.CLOSED, enums.OrderStatusEnum.CANCELED):
+            self.archive[order.order_id] = order
+        else:
+            key = (order.order_type, order.direction)
+            self.open_orders.setdefault(key, {})[order.order_id] = order
+            self._keys[order.order_id] = key
+        return order
+
+    def close(self, order: Order, status: enums.OrderStatusEnum = enums.OrderStatusEnum.CLOSED) -> Order:
+        """
+        Set the final status of an open order and move it to the archive
+        """
+        key = self._keys.pop(order.order_id)
+        bucket = self.open_orders[key]
+        del bucket[order.order_id]
+        if not bucket:
+            del self.open_orders[key]
+        order.status = status
+        self.archive[order.order_id] = order
+        return order
+
+    def get(self, order_id: str) -> Optional[Order]:
+        key = self._keys.get(order_id)
+        if key is not None:
+            return self.open_orders[key][order_id]
+        return self.archive.get(order_id)
+
+    def get_open_orders(self, order_type: enums.OrderTypeEnum = None,
+                        direction: enums.OrderDirectionEnum = None) -> List[Order]:
+        return list(self.iter_open_orders(order_type, direction))
+
+    def iter_open_orders(self, order_type: enums.OrderTypeEnum = None,
+                         direction: enums.OrderDirectionEnum = None) -> Iterator[Order]:
+        for (key_type, key_direction), bucket in list(self.open_orders.items()):
+            if order_type not in (None, key_type) or direction not in (None, key_direction):
+                continue
+            yield from list(bucket.values())
@@ -1,6 +1,8 @@
 import datetime
 from decimal import Decimal
 
+import numpy as np
+
 from src.models.token import Pair
 from src.utils import enums
 
@@ -43,8 +45,38 @@ class StrategyAction:
             yield "exec_dt", self.exec_dt
 
 
+class StrategySignal:
+    """
+    Whole-grid counterpart of StrategyAction used by the vectorized engine:
+    one MARKET order per bar, qty is always a CURRENCY amount (HODL bars have qty 0)
+    """
+    pair: Pair
+    direction: np.ndarray  # int8 OrderDirectionEnum values
+    qty: np.ndarray  # float64
+    qty_unit_type: enums.QtyUnitTypeEnum
+
+    def __init__(self, **params):
+        self.pair = params['pair']
+        self.direction = np.asarray(params['direction'], dtype=np.int8)
+        self.qty = np.broadcast_to(np.asarray(params.get('qty', 0), dtype=np.float64), self.direction.shape)
+        self.qty = np.where(self.direction == enums.OrderDirectionEnum.HODL.value, 0., np.abs(self.qty))
+        self.qty_unit_type = params.get('qty_unit_type', enums.QtyUnitTypeEnum.BASE)
+
+    def __len__(self):
+        return len(self.direction)
+
+    @classmethod
+    def from_target_position(cls, pair: Pair, target: np.ndarray, initial_position: float = 0) -> "StrategySignal":
+        """
+        Build the orders needed to hold `target` base units at the end of each bar
+        """
+        delta = np.diff(np.asarray(target, dtype=np.float64), prepend=initial_position)
+        return cls(pair=pair, direction=np.sign(delta), qty=delta, qty_unit_type=enums.QtyUnitTypeEnum.BASE)
+
+
 class StrategyTestResult:
     original: dict
+    metrics: dict
 
     def __init__(self, original):
         self.original = original
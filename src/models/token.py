@@ -3,22 +3,49 @@ from typing import Any, Union
 
 from src.utils.exception_utils import TokenArithmeticException
 
+_ONE = Decimal(1)
+_NUMBER_TYPES = (int, float, str, Decimal)
+
 
 class Token:
+    __slots__ = ('name', 'symbol', 'min_size', 'exponent', 'quantum', 'scale')
     name: str
     symbol: str
     min_size: Decimal
+    # generated: amounts are stored as integer multiples of quantum = 10 ** exponent
+    exponent: int
+    quantum: Decimal
+    scale: int
 
     def __init__(self, **params):
         self.name = params['name']
         self.symbol = params['symbol']
         self.min_size = Decimal(str(params['min_size']))
+        # same precision as Decimal.quantize(min_size), which only looks at the exponent
+        self.exponent = self.min_size.as_tuple().exponent
+        self.quantum = _ONE.scaleb(self.exponent)
+        self.scale = 10 ** -self.exponent if self.exponent <= 0 else 0
+
+    def to_units(self, value: Union[int, float, str, Decimal]) -> int:
+        if type(value) is int and self.scale:
+            return value * self.scale
+        if type(value) is not Decimal:
+            value = Decimal(str(value))
+        if self.scale:
+            return int(value.quantize(self.quantum) * self.scale)
+        return int(value.quantize(self.quantum).scaleb(-self.exponent))
+
+    def to_amount(self, units: int) -> Decimal:
+        return Decimal(units) * self.quantum
 
     def __eq__(self, other: "Token") -> bool:
         if isinstance(other, Token):
             return self.symbol == other.symbol
         return NotImplemented
 
+    def __hash__(self):
+        return hash(self.symbol)
+
     def __str__(self):
         return f"{self.symbol}".upper()
 
@@ -34,6 +61,14 @@ class Pair:
         self.base = base
         self.quote = quote
 
+    def __eq__(self, other: "Pair") -> bool:
+        if isinstance(other, Pair):
+            return self.base == other.base and self.quote == other.quote
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.base.symbol, self.quote.symbol))
+
     def __str__(self):
         return f"{self.base.symbol}{self.quote.symbol}".upper()
 
@@ -46,12 +81,44 @@ class Pair:
 
 
 class PairSpotPrice:
+    """
+    Price of 1 base token in quote tokens, stored as an integer number of quote token quanta
+    """
+    __slots__ = ('pair', '_units', '_price')
     pair: Pair
-    price: Decimal
+    _units: int
+    _price: Decimal  # cached Decimal view of _units
 
     def __init__(self, **params):
         self.pair: Pair = params['pair']
-        self.price = Decimal(str(params['price'])).quantize(self.pair.quote.min_size)
+        self.units = self.pair.quote.to_units(params['price'])
+
+    @classmethod
+    def from_units(cls, pair: Pair, units: int) -> "PairSpotPrice":
+        spot_price = object.__new__(cls)
+        spot_price.pair = pair
+        spot_price._units = units
+        spot_price._price = None
+        return spot_price
+
+    @property
+    def units(self) -> int:
+        return self._units
+
+    @units.setter
+    def units(self, value: int):
+        self._units = value
+        self._price = None
+
+    @property
+    def price(self) -> Decimal:
+        if self._price is None:
+            self._price = self.pair.quote.to_amount(self._units)
+        return self._price
+
+    @price.setter
+    def price(self, value: Union[int, float, str, Decimal]):
+        self.units = self.pair.quote.to_units(value)
 
     @property
     def inverse_price(self) -> Decimal:
@@ -64,31 +131,38 @@ class PairSpotPrice:
         return f"PairSpotPrice[1 {self.pair.base} = {self.price} {self.pair.quote}]"
 
     def __eq__(self, other: "PairSpotPrice") -> bool:
-        return self.pair == other.pair and self.price == other.price
+        return self.pair == other.pair and self._units == other._units
 
     def __add__(self, other: "PairSpotPrice") -> "PairSpotPrice":
-        if not isinstance(other, PairSpotPrice):
+        if type(other) is not PairSpotPrice:
             raise TokenArithmeticException(f"Unsopported operand type(s) for +: 'PairSpotPrice' and '{type(other)}'")
-        if not self.pair == other.pair:
+        if self.pair is not other.pair and not self.pair == other.pair:
             raise TokenArithmeticException(f"Unsopported operand type(s) for +: '{self.pair}' and '{other.pair}'")
-        return PairSpotPrice(pair=self.pair, price=self.price + other.price)
+        return PairSpotPrice.from_units(self.pair, self._units + other._units)
 
     def __radd__(self, other: Any):
         raise TokenArithmeticException(f"Unsopported operand type(s) for +: '{type(other)}' and '{type(self)}'")
 
     def __sub__(self, other: "PairSpotPrice") -> "PairSpotPrice":
-        if not isinstance(other, PairSpotPrice):
+        if type(other) is not PairSpotPrice:
             raise TokenArithmeticException(f"Unsopported operand type(s) for -: 'PairSpotPrice' and '{type(other)}'")
-        if not self.pair == other.pair:
+        if self.pair is not other.pair and not self.pair == other.pair:
             raise TokenArithmeticException(f"Unsopported operand type(s) for -: '{self.pair}' and '{other.pair}'")
-        return self + (-1 * other)
+        return PairSpotPrice.from_units(self.pair, self._units - other._units)
 
     def __rsub__(self, other: Any):
         raise TokenArithmeticException(f"Unsopported operand type(s) for -: '{type(other)}' and '{type(self)}'")
 
-    def __mul__(self, other: Union[int, float, str, Decimal]) -> "PairSpotPrice":
-        if isinstance(other, int) or isinstance(other, float) or isinstance(other, str) or isinstance(other, Decimal):
-            return PairSpotPrice(pair=self.pair, price=self.price * Decimal(f"{other}"))
+    def __neg__(self) -> "PairSpotPrice":
+        return PairSpotPrice.from_units(self.pair, -self._units)
+
+    def __mul__(self, other: Union[int, float, str, Decimal, "TokenAmount"]) -> Union["PairSpotPrice", "TokenAmount"]:
+        if type(other) is int:
+            return PairSpotPrice.from_units(self.pair, self._units * other)
+        elif isinstance(other, _NUMBER_TYPES):
+            return PairSpotPrice.from_units(self.pair, _mul_units(self._units, other))
+        elif type(other) is TokenAmount:
+            return other * self
         else:
             raise TokenArithmeticException(f"Unsopported operand type(s) for *: '{type(self)}' and '{type(other)}'")
 
@@ -96,9 +170,9 @@ class PairSpotPrice:
         return self * other
 
     def __truediv__(self, other: Union[str, int, float, Decimal, "PairSpotPrice"]) -> Union["PairSpotPrice", Decimal]:
-        if isinstance(other, int) or isinstance(other, float) or isinstance(other, str) or isinstance(other, Decimal):
-            return PairSpotPrice(pair=self.pair, price=self.price / Decimal(f"{other}"))
-        elif isinstance(other, PairSpotPrice):
+        if isinstance(other, _NUMBER_TYPES):
+            return PairSpotPrice.from_units(self.pair, _div_units(self._units, other))
+        elif type(other) is PairSpotPrice:
             if not self.pair == other.pair:
                 raise TokenArithmeticException(f"Unsopported operand type(s) for /: '{self.pair}' and '{other.pair}'")
             return self.price / other.price
@@ -110,12 +184,45 @@ class PairSpotPrice:
 
 
 class TokenAmount:
+    """
+    Amount of a token stored as an integer number of token quanta (see Token.exponent),
+    rounding is the same as Decimal.quantize(min_size) on every operation
+    """
+    __slots__ = ('token', '_units', '_amount')
     token: Token
-    amount: Decimal
+    _units: int
+    _amount: Decimal  # cached Decimal view of _units
 
     def __init__(self, token: Token, amount: Union[int, float, str, Decimal]):
         self.token = token
-        self.amount = Decimal(str(amount)).quantize(token.min_size)
+        self.units = token.to_units(amount)
+
+    @classmethod
+    def from_units(cls, token: Token, units: int) -> "TokenAmount":
+        token_amount = object.__new__(cls)
+        token_amount.token = token
+        token_amount._units = units
+        token_amount._amount = None
+        return token_amount
+
+    @property
+    def units(self) -> int:
+        return self._units
+
+    @units.setter
+    def units(self, value: int):
+        self._units = value
+        self._amount = None
+
+    @property
+    def amount(self) -> Decimal:
+        if self._amount is None:
+            self._amount = self.token.to_amount(self._units)
+        return self._amount
+
+    @amount.setter
+    def amount(self, value: Union[int, float, str, Decimal]):
+        self.units = self.token.to_units(value)
 
     def __str__(self):
         return f"{self.amount} {self.token}"
@@ -124,35 +231,41 @@ class TokenAmount:
         return f"TokenAmount[{self.amount} {self.token}]"
 
     def __eq__(self, other: "TokenAmount") -> bool:
-        return self.token == other.token and self.amount == other.amount
+        return self.token == other.token and self._units == other._units
 
     def __add__(self, other: "TokenAmount") -> "TokenAmount":
-        if not isinstance(other, TokenAmount):
+        if type(other) is not TokenAmount:
             raise TokenArithmeticException(f"Unsopported operand type(s) for +: 'TokenAmount' and '{type(other)}'")
-        if not self.token == other.token:
+        if self.token is not other.token and not self.token == other.token:
             raise TokenArithmeticException(f"Unsopported operand type(s) for +: '{self.token}' and '{other.token}'")
-        return TokenAmount(self.token, self.amount + other.amount)
+        return TokenAmount.from_units(self.token, self._units + other._units)
 
     def __radd__(self, other: "TokenAmount") -> "TokenAmount":
         return self + other
 
     def __sub__(self, other: "TokenAmount") -> "TokenAmount":
-        if not isinstance(other, TokenAmount):
+        if type(other) is not TokenAmount:
             raise TokenArithmeticException(f"Unsopported operand type(s) for -: 'TokenAmount' and '{type(other)}'")
-        if not self.token == other.token:
+        if self.token is not other.token and not self.token == other.token:
             raise TokenArithmeticException(f"Unsopported operand type(s) for -: '{self.token}' and '{other.token}'")
-        return self + (-1 * other)
+        return TokenAmount.from_units(self.token, self._units - other._units)
 
     def __rsub__(self, other: "TokenAmount") -> "TokenAmount":
         return (-1 * self) + other
 
+    def __neg__(self) -> "TokenAmount":
+        return TokenAmount.from_units(self.token, -self._units)
+
     def __mul__(self, other: Union[str, int, float, Decimal, PairSpotPrice]) -> "TokenAmount":
-        if isinstance(other, int) or isinstance(other, float) or isinstance(other, str) or isinstance(other, Decimal):
-            return TokenAmount(self.token, self.amount * Decimal(f"{other}"))
-        elif isinstance(other, PairSpotPrice):
-            if not self.token == other.pair.base:
+        if type(other) is int:
+            return TokenAmount.from_units(self.token, self._units * other)
+        elif type(other) is PairSpotPrice:
+            if self.token is not other.pair.base and not self.token == other.pair.base:
                 raise TokenArithmeticException(f"Unsopported operand type(s) for *: '{self.token}' and '{other.pair.base}'")
-            return TokenAmount(other.pair.quote, self.amount * other.price)
+            # base quanta x quote quanta -> quote quanta
+            return TokenAmount.from_units(other.pair.quote, _shift_units(self._units * other._units, self.token.exponent))
+        elif isinstance(other, _NUMBER_TYPES):
+            return TokenAmount.from_units(self.token, _mul_units(self._units, other))
         else:
             raise TokenArithmeticException(f"Unsopported operand type(s) for *: 'TokenAmount' and '{type(other)}'")
 
@@ -160,13 +273,17 @@ class TokenAmount:
         return self * other
 
     def __truediv__(self, other: Union[str, int, float, Decimal, "TokenAmount", PairSpotPrice]) -> Union["TokenAmount", Decimal]:
-        if isinstance(other, int) or isinstance(other, float) or isinstance(other, str) or isinstance(other, Decimal):
-            return TokenAmount(self.token, self.amount / Decimal(f"{other}"))
-        elif isinstance(other, PairSpotPrice):
-            if not self.token == other.pair.quote:
+        if isinstance(other, _NUMBER_TYPES):
+            return TokenAmount.from_units(self.token, _div_units(self._units, other))
+        elif type(other) is PairSpotPrice:
+            if self.token is not other.pair.quote and not self.token == other.pair.quote:
                 raise TokenArithmeticException(f"Unsopported operand type(s) for /: '{self.token}' and '{other.pair.quote}'")
-            return TokenAmount(other.pair.base, self.amount / other.price)
-        elif isinstance(other, TokenAmount):
+            base = other.pair.base
+            # same significant digits as self.amount / other.price, then quantized to the base token
+            ratio = Decimal(self._units) / Decimal(other._units)
+            shift = self.token.exponent - other.pair.quote.exponent - base.exponent
+            return TokenAmount.from_units(base, int(ratio.scaleb(shift).quantize(_ONE)))
+        elif type(other) is TokenAmount:
             if not self.token == other.token:
                 raise TokenArithmeticException(f"Unsopported operand type(s) for /: '{self.token}' and '{other.token}'")
             return self.amount / other.amount
@@ -175,3 +292,27 @@ class TokenAmount:
 
     def __rtruediv__(self, other: Any):
         raise TokenArithmeticException(f"Unsopported operand type(s) for *: 'TokenAmount' and '{type(other)}'")
+
+
+# Decimal arithmetic on quanta gives the same significant digits as on amounts, the exponent only shifts
+def _mul_units(units: int, other: Union[float, str, Decimal]) -> int:
+    other = other if type(other) is Decimal else Decimal(f"{other}")
+    return int((Decimal(units) * other).quantize(_ONE))
+
+
+def _div_units(units: int, other: Union[int, float, str, Decimal]) -> int:
+    other = other if type(other) is Decimal else Decimal(f"{other}")
+    return int((Decimal(units) / other).quantize(_ONE))
+
+
+def _shift_units(units: int, shift: int) -> int:
+    """
+    units * 10 ** shift rounded half even, as Decimal.quantize does
+    """
+    if shift >= 0:
+        return units * 10 ** shift
+    divisor = 10 ** -shift
+    quotient, remainder = divmod(units, divisor)
+    if remainder * 2 > divisor or (remainder * 2 == divisor and quotient % 2):
+        quotient += 1
+    return quotient
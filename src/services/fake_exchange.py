@@ -0,0 +1,130 @@
+"""
+In-process exchange serving MockConnector accounts over the connections.exchange_connection protocol,
+to drive async markets (paper trading, tests) through real sockets on one event loop.
+"""
+import asyncio
+import json
+from typing import Dict, Optional
+
+from src.connections import exchange_connection
+from src.connections.exchange_connection import order_from_dict, order_to_dict
+from src.connections.mock_connection import MockConnector
+from src.models.order import Order
+from src.models.token import TokenAmount
+from src.utils import enums
+
+
+class FakeExchangeServer:
+    """
+    One MockConnector per account, unknown accounts are opened with `initial_balance` (refused if None).
+    Every request waits `latency` seconds before being served, as a remote exchange would.
+    """
+    host: str
+    port: int  # 0 picks a free port, the bound one once started
+    initial_balance: Optional[dict]
+    period: enums.TimeseriesPeriodEnum
+    latency: float
+    accounts: Dict[str, MockConnector]
+    connections: int  # accepted so far
+    requests: int
+    in_flight: int
+    max_in_flight: int
+
+    def __init__(self, **params):
+        self.host = params.get('host', "127.0.0.1")
+        self.port = params.get('port', 0)
+        self.initial_balance = params.get('initial_balance')
+        self.period = params.get('period')
+        self.latency = params.get('latency', 0.)
+        self.accounts = {}
+        self.connections = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def __aenter__(self) -> "FakeExchangeServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def add_account(self, account: str, initial_balance: dict = None) -> MockConnector:
+        connector = self.accounts[account] = MockConnector(initial_balance or self.initial_balance, self.period)
+        return connector
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = json.loads(line)
+                self.requests += 1
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                try:
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    response = {"id": request["id"], "result": self.handle(request)}
+                except (KeyboardInterrupt, SystemExit, asyncio.CancelledError):
+                    raise
+                except BaseException as e:
+                    # exception_utils exceptions are BaseException, all of them go back to the client
+                    response = {"id": request["id"], "error": {"type": e.__class__.__name__, "message": str(e)}}
+                finally:
+                    self.in_flight -= 1
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def handle(self, request: dict):
+        connector = self.accounts.get(request["account"])
+        if connector is None:
+            if self.initial_balance is None:
+                raise KeyError(f"unknown account {request['account']}")
+            connector = self.add_account(request["account"])
+        method, params = request["method"], request["params"]
+        execution_date = exchange_connection.from_iso(params.get("execution_date"))
+        if method == "get_account_balance":
+            return exchange_connection.balance_to_dict(connector.get_account_balance(execution_date=execution_date))
+        if method == "get_open_orders":
+            return [order_to_dict(order) for order in connector.get_open_orders(execution_date=execution_date)]
+        if method == "get_orders_info":
+            orders = connector.get_orders_info(execution_date=execution_date, order_ids=params["order_ids"])
+            return [order_to_dict(order) for order in orders]
+        if method == "add_order":
+            order = connector.add_order(execution_date=execution_date, order=_read_order(params["order"]))
+            return order_to_dict(order)
+        if method == "add_orders":
+            orders = [_read_order(data) for data in params["orders"]]
+            connector.add_orders(execution_date=execution_date, orders=orders)
+            return [order_to_dict(order) for order in orders]
+        if method == "get_instant_price":
+            price = connector.get_instant_price(pair=exchange_connection.pair_from_str(params["pair"]),
+                                                execution_date=execution_date)
+            return exchange_connection.price_to_dict(price)
+        raise NotImplementedError(f"{method} not supported")
+
+
+def _read_order(data: dict) -> Order:
+    # orders are sent normalized (MockMarket.normalize_input_order), qty is in base currency
+    order = order_from_dict(data)
+    if order.direction != enums.OrderDirectionEnum.HODL:
+        order.qty_token_amount = TokenAmount(order.pair.base, order.qty)
+    return order
@@ -1,9 +1,17 @@
+import hashlib
+from datetime import datetime
 from decimal import Decimal
 
+import numpy as np
 import pandas as pd
-from ta import momentum, trend, volatility
 
-from src.utils.enums import PivotTypeEnum, TimeseriesHorizonEnum
+from src import settings
+from src.models.token import Pair
+from src.utils import price_utils
+from src.utils.enums import PivotTypeEnum, TimeseriesHorizonEnum, TimeseriesPeriodEnum
+from src.utils.feature_cache import Feature, FeatureCache
+
+SECONDS_IN_YEAR = 365 * 24 * 60 * 60  # crypto markets never close
 
 
 def get_rate_of_return(start_value: Decimal, end_value: Decimal) -> Decimal:
@@ -13,48 +21,140 @@ def get_rate_of_return(start_value: Decimal, end_value: Decimal) -> Decimal:
     return rr
 
 
+def get_max_drawdown(values: pd.Series) -> float:
+    # largest peak to trough loss, as a negative rate
+    values = values.astype(float)
+    drawdown = values / values.cummax() - 1
+    return float(drawdown.min()) if len(drawdown) else 0.
+
+
+def _safe_rate_of_return(start_values: np.ndarray, end_values: np.ndarray) -> np.ndarray:
+    # vectorized get_rate_of_return: 0 where the start value is 0 or unknown
+    valid = (start_values != 0) & ~np.isnan(start_values)
+    rr = np.zeros(len(end_values))
+    np.divide(end_values - start_values, start_values, out=rr, where=valid)
+    return rr
+
+
+def get_horizon_start_dates(index: pd.DatetimeIndex, horizon: TimeseriesHorizonEnum) -> pd.DatetimeIndex:
+    """
+    Vectorized TimeseriesHorizonEnum.get_horizon_start_date
+    """
+    if horizon == TimeseriesHorizonEnum.YEAR_TO_DATE:
+        return index.to_period('Y').to_timestamp()
+    elif horizon == TimeseriesHorizonEnum.QUARTER_TO_DATE:
+        return index.to_period('Q').to_timestamp()
+    elif horizon == TimeseriesHorizonEnum.MONTH_TO_DATE:
+        return index.to_period('M').to_timestamp()
+    elif horizon == TimeseriesHorizonEnum.WEEK_TO_DATE:
+        return index.normalize() - pd.to_timedelta(index.weekday, unit='D')
+    elif horizon == TimeseriesHorizonEnum.INCEPTION:
+        return pd.DatetimeIndex(np.full(len(index), np.datetime64(settings.BIG_BANG_DATE, 'ns')))
+    elif horizon == TimeseriesHorizonEnum.HALVENING:
+        halvings = pd.DatetimeIndex(settings.HALVENING_DATES)
+        return halvings[np.maximum(halvings.searchsorted(index, side='right') - 1, 0)]
+    raise NotImplementedError(f"{horizon} not supported")
+
+
 # TIME WEIGHTED = [..., t-1, t, ...] in respect of a date
-def get_time_weighted_rate_of_return(values: pd.Series, horizon: TimeseriesHorizonEnum):
-    rr = {}
-    for dt, val in values.iteritems():
-        start_dt = horizon.get_horizon_start_date(dt)
-        try:
-            start_val = values.loc[start_dt]
-        except KeyError:
-            start_val = Decimal("0")
-        rr[dt] = get_rate_of_return(start_val, val)
-    return pd.Series(rr)
+def get_time_weighted_rate_of_return(values: pd.Series, horizon: TimeseriesHorizonEnum) -> pd.Series:
+    """
+    Return of every value against the value at the start of its horizon (0 if there is no value at that date)
+    """
+    values = values.astype(float)
+    start_dates = get_horizon_start_dates(pd.DatetimeIndex(values.index), horizon)
+    start_values = values[~values.index.duplicated(keep='first')].reindex(start_dates).to_numpy()
+    return pd.Series(_safe_rate_of_return(start_values, values.to_numpy()), index=values.index)
+
+
+def get_time_weighted_rates_of_return(values: pd.Series) -> pd.DataFrame:
+    return pd.DataFrame({str(h): get_time_weighted_rate_of_return(values, h) for h in TimeseriesHorizonEnum})
 
 
 # ROLLING = [..., t-1, t, ...] in respect of [..., t-1-period, t-period, ...]
 def get_rolling_rate_of_return(values: pd.Series, period: int = 1) -> pd.Series:
     if period < 1:
         period = 1
-    rr: pd.Series = values.rolling(window=period + 1, min_periods=0).apply(lambda x: get_rate_of_return(x[0], x[-1]))
+    end_values = values.astype(float).to_numpy()
+    # windows shorter than period + 1 start from the first value
+    start_values = np.concatenate([np.full(min(period, len(end_values)), end_values[:1]), end_values[:-period]])
+    rr = pd.Series(_safe_rate_of_return(start_values, end_values), index=values.index)
     rr.name = "value"
     return rr
 
 
+def get_periods_per_year(index: pd.DatetimeIndex) -> float:
+    if len(index) < 2:
+        return 0.
+    step = np.median(np.diff(index.asi8)) / 10 ** 9
+    return SECONDS_IN_YEAR / step
+
+
+def get_metrics(result: pd.DataFrame, risk_free_rate: float = 0., periods_per_year: float = None,
+                currency: str = None) -> dict:
+    """
+    Performance metrics of a test_result_to_df frame (execution_date, value, tokens..., action).
+    Sharpe and Sortino are annualized, turnover is the traded notional (change of the account currency
+    balance) over the average value.
+    """
+    index = pd.DatetimeIndex(result['execution_date'])
+    values = result['value'].astype(float).to_numpy()
+    if not len(values):
+        return {"bars": 0}
+    periods_per_year = periods_per_year or get_periods_per_year(index)
+    returns = _safe_rate_of_return(values[:-1], values[1:])
+    excess = returns - risk_free_rate / periods_per_year if periods_per_year else returns
+    volatility = returns.std(ddof=1) if len(returns) > 1 else 0.
+    downside = np.sqrt(np.mean(np.minimum(excess, 0) ** 2)) if len(excess) else 0.
+    annualization = np.sqrt(periods_per_year)
+    peaks = np.maximum.accumulate(values)
+    drawdown = _safe_rate_of_return(peaks, values)
+
+    currency = currency or settings.ACCOUNT_BALANCE_CURRENCY
+    turnover = 0.
+    if currency in result.columns:
+        mean_value = np.abs(values).mean()
+        traded = np.abs(np.diff(result[currency].astype(float).to_numpy())).sum()
+        turnover = traded / mean_value if mean_value else 0.
+
+    return {
+        "bars": len(values),
+        "start_value": float(values[0]),
+        "end_value": float(values[-1]),
+        "rate_of_return": float(_safe_rate_of_return(values[:1], values[-1:])[0]),
+        "volatility": float(volatility * annualization),
+        "sharpe_ratio": float(excess.mean() / volatility * annualization) if volatility else 0.,
+        "sortino_ratio": float(excess.mean() / downside * annualization) if downside else 0.,
+        "max_drawdown": float(drawdown.min()),
+        "max_drawdown_date": index[int(np.argmin(drawdown))].to_pydatetime(),
+        "turnover": float(turnover),
+    }
+
+
 def get_ema(values: pd.Series, window: int = 21, fillna=True) -> pd.Series:
+    from ta import trend
     return trend.ema_indicator(values, window=window, fillna=fillna)
 
 
 def get_ma(values: pd.Series, window: int = 21, fillna=True) -> pd.Series:
+    from ta import trend
     return trend.sma_indicator(values, window=window, fillna=fillna)
 
 
 def get_rsi(values: pd.Series, window: int = 14) -> pd.Series:
+    from ta import momentum
     return momentum.rsi(values, window=window, fillna=True)
 
 
 def get_stoch(hlc_values: pd.DataFrame,
               close_col: str = 'Close', high_col: str = 'High', low_col: str = 'Low',
               window: int = 14) -> pd.DataFrame:
+    from ta import momentum
     close_ser = hlc_values[close_col]
     high_ser = hlc_values[high_col]
     low_ser = hlc_values[low_col]
-    stoch_val: pd.Series = momentum.stoch(close_ser, high_ser, low_ser, window=window, fillna=True)
-    stoch_signal_val: pd.Series = momentum.stoch_signal(close_ser, high_ser, low_ser, window=window, fillna=True)
+    stoch_val: pd.Series = momentum.stoch(high_ser, low_ser, close_ser, window=window, fillna=True)
+    stoch_signal_val: pd.Series = momentum.stoch_signal(high_ser, low_ser, close_ser, window=window, fillna=True)
     frame = {'Stoch': stoch_val, 'Stoch Signal': stoch_signal_val}
     return pd.DataFrame(frame)
 
@@ -64,10 +164,11 @@ def get_stoch(hlc_values: pd.DataFrame,
 def get_atr(hlc_values: pd.DataFrame,
             close_col: str = 'Close', high_col: str = 'High', low_col: str = 'Low',
             window: int = 14):
+    from ta import volatility
     close_ser = hlc_values[close_col]
     high_ser = hlc_values[high_col]
     low_ser = hlc_values[low_col]
-    return volatility.average_true_range(close_ser, high_ser, low_ser, window=window, fillna=True)
+    return volatility.average_true_range(high_ser, low_ser, close_ser, window=window, fillna=True)
 
 
 def get_pivot(ts: pd.Series, pivot_type: PivotTypeEnum = None, neighborhood: int = 5) -> pd.Series:
@@ -82,6 +183,47 @@ def get_pivot(ts: pd.Series, pivot_type: PivotTypeEnum = None, neighborhood: int
     return pivot == ts
 
 
+# indicators of a single field (field=...) and of the hlc frame, for get_feature
+SERIES_FEATURES = {"ema": get_ema, "ma": get_ma, "rsi": get_rsi}
+HLC_FEATURES = {"stoch": get_stoch, "atr": get_atr}
+
+
+def get_feature(pair: Pair, indicator: str, from_dt: datetime = None, to_dt: datetime = None,
+                period: TimeseriesPeriodEnum = TimeseriesPeriodEnum.ONE_HOURS, field: str = 'Close',
+                **params) -> Feature:
+    """
+    Memoized indicator over the prices of `pair`, e.g. get_feature(pair, "ema", window=21).
+    Results are kept in the FeatureCache keyed by (pair, period, field, indicator, params, date range)
+    and a checksum of the prices, so sweeps compute every indicator once. The result is shared, do not modify it.
+    """
+    prices = price_utils.PriceRegistry().get_series(pair, period).to_df().loc[from_dt:to_dt]
+    if indicator in SERIES_FEATURES:
+        source = prices[field]
+        compute = lambda: SERIES_FEATURES[indicator](source, **params)
+    elif indicator in HLC_FEATURES:
+        source, field = prices[['High', 'Low', 'Close']], 'HLC'
+        compute = lambda: HLC_FEATURES[indicator](source, **params)
+    else:
+        raise NotImplementedError(f"{indicator} not supported")
+    if not len(prices):
+        return compute()
+
+    checksum = hashlib.blake2b(np.ascontiguousarray(source.to_numpy()).tobytes(), digest_size=16).hexdigest()
+    key = (str(pair), period.value, field, indicator, sorted(params.items()),
+           str(prices.index[0]), str(prices.index[-1]), checksum)
+    return FeatureCache().get_or_compute(key, compute)
+
+
+def get_feature_window(pair: Pair, indicator: str, from_dt: datetime = None, to_dt: datetime = None,
+                       period: TimeseriesPeriodEnum = TimeseriesPeriodEnum.ONE_HOURS, field: str = 'Close',
+                       **params) -> Feature:
+    """
+    get_feature over the whole price history, sliced to [from_dt, to_dt]: every window of a walk-forward
+    shares one computation and starts with warmed up values. Only for causal indicators (not pivots).
+    """
+    return get_feature(pair, indicator, period=period, field=field, **params).loc[from_dt:to_dt]
+
+
 def normalize_dataframe_columns(df: pd.DataFrame, col_name: str) -> pd.Series:
     df_copy = df.copy()
     return (df_copy[col_name] - df_copy[col_name].min()) / (df_copy[col_name].max() - df_copy[col_name].min())
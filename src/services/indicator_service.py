@@ -0,0 +1,232 @@
+"""
+Streaming indicators: every update consumes one candle in O(1) (amortized for rolling min/max)
+and returns the latest value, matching the batch formula_service / ta outputs (fillna=True).
+"""
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from src.models.candle import Candle
+from src.utils.enums import PivotTypeEnum
+
+
+class Indicator(ABC):
+    value: Optional[float]
+    count: int  # candles seen
+
+    def __init__(self):
+        self.value = None
+        self.count = 0
+
+    @abstractmethod
+    def update(self, candle: Candle):
+        pass
+
+
+class SeriesIndicator(Indicator):
+    """
+    Indicator of a single candle field (close by default)
+    """
+    field: str
+
+    def __init__(self, field: str = 'close'):
+        super().__init__()
+        self.field = field.lower()
+
+    def update(self, candle: Candle) -> float:
+        return self.push(getattr(candle, self.field))
+
+    @abstractmethod
+    def push(self, value: float) -> float:
+        pass
+
+
+class RollingExtreme:
+    """
+    Max (or min) of the last `window` values, monotonic deque
+    """
+    window: int
+    sign: int  # 1 max, -1 min
+
+    def __init__(self, window: int, sign: int = 1):
+        self.window = window
+        self.sign = sign
+        self.count = 0
+        self._deque: Deque[Tuple[int, float]] = deque()
+
+    def push(self, value: float) -> float:
+        key = self.sign * value
+        while self._deque and self.sign * self._deque[-1][1] <= key:
+            self._deque.pop()
+        self._deque.append((self.count, value))
+        self.count += 1
+        if self._deque[0][0] <= self.count - 1 - self.window:
+            self._deque.popleft()
+        return self._deque[0][1]
+
+
+class EmaIndicator(SeriesIndicator):
+    window: int
+
+    def __init__(self, window: int = 21, field: str = 'close', fillna: bool = True):
+        super().__init__(field)
+        self.window = window
+        self.fillna = fillna
+        self.alpha = 2 / (window + 1)
+        self._ema = None
+
+    def push(self, value: float) -> float:
+        self.count += 1
+        self._ema = value if self._ema is None else self._ema + self.alpha * (value - self._ema)
+        self.value = self._ema if self.fillna or self.count >= self.window else math.nan
+        return self.value
+
+
+class SmaIndicator(SeriesIndicator):
+    window: int
+
+    def __init__(self, window: int = 21, field: str = 'close', fillna: bool = True):
+        super().__init__(field)
+        self.window = window
+        self.fillna = fillna
+        self._values: Deque[float] = deque()
+        self._sum = 0.
+
+    def push(self, value: float) -> float:
+        self.count += 1
+        self._values.append(value)
+        self._sum += value
+        if len(self._values) > self.window:
+            self._sum -= self._values.popleft()
+        if self.fillna or self.count >= self.window:
+            self.value = self._sum / len(self._values)
+        else:
+            self.value = math.nan
+        return self.value
+
+
+class RsiIndicator(SeriesIndicator):
+    """
+    Wilder RSI (ta.momentum.rsi with fillna=True)
+    """
+    window: int
+
+    def __init__(self, window: int = 14, field: str = 'close'):
+        super().__init__(field)
+        self.window = window
+        self.alpha = 1 / window
+        self._prev = None
+        self._up = None
+        self._down = None
+
+    def push(self, value: float) -> float:
+        self.count += 1
+        diff = value - self._prev if self._prev is not None else 0.
+        self._prev = value
+        up, down = max(diff, 0.), max(-diff, 0.)
+        if self._up is None:
+            self._up, self._down = up, down
+        else:
+            self._up += self.alpha * (up - self._up)
+            self._down += self.alpha * (down - self._down)
+        self.value = 100. if self._down == 0 else 100 - 100 / (1 + self._up / self._down)
+        return self.value
+
+
+class StochIndicator(Indicator):
+    """
+    Stochastic oscillator %K and its signal (SMA of %K), as formula_service.get_stoch
+    """
+    window: int
+    smooth_window: int
+    signal: Optional[float]
+
+    def __init__(self, window: int = 14, smooth_window: int = 3):
+        super().__init__()
+        self.window = window
+        self.smooth_window = smooth_window
+        self.signal = None
+        self._high = RollingExtreme(window, 1)
+        self._low = RollingExtreme(window, -1)
+        self._k: Deque[float] = deque()
+
+    def update(self, candle: Candle) -> float:
+        self.count += 1
+        high = self._high.push(candle.high)
+        low = self._low.push(candle.low)
+        k = 100 * (candle.close - low) / (high - low) if high != low else math.nan
+        self._k.append(k)
+        if len(self._k) > self.smooth_window:
+            self._k.popleft()
+        valid = [v for v in self._k if not math.isnan(v)]
+        signal = sum(valid) / len(valid) if valid else math.nan
+        # nan values are forward filled, 50 if there is nothing to fill with
+        if not math.isnan(k):
+            self.value = k
+        elif self.value is None:
+            self.value = 50.
+        if not math.isnan(signal):
+            self.signal = signal
+        elif self.signal is None:
+            self.signal = 50.
+        return self.value
+
+
+class AtrIndicator(Indicator):
+    """
+    Wilder average true range, 0 until `window` candles are seen (ta.volatility.average_true_range)
+    """
+    window: int
+
+    def __init__(self, window: int = 14):
+        super().__init__()
+        self.window = window
+        self.value = 0.
+        self._prev_close = None
+        self._tr_sum = 0.
+
+    def update(self, candle: Candle) -> float:
+        self.count += 1
+        true_range = candle.high - candle.low
+        if self._prev_close is not None:
+            true_range = max(true_range, abs(candle.high - self._prev_close), abs(candle.low - self._prev_close))
+        self._prev_close = candle.close
+        if self.count < self.window:
+            self._tr_sum += true_range
+        elif self.count == self.window:
+            self.value = (self._tr_sum + true_range) / self.window
+        else:
+            self.value = (self.value * (self.window - 1) + true_range) / self.window
+        return self.value
+
+
+class PivotIndicator(SeriesIndicator):
+    """
+    formula_service.get_pivot on a stream: a value is a pivot if it is the extreme of the `neighborhood`
+    values on both sides, so the flag of a bar is known `neighborhood` bars later.
+    `value` is the flag of the bar `neighborhood` bars back (None while there is none).
+    """
+    pivot_type: PivotTypeEnum
+    neighborhood: int
+
+    def __init__(self, pivot_type: PivotTypeEnum, neighborhood: int = 5, field: str = 'close'):
+        super().__init__(field)
+        if pivot_type not in (PivotTypeEnum.HIGH, PivotTypeEnum.LOW):
+            raise Exception('type must be specified')
+        self.pivot_type = pivot_type
+        self.neighborhood = neighborhood
+        self._extreme = RollingExtreme(neighborhood * 2 + 1, 1 if pivot_type == PivotTypeEnum.HIGH else -1)
+        self._values: Deque[float] = deque(maxlen=neighborhood + 1)
+
+    def push(self, value: float) -> Optional[bool]:
+        self.count += 1
+        extreme = self._extreme.push(value)
+        self._values.append(value)
+        self.value = self._values[0] == extreme if self.count > self.neighborhood else None
+        return self.value
+
+
+def update_indicators(indicators: Dict[str, Indicator], candle: Candle):
+    for indicator in indicators.values():
+        indicator.update(candle)
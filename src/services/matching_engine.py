@@ -0,0 +1,177 @@
+import heapq
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple, Union
+
+from src.models.candle import Candle
+from src.models.order import Order
+from src.models.order_book import OrderBook
+from src.models.token import Pair
+from src.utils import enums
+from src.utils.exception_utils import InvalidOrderPriceException, OrderTypeNotSupportedException
+
+# a leg triggers when the market trades at or below (BELOW) / at or above (ABOVE) its price
+BELOW, ABOVE = -1, 1
+# a triggered leg either fills or becomes a limit order at order.price2
+FILL, LIMIT = "FILL", "LIMIT"
+
+Price = Union[Decimal, float]
+# (heap key, seq, order_id, version, price, action, active_after)
+Entry = Tuple[Price, int, str, int, Decimal, str, Optional[datetime]]
+
+
+def _get_sides(order: Order) -> Tuple[int, int]:
+    # (limit side, stop side): a buy limit waits for the price to fall, a buy stop for the price to rise
+    if order.direction == enums.OrderDirectionEnum.BUY:
+        return BELOW, ABOVE
+    return ABOVE, BELOW
+
+
+def get_legs(order: Order) -> List[Tuple[int, Decimal, str]]:
+    """
+    Trigger legs of a resting order as (side, price, action).
+    *_LIMIT orders trigger at order.price and then rest as a limit order at order.price2,
+    TAKE_PROFIT_STOP_LOSS_LIMIT is a bracket: take profit at order.price, stop loss at order.price2, first one wins.
+    """
+    limit_side, stop_side = _get_sides(order)
+    order_type = order.order_type
+    if order_type in (enums.OrderTypeEnum.LIMIT, enums.OrderTypeEnum.TAKE_PROFIT):
+        legs = [(limit_side, order.price, FILL)]
+    elif order_type == enums.OrderTypeEnum.STOP_LOSS:
+        legs = [(stop_side, order.price, FILL)]
+    elif order_type == enums.OrderTypeEnum.STOP_LOSS_LIMIT:
+        legs = [(stop_side, order.price, LIMIT)]
+    elif order_type == enums.OrderTypeEnum.TAKE_PROFIT_LIMIT:
+        legs = [(limit_side, order.price, LIMIT)]
+    elif order_type == enums.OrderTypeEnum.TAKE_PROFIT_STOP_LOSS_LIMIT:
+        legs = [(limit_side, order.price, FILL), (stop_side, order.price2, FILL)]
+    else:
+        raise OrderTypeNotSupportedException(f"{order_type} orders do not rest on the book")
+
+    needs_price2 = order_type not in (enums.OrderTypeEnum.LIMIT, enums.OrderTypeEnum.TAKE_PROFIT,
+                                      enums.OrderTypeEnum.STOP_LOSS)
+    if order.price is None or (needs_price2 and order.price2 is None):
+        raise InvalidOrderPriceException(f"missing price for {order_type} order {order.order_id}")
+    return legs
+
+
+def get_reserve_price(order: Order) -> Decimal:
+    """
+    Highest price a resting BUY order can fill at (without gaps), used to reserve the quote amount
+    """
+    if order.order_type in (enums.OrderTypeEnum.STOP_LOSS_LIMIT, enums.OrderTypeEnum.TAKE_PROFIT_LIMIT):
+        return order.price2
+    elif order.order_type == enums.OrderTypeEnum.TAKE_PROFIT_STOP_LOSS_LIMIT:
+        return max(order.price, order.price2)
+    return order.price
+
+
+class PairOrderBook:
+    below: List[Entry]  # max-heap on price
+    above: List[Entry]  # min-heap on price
+
+    def __init__(self):
+        self.below = []
+        self.above = []
+
+    def __len__(self):
+        return len(self.below) + len(self.above)
+
+    def get_heap(self, side: int) -> List[Entry]:
+        return self.below if side == BELOW else self.above
+
+
+class MatchingEngine:
+    """
+    Resting limit/stop orders in price-sorted heaps per pair.
+    Every bar is walked along its intrabar path (see enums.IntrabarPathEnum): each segment pops the triggered
+    orders off the heaps, so a bar costs O(filled orders * log(resting orders)).
+    Orders triggered by the open price (gaps) fill at the open, the others at their trigger price.
+    """
+    intrabar_path: enums.IntrabarPathEnum
+    books: Dict[Pair, PairOrderBook]
+    versions: Dict[str, int]  # order_id -> version of its live legs
+
+    def __init__(self, intrabar_path: enums.IntrabarPathEnum = enums.IntrabarPathEnum.NEAREST):
+        self.intrabar_path = intrabar_path
+        self.books = {}
+        self.versions = {}
+        # plain counters, the engine is pickled by StrategyTester checkpoints
+        self._seq = 0
+        self._version = 0
+
+    def __len__(self):
+        return len(self.versions)
+
+    def get_pairs(self) -> List[Pair]:
+        return [pair for pair, book in self.books.items() if book]
+
+    def add(self, order: Order, active_after: datetime = None):
+        legs = get_legs(order)
+        version = self.versions[order.order_id] = self._next_version()
+        for side, price, action in legs:
+            self._push(order.pair, side, price, order.order_id, version, action, active_after)
+
+    def _next_version(self) -> int:
+        self._version += 1
+        return self._version
+
+    def remove(self, order_id: str):
+        # legs left on the heaps are dropped lazily
+        self.versions.pop(order_id, None)
+
+    def _push(self, pair: Pair, side: int, price: Decimal, order_id: str, version: int, action: str,
+              active_after: Optional[datetime]):
+        book = self.books.get(pair)
+        if book is None:
+            book = self.books[pair] = PairOrderBook()
+        key = -price if side == BELOW else price
+        self._seq += 1
+        heapq.heappush(book.get_heap(side), (key, self._seq, order_id, version, price, action, active_after))
+
+    def match(self, pair: Pair, candle: Candle, orders: OrderBook) -> List[Tuple[Order, Price]]:
+        """
+        Orders of `pair` filled by `candle`, in fill order, with their fill price.
+        Filled orders are removed from the engine.
+        """
+        book = self.books.get(pair)
+        fills = []
+        if not book:
+            return fills
+        deferred = []
+        path = self.intrabar_path.get_path(candle.open, candle.high, candle.low, candle.close)
+        prev = path[0]
+        for i, point in enumerate(path):
+            low, high = min(prev, point), max(prev, point)
+            gap_price = point if i == 0 else None
+            while book.below and book.below[0][4] >= low:
+                self._trigger(book.below, heapq.heappop(book.below), candle.date, gap_price, orders, fills, deferred)
+            while book.above and book.above[0][4] <= high:
+                self._trigger(book.above, heapq.heappop(book.above), candle.date, gap_price, orders, fills, deferred)
+            prev = point
+        for heap, entry in deferred:
+            heapq.heappush(heap, entry)
+        return fills
+
+    def _trigger(self, heap: List[Entry], entry: Entry, execution_date: datetime, gap_price: Optional[float],
+                 orders: OrderBook, fills: list, deferred: list):
+        _, _, order_id, version, price, action, active_after = entry
+        if self.versions.get(order_id) != version:
+            return
+        if active_after is not None and execution_date <= active_after:
+            # triggered earlier in this bar, only later prices can fill it
+            deferred.append((heap, entry))
+            return
+        order = orders.get(order_id)
+        if order is None:
+            return
+        trigger_price = price if gap_price is None else gap_price
+        if action == LIMIT:
+            limit_side, _ = _get_sides(order)
+            marketable = order.price2 >= trigger_price if limit_side == BELOW else order.price2 <= trigger_price
+            if not marketable:
+                version = self.versions[order_id] = self._next_version()
+                self._push(order.pair, limit_side, order.price2, order_id, version, FILL, execution_date)
+                return
+        del self.versions[order_id]
+        fills.append((order, trigger_price))
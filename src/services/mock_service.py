@@ -1,18 +1,23 @@
 import json
 from datetime import datetime
 from decimal import Decimal
-from typing import List
+from typing import Dict, List, Tuple, Union
 
 import pandas as pd
 
 from src import settings
+from src.models.candle import Candle
 from src.models.mock_user import MockAccountBalance
 from src.models.order import Order
+from src.models.order_book import OrderBook
 from src.models.token import Pair, PairSpotPrice
 from src.models.user import TokenAmount
+from src.services import matching_engine
+from src.services.matching_engine import MatchingEngine
 from src.utils import price_utils, enums, token_utils
+from src.utils.profiling_utils import StageProfiler
 from src.utils.exception_utils import MissingExecutionDateException, OrderTypeNotSupportedException, \
-    OrderStatusNotSupportedException
+    OrderStatusNotSupportedException, NotEnoughMoneyException
 
 
 def refresh_status(fn):
@@ -21,36 +26,32 @@ def refresh_status(fn):
             raise MissingExecutionDateException()
 
         _self: MockService = args[0]
-        if kwargs['execution_date'] >= _self.account_balance.update_date:
-            # esistono ordini aperti?
-            open_orders = _self._get_open_orders()
-            for order in open_orders:
-                if order.order_type == enums.OrderTypeEnum.MARKET:
-                    _self._update_balance(order, kwargs['execution_date'])
-                    order.status = enums.OrderStatusEnum.CLOSED
-                elif order.order_type == enums.OrderTypeEnum.LIMIT:
-                    candle = _self._get_price(kwargs['execution_date'])
-                    if order.direction == enums.OrderDirectionEnum.BUY:
-                        if order.price >= candle['Low']:
-                            _self._update_balance(order, kwargs['execution_date'])
-                            order.status = enums.OrderStatusEnum.CLOSED
-                    elif order.direction == enums.OrderDirectionEnum.SELL:
-                        if order.price <= candle['High']:
-                            _self._update_balance(order, kwargs['execution_date'])
-                            order.status = enums.OrderStatusEnum.CLOSED
-                else:
-                    raise OrderTypeNotSupportedException()
+        execution_date = kwargs['execution_date']
+        if execution_date >= _self.account_balance.update_date:
+            with StageProfiler().stage("matching"):
+                # esistono ordini aperti?
+                for order in _self.orders.get_open_orders(order_type=enums.OrderTypeEnum.MARKET):
+                    _self._update_balance(order, execution_date)
+                    _self.orders.close(order)
+                for pair in _self.matching_engine.get_pairs():
+                    candle = _self._get_price(pair, execution_date)
+                    for order, price in _self.matching_engine.match(pair, candle, _self.orders):
+                        order.info.exec_price = Decimal(str(price))
+                        _self._update_balance(order, execution_date)
+                        _self.orders.close(order)
         return fn(*args, **kwargs)
 
     return wrapper
 
 
 class MockService:
-    prices: pd.DataFrame  # TODO {"BTCUSD": pd.DataFrame, "ETHUSD": pd.DataFrame, ...}
+    prices: price_utils.PriceRegistry
+    period: enums.TimeseriesPeriodEnum
     account_balance: MockAccountBalance
-    orders: List[Order]
+    orders: OrderBook
+    matching_engine: MatchingEngine
 
-    def __init__(self, initial_balance: dict = None):
+    def __init__(self, initial_balance: dict = None, period: enums.TimeseriesPeriodEnum = None):
         if initial_balance:
             balance_dict = initial_balance
         else:
@@ -61,34 +62,69 @@ class MockService:
                 balance_dict = settings.DEFAULT_MOCK_BALANCE
         balance = [TokenAmount(token_utils.get_token_info(token), amount) for token, amount in balance_dict.items()]
         self.account_balance = MockAccountBalance(balance)
-        self.prices = price_utils.get_ohlc_prices()
-        self.orders = []
+        self.prices = price_utils.PriceRegistry()
+        # bar size of the candles used for fills and prices, the stored series if None
+        self.period = period
+        self.orders = OrderBook()
+        self.matching_engine = MatchingEngine(enums.IntrabarPathEnum(settings.MOCK_MARKET_INTRABAR_PATH))
 
-    def _get_open_orders(self):
-        return [o for o in self.orders if o.status == enums.OrderStatusEnum.OPEN]
+    def __getstate__(self):
+        # prices are process wide, a checkpoint holds the account state only
+        state = self.__dict__.copy()
+        del state['prices']
+        return state
 
-    def _get_price(self, pair: Pair, dt: datetime) -> pd.Series:
-        # TODO integrare pair
-        norm_dt = dt.replace(minute=0, second=0, microsecond=0)
-        return self.prices.loc[norm_dt]
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.prices = price_utils.PriceRegistry()
+
+    def _get_open_orders(self) -> List[Order]:
+        return self.orders.get_open_orders()
+
+    def _get_price(self, pair: Pair, dt: datetime) -> Candle:
+        return self.prices.get_candle(pair, dt, self.period)
+
+    def get_candle(self, pair: Pair, execution_date: datetime) -> Candle:
+        return self._get_price(pair, execution_date)
+
+    def get_candles(self, pair: Pair, dates: pd.DatetimeIndex) -> pd.DataFrame:
+        # vectorized _get_price over a whole date grid
+        return self.prices.get_candles(pair, dates, self.period)
 
     def _get_order_price(self, order: Order, dt: datetime) -> PairSpotPrice:
-        candle = self._get_price(order.pair, dt)
+        if order.info.exec_price:
+            return PairSpotPrice(pair=order.pair, price=order.info.exec_price)
         if order.order_type == enums.OrderTypeEnum.MARKET:
+            candle = self._get_price(order.pair, dt)
             spot_price = PairSpotPrice(pair=order.pair, price=candle.mean())
             return spot_price
-        elif order.order_type == enums.OrderTypeEnum.LIMIT:
-            return PairSpotPrice(pair=order.pair, price=order.price)
+        # resting order not filled yet
+        return PairSpotPrice(pair=order.pair, price=matching_engine.get_reserve_price(order))
 
     def _update_balance(self, order: Order, execution_date: datetime):
+        for token_symbol, amount in self._get_balance_deltas(order, order.status, execution_date):
+            self.account_balance.update_balance(token_symbol, amount, execution_date)
+
+    def _get_balance_deltas(self, order: Order, status: enums.OrderStatusEnum,
+                            execution_date: datetime) -> List[Tuple[str, Union[Decimal, TokenAmount]]]:
+        """
+        Balance changes of opening (CREATED) or closing (OPEN) `order`
+        """
+        deltas = []
         fee = Decimal("0")
         if order.direction == enums.OrderDirectionEnum.BUY:
             # case OPENING ORDER
-            if order.status == enums.OrderStatusEnum.CREATED:
+            if status == enums.OrderStatusEnum.CREATED:
                 token_symbol = order.pair.quote.symbol
                 amount = order.qty_token_amount * self._get_order_price(order, execution_date) * -1
+                order.info.cost = -amount.amount
             # case CLOSING ORDER
-            elif order.status == enums.OrderStatusEnum.OPEN:
+            elif status == enums.OrderStatusEnum.OPEN:
+                if order.order_type != enums.OrderTypeEnum.MARKET:
+                    # give back the difference between the reserved and the fill price
+                    cost = (order.qty_token_amount * self._get_order_price(order, execution_date)).amount
+                    deltas.append((order.pair.quote.symbol, order.info.cost - cost))
+                    order.info.cost = cost
                 token_symbol = order.pair.base.symbol
                 amount = order.qty_token_amount.amount
                 fee = amount * (settings.MOCK_MARKET_FEE / Decimal("100"))
@@ -97,11 +133,11 @@ class MockService:
                 raise OrderStatusNotSupportedException()
         elif order.direction == enums.OrderDirectionEnum.SELL:
             # case OPENING ORDER
-            if order.status == enums.OrderStatusEnum.CREATED:
+            if status == enums.OrderStatusEnum.CREATED:
                 token_symbol = order.pair.base.symbol
                 amount = -1 * order.qty_token_amount
             # case CLOSING ORDER
-            elif order.status == enums.OrderStatusEnum.OPEN:
+            elif status == enums.OrderStatusEnum.OPEN:
                 token_symbol = order.pair.quote.symbol
                 amount = order.qty_token_amount * self._get_order_price(order, execution_date)
                 fee = amount * (settings.MOCK_MARKET_FEE / Decimal("100"))
@@ -111,7 +147,28 @@ class MockService:
         else:
             raise OrderTypeNotSupportedException()
         # TODO passare direttamente token_amount
-        self.account_balance.update_balance(token_symbol, amount, execution_date)
+        deltas.append((token_symbol, amount))
+        return deltas
+
+    def _apply_balance_deltas(self, deltas: List[Tuple[str, Union[Decimal, TokenAmount]]], execution_date: datetime):
+        """
+        Sum of `deltas` by token, applied once per token and only if the balance covers all of them
+        """
+        units: Dict[str, int] = {}
+        for token_symbol, amount in deltas:
+            token_amount = self.account_balance.get_token_amount_by_symbol(token_symbol)
+            if not token_amount:
+                raise NotEnoughMoneyException()
+            # quantized delta by delta, as update_balance does
+            units[token_symbol] = units.get(token_symbol, 0) + (
+                amount.units if isinstance(amount, TokenAmount) else token_amount.token.to_units(amount))
+        if not settings.NEGATIVE_BALANCE_AMOUNT:
+            for token_symbol, total in units.items():
+                if self.account_balance.get_token_amount_by_symbol(token_symbol).units + total < 0:
+                    raise NotEnoughMoneyException()
+        for token_symbol, total in units.items():
+            token = self.account_balance.get_token_amount_by_symbol(token_symbol).token
+            self.account_balance.update_balance(token_symbol, TokenAmount.from_units(token, total), execution_date)
 
     @refresh_status
     def get_account_balance(self, execution_date) -> MockAccountBalance:
@@ -126,7 +183,7 @@ class MockService:
         ids = params['order_ids']
         result = []
         for id in ids:
-            res = next((o for o in self.orders if o.order_id == id), None)
+            res = self.orders.get(id)
             if res:
                 result.append(res)
         return result
@@ -134,15 +191,46 @@ class MockService:
     @refresh_status
     def add_order(self, execution_date, **params) -> Order:
         order = params['order']
-        order.set_order_id("MOCK_ORDER")
+        order.set_order_id(self.orders.next_order_id())
+        if order.order_type != enums.OrderTypeEnum.MARKET:
+            # raises on unsupported types and missing prices before touching the balance
+            matching_engine.get_legs(order)
         self._update_balance(order, execution_date)
         order.status = enums.OrderStatusEnum.OPEN
+        self.orders.add(order)
         if order.order_type == enums.OrderTypeEnum.MARKET:
             self._update_balance(order, execution_date)
-            order.status = enums.OrderStatusEnum.CLOSED
-        self.orders.append(order)
+            self.orders.close(order)
+        else:
+            self.matching_engine.add(order)
         return order
 
+    @refresh_status
+    def add_orders(self, execution_date, **params) -> List[Order]:
+        """
+        add_order for many orders: the balance changes of the batch are summed by token and applied at once,
+        no order is added if the balance does not cover the batch
+        """
+        orders: List[Order] = params['orders']
+        for order in orders:
+            if order.order_type != enums.OrderTypeEnum.MARKET:
+                matching_engine.get_legs(order)
+        deltas = []
+        for order in orders:
+            deltas += self._get_balance_deltas(order, enums.OrderStatusEnum.CREATED, execution_date)
+            if order.order_type == enums.OrderTypeEnum.MARKET:
+                deltas += self._get_balance_deltas(order, enums.OrderStatusEnum.OPEN, execution_date)
+        self._apply_balance_deltas(deltas, execution_date)
+        for order in orders:
+            order.set_order_id(self.orders.next_order_id())
+            order.status = enums.OrderStatusEnum.OPEN
+            self.orders.add(order)
+            if order.order_type == enums.OrderTypeEnum.MARKET:
+                self.orders.close(order)
+            else:
+                self.matching_engine.add(order)
+        return orders
+
     def get_instant_price(self, pair: Pair, execution_date: datetime = datetime.utcnow()) -> PairSpotPrice:
         spot_price = PairSpotPrice(pair=pair, price=self._get_price(pair, execution_date).mean())
         return spot_price
@@ -0,0 +1,70 @@
+"""
+Mark to market of an account balance in the account currency.
+Marks are looked up once per pair and bar, a token is revalued only when its amount or its mark changed
+and the equity is a running sum, kept in currency quanta.
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, Optional, Tuple
+
+from src import settings
+from src.models.token import Pair, PairSpotPrice, Token
+from src.models.user import AccountBalance
+
+# (pair, execution_date) -> price of the pair at the bar of execution_date
+GetPrice = Callable[[Pair, datetime], PairSpotPrice]
+
+
+class PortfolioValuation:
+    currency: Token
+    get_price: GetPrice
+    pairs: Dict[str, Pair]  # token symbol -> token / currency pair
+    marks: Dict[Pair, Tuple[datetime, PairSpotPrice]]  # pair -> bar, mark, may be shared by valuations
+    positions: Dict[str, Tuple[int, Optional[int], int]]  # token symbol -> amount, mark and value units
+    equity_units: int
+
+    def __init__(self, get_price: GetPrice, currency: Token = None, marks: dict = None):
+        self.currency = currency or settings.ACCOUNT_BALANCE_CURRENCY_TOKEN_INFO
+        self.get_price = get_price
+        self.pairs = {}
+        # keyed by pair: valuations over the same prices can share it whatever their currency
+        self.marks = {} if marks is None else marks
+        self.positions = {}
+        self.equity_units = 0
+
+    @property
+    def equity(self) -> Decimal:
+        return self.currency.to_amount(self.equity_units)
+
+    def get_mark(self, token: Token, execution_date: datetime) -> PairSpotPrice:
+        pair = self.pairs.get(token.symbol)
+        if pair is None:
+            pair = self.pairs[token.symbol] = Pair(token, self.currency)
+        mark = self.marks.get(pair)
+        if mark is None or mark[0] != execution_date:
+            mark = self.marks[pair] = (execution_date, self.get_price(pair, execution_date))
+        return mark[1]
+
+    def update(self, account_balance: AccountBalance, execution_date: datetime) -> Decimal:
+        for token_amount in account_balance.balance:
+            symbol = token_amount.token.symbol
+            units = token_amount.units
+            position = self.positions.get(symbol)
+            if units == 0:
+                # nothing held, no price needed
+                mark_units, value_units = None, 0
+            elif symbol == self.currency.symbol:
+                mark_units, value_units = None, units
+            else:
+                mark = self.get_mark(token_amount.token, execution_date)
+                if position is not None and position[0] == units and position[1] == mark.units:
+                    continue
+                mark_units, value_units = mark.units, (token_amount * mark).units
+            self.equity_units += value_units - (position[2] if position is not None else 0)
+            self.positions[symbol] = (units, mark_units, value_units)
+        if len(self.positions) > len(account_balance.balance):
+            # tokens left out of the balance (a remote exchange omits empty ones) are no longer held
+            held = {token_amount.token.symbol for token_amount in account_balance.balance}
+            for symbol in [symbol for symbol in self.positions if symbol not in held]:
+                self.equity_units -= self.positions.pop(symbol)[2]
+        return self.equity
@@ -1,11 +1,10 @@
 import os
 from datetime import datetime
 from decimal import Decimal
-from distutils.util import strtobool
 
 from dotenv import load_dotenv
 
-from src.utils import token_utils
+from src.utils.type_utils import strtobool
 
 load_dotenv()
 
@@ -13,6 +12,9 @@ SRC_DIR = os.path.dirname(os.path.abspath(__file__))
 SHITTY_CONNECTION = bool(strtobool(os.getenv('SHITTY_CONNECTION', "False")))
 DEBUG = bool(strtobool(os.getenv('DEBUG', "True")))
 BIG_BANG_DATE = datetime(2017, 1, 1)
+# genesis block and bitcoin halvings (UTC day)
+HALVENING_DATES = [datetime(2009, 1, 3), datetime(2012, 11, 28), datetime(2016, 7, 9), datetime(2020, 5, 11),
+                   datetime(2024, 4, 20)]
 
 # TODO mettere in env
 MONGO_URL = os.getenv('MONGO_URL')
@@ -22,16 +24,47 @@ KRAKEN_API_SECRET = os.getenv('KRAKEN_API_SECRET')
 KRAKEN_BASE_URL = os.getenv('KRAKEN_BASE_URL', "https://api.kraken.com")
 
 MOCK_MARKET_FEE = Decimal("0.24")  # percentage
+# OHLC | OLHC | NEAREST, see enums.IntrabarPathEnum
+MOCK_MARKET_INTRABAR_PATH = os.getenv('MOCK_MARKET_INTRABAR_PATH', "NEAREST")
 
 DEFAULT_MOCK_BALANCE = {
     "BTC": "0.1",
     "USD": "1000",
 }
+RESOURCES_DIR = os.getenv('RESOURCES_DIR', f"{SRC_DIR}/../resources")
+PRICE_STORE_DIR = os.getenv('PRICE_STORE_DIR', f"{RESOURCES_DIR}/price_store")
+# indicator memoization, see utils.feature_cache (no disk tier if FEATURE_CACHE_DIR is not set)
+FEATURE_CACHE_MAX_BYTES = int(os.getenv('FEATURE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+FEATURE_CACHE_DIR = os.getenv('FEATURE_CACHE_DIR')
+# per-stage timing of the StrategyTester bar loop, see utils.profiling_utils
+BACKTEST_PROFILE = bool(strtobool(os.getenv('BACKTEST_PROFILE', "False")))
+# bars between two StrategyTester checkpoints (when a checkpoint_path is given)
+BACKTEST_CHECKPOINT_BARS = int(os.getenv('BACKTEST_CHECKPOINT_BARS', 10000))
+# local copy of the prices fetched from the remote price service, see utils.price_cache
+PRICE_CACHE_DIR = os.getenv('PRICE_CACHE_DIR', f"{PRICE_STORE_DIR}/remote")
+PRICE_FETCH_CHUNK_BARS = int(os.getenv('PRICE_FETCH_CHUNK_BARS', 2000))
+PRICE_FETCH_WORKERS = int(os.getenv('PRICE_FETCH_WORKERS', 4))
+# results of cmd_run_benchmarks.py --save, see backtest_benchmark
+BENCHMARK_BASELINE_FILE = os.getenv('BENCHMARK_BASELINE_FILE', f"{RESOURCES_DIR}/benchmark_baseline.json")
+# connections kept open to an exchange by an ExchangeConnector pool, see connections.exchange_connection
+EXCHANGE_POOL_SIZE = int(os.getenv('EXCHANGE_POOL_SIZE', 8))
 MOCK_BALANCE_CONFIG_FILE = os.getenv('MOCK_BALANCE_CONFIG_FILE', f"{SRC_DIR}/../config/balance.json")
 KRAKEN_TOKEN_INFO_FILE = os.getenv('KRAKEN_TOKEN_INFO_FILE', f"{SRC_DIR}/../config/kraken_assets.json")
+TOKEN_CATALOG_SNAPSHOT_FILE = f"{SRC_DIR}/../resources/token_catalog.json"
+TOKEN_CATALOG_FILE = os.getenv('TOKEN_CATALOG_FILE', f"{SRC_DIR}/../config/token_catalog.json")
+# fall back to the coinbase api for tokens missing from the catalog
+TOKEN_CATALOG_ONLINE = bool(strtobool(os.getenv('TOKEN_CATALOG_ONLINE', "False")))
 
 NEGATIVE_BALANCE_AMOUNT = bool(strtobool(os.getenv('NEGATIVE_BALANCE_AMOUNT', "True")))
 ACCOUNT_BALANCE_CURRENCY = "USD"
-ACCOUNT_BALANCE_CURRENCY_TOKEN_INFO = token_utils.get_token_info(ACCOUNT_BALANCE_CURRENCY)
 
 USE_DYNAMO = False
+
+
+def __getattr__(name: str):
+    # resolved on first access, token_utils is not imported with the settings
+    if name == 'ACCOUNT_BALANCE_CURRENCY_TOKEN_INFO':
+        from src.utils import token_utils
+        value = globals()[name] = token_utils.get_token_info(ACCOUNT_BALANCE_CURRENCY)
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
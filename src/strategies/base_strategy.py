@@ -1,16 +1,24 @@
 import random
 from abc import ABC, abstractmethod
 from datetime import datetime
+from typing import Dict, List, Union
 
+import numpy as np
+import pandas as pd
+
+from src.models.candle import Candle
 from src.models.order import Order
-from src.models.strategy import StrategyAction
+from src.models.strategy import StrategyAction, StrategySignal
 from src.models.token import Pair
+from src.services import indicator_service
 from src.utils import enums
 
 
 class Strategy(ABC):
     execute_date: datetime
     pair: Pair
+    # streaming indicators, updated by the engine with the candle of every bar before _execute
+    indicators: Dict[str, indicator_service.Indicator] = None
 
     def __str__(self):
         return self.__class__.__name__
@@ -20,7 +28,7 @@ class Strategy(ABC):
         pass
 
     @abstractmethod
-    def action_to_order(self, action: StrategyAction) -> Order:
+    def action_to_order(self, action: StrategyAction) -> Union[Order, List[Order]]:
         raise NotImplementedError('not implemented')
 
     def execute(self, **params) -> StrategyAction:
@@ -28,6 +36,16 @@ class Strategy(ABC):
         self.pair = params.pop('pair')
         return self._execute(**params)
 
+    def update_indicators(self, candle: Candle):
+        indicator_service.update_indicators(self.indicators, candle)
+
+    def generate_signal(self, pair: Pair, dates: pd.DatetimeIndex, prices: pd.DataFrame, **params) -> StrategySignal:
+        """
+        Vectorized engine entry point: return the orders for the whole `dates` grid at once.
+        `prices` holds the OHLC candles aligned to `dates`.
+        """
+        raise NotImplementedError(f'{self} does not support vectorized execution')
+
 
 class HodlStrategy(Strategy):
     def _execute(self, **params) -> StrategyAction:
@@ -37,9 +55,21 @@ class HodlStrategy(Strategy):
     def action_to_order(self, action: StrategyAction) -> Order:
         return Order(**dict(action))
 
+    def generate_signal(self, pair: Pair, dates: pd.DatetimeIndex, prices: pd.DataFrame, **params) -> StrategySignal:
+        return StrategySignal(pair=pair, direction=np.zeros(len(dates)))
+
 
 class DollarCostAveragingStrategy(Strategy):
+    amount: str  # quote currency bought each time
+    hour: int  # buy only at this hour of the day, every bar if None
+
+    def __init__(self, amount: str = "50", hour: int = None):
+        self.amount = str(amount)
+        self.hour = hour
+
     def _execute(self, **params) -> StrategyAction:
+        if self.hour is not None and self.execute_date.hour != self.hour:
+            return StrategyAction(pair=self.pair, direction=enums.OrderDirectionEnum.HODL)
         # Buy at random hour of the day
         today = datetime.utcnow()
         random_hour = random.randint(0, 23)
@@ -49,7 +79,7 @@ class DollarCostAveragingStrategy(Strategy):
         action = StrategyAction(pair=self.pair,
                                 direction=enums.OrderDirectionEnum.BUY,
                                 order_type=enums.OrderTypeEnum.MARKET,
-                                qty="50",
+                                qty=self.amount,
                                 qty_unit_type=enums.QtyUnitTypeEnum.QUOTE,
                                 qty_type=enums.QtyTypeEnum.CURRENCY,
                                 exec_dt=self.execute_date)
@@ -57,3 +87,12 @@ class DollarCostAveragingStrategy(Strategy):
 
     def action_to_order(self, action: StrategyAction) -> Order:
         return Order(**dict(action))
+
+    def generate_signal(self, pair: Pair, dates: pd.DatetimeIndex, prices: pd.DataFrame, **params) -> StrategySignal:
+        # the execution hour only changes exec_dt, every bar is filled on its own candle
+        is_buy = np.ones(len(dates), dtype=bool) if self.hour is None else dates.hour == self.hour
+        direction = np.where(is_buy, enums.OrderDirectionEnum.BUY.value, enums.OrderDirectionEnum.HODL.value)
+        return StrategySignal(pair=pair,
+                              direction=direction,
+                              qty=float(self.amount),
+                              qty_unit_type=enums.QtyUnitTypeEnum.QUOTE)
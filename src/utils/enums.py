@@ -1,4 +1,5 @@
-from datetime import datetime
+import bisect
+from datetime import datetime, timedelta
 from decimal import Decimal
 from enum import Enum
 
@@ -39,6 +40,20 @@ class OrderTypeEnum(Enum):
         return self.name.replace("_", "-").lower()
 
 
+class IntrabarPathEnum(Enum):
+    """
+    Order in which the mock market visits the prices of a bar when matching resting orders
+    """
+    OHLC = 'OHLC'  # open, high, low, close
+    OLHC = 'OLHC'  # open, low, high, close
+    NEAREST = 'NEAREST'  # open, the extreme nearest to the open, the other extreme, close
+
+    def get_path(self, open: float, high: float, low: float, close: float) -> tuple:
+        if self == IntrabarPathEnum.OHLC or (self == IntrabarPathEnum.NEAREST and high - open < open - low):
+            return open, high, low, close
+        return open, low, high, close
+
+
 class OrderDirectionEnum(Enum):
     # LONG = 'LONG'
     # SHORT = 'SHORT'
@@ -169,16 +184,17 @@ class TimeseriesHorizonEnum(Enum):
         if self == TimeseriesHorizonEnum.YEAR_TO_DATE:
             return datetime.combine(to_date.replace(month=1, day=1), datetime.min.time())
         elif self == TimeseriesHorizonEnum.QUARTER_TO_DATE:
-            month = to_date.month % 4 + 1
+            month = (to_date.month - 1) // 3 * 3 + 1
             return datetime.combine(to_date.replace(month=month, day=1), datetime.min.time())
         elif self == TimeseriesHorizonEnum.MONTH_TO_DATE:
             return datetime.combine(to_date.replace(day=1), datetime.min.time())
         elif self == TimeseriesHorizonEnum.WEEK_TO_DATE:
-            raise NotImplementedError()
+            return datetime.combine(to_date - timedelta(days=to_date.weekday()), datetime.min.time())
         elif self == TimeseriesHorizonEnum.INCEPTION:
             return settings.BIG_BANG_DATE
         elif self == TimeseriesHorizonEnum.HALVENING:
-            raise NotImplementedError()
+            idx = bisect.bisect_right(settings.HALVENING_DATES, to_date)
+            return settings.HALVENING_DATES[max(idx - 1, 0)]
         else:
             raise TimeUnitNotSupportedException()
 
@@ -29,6 +29,10 @@ class OrderStatusNotSupportedException(BaseException):
     pass
 
 
+class InvalidOrderPriceException(BaseException):
+    pass
+
+
 # TOKEN
 class UnknownTokenException(BaseException):
     pass
@@ -39,3 +43,13 @@ class TokenArithmeticException(BaseException):
 
 class TokenTypeError(TypeError):
     pass
+
+
+# PRICE
+class MissingPriceException(KeyError):
+    pass
+
+
+# EXCHANGE
+class ExchangeException(BaseException):
+    pass
@@ -0,0 +1,136 @@
+"""
+Memoized indicator values shared by the testers of a process (LRU bounded in bytes)
+and, optionally, by every process pointing at the same directory of .npy files.
+"""
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Callable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src import settings
+from src.utils.singleton import Singleton
+
+Feature = Union[pd.Series, pd.DataFrame]
+# files written by FeatureCache._write (sidecar, values, index and their temporary files)
+CACHE_FILE_PATTERN = re.compile(r"[0-9a-f]{40}\.(json|values\.npy|index\.npy"
+                                r"|json\.\d+\.tmp|(values|index)\.\d+\.tmp\.npy)")
+
+
+def get_key_digest(key: tuple) -> str:
+    return hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+
+
+def get_nbytes(feature: Feature) -> int:
+    return int(feature.to_numpy().nbytes + feature.index.nbytes)
+
+
+class FeatureCache(metaclass=Singleton):
+    max_bytes: int
+    cache_dir: Optional[str]
+    entries: "OrderedDict[str, Feature]"
+    size: int  # bytes held in memory
+    hits: int
+    misses: int
+
+    def __init__(self, max_bytes: int = None, cache_dir: str = None):
+        self.max_bytes = settings.FEATURE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.cache_dir = settings.FEATURE_CACHE_DIR if cache_dir is None else cache_dir
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: tuple) -> Optional[Feature]:
+        digest = get_key_digest(key)
+        feature = self.entries.get(digest)
+        if feature is not None:
+            self.entries.move_to_end(digest)
+        elif self.cache_dir:
+            feature = self._read(digest, key)
+            if feature is not None:
+                self._remember(digest, feature)
+        return feature
+
+    def put(self, key: tuple, feature: Feature) -> Feature:
+        digest = get_key_digest(key)
+        if self.cache_dir:
+            self._write(digest, key, feature)
+        self._remember(digest, feature)
+        return feature
+
+    def get_or_compute(self, key: tuple, compute: Callable[[], Feature]) -> Feature:
+        feature = self.get(key)
+        if feature is not None:
+            self.hits += 1
+            return feature
+        self.misses += 1
+        return self.put(key, compute())
+
+    def clear(self, disk: bool = False):
+        self.entries.clear()
+        self.size = 0
+        self.hits = self.misses = 0
+        if disk and self.cache_dir and os.path.isdir(self.cache_dir):
+            # the directory may be shared, only the cache files are removed
+            for file_name in os.listdir(self.cache_dir):
+                if CACHE_FILE_PATTERN.fullmatch(file_name):
+                    os.remove(os.path.join(self.cache_dir, file_name))
+
+    def _remember(self, digest: str, feature: Feature):
+        nbytes = get_nbytes(feature)
+        if digest in self.entries:
+            self.size -= get_nbytes(self.entries.pop(digest))
+        if nbytes > self.max_bytes:
+            return
+        self.entries[digest] = feature
+        self.size += nbytes
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= get_nbytes(evicted)
+
+    def _get_paths(self, digest: str) -> tuple:
+        base = os.path.join(self.cache_dir, digest)
+        return f"{base}.json", f"{base}.values.npy", f"{base}.index.npy"
+
+    def _read(self, digest: str, key: tuple) -> Optional[Feature]:
+        meta_path, values_path, index_path = self._get_paths(digest)
+        if not os.path.isfile(meta_path):
+            return None
+        with open(meta_path) as meta_file:
+            meta = json.load(meta_file)
+        if meta["key"] != json.loads(json.dumps(key, default=str)):
+            return None
+        values = np.load(values_path, mmap_mode="r")
+        index = pd.DatetimeIndex(np.load(index_path), name=meta["index_name"])
+        if meta["columns"] is None:
+            return pd.Series(values, index=index, name=meta["name"], copy=False)
+        return pd.DataFrame(values, index=index, columns=meta["columns"], copy=False)
+
+    def _write(self, digest: str, key: tuple, feature: Feature):
+        # the sidecar is written last, readers never see half written values
+        os.makedirs(self.cache_dir, exist_ok=True)
+        meta_path, values_path, index_path = self._get_paths(digest)
+        for path, array in ((values_path, feature.to_numpy(dtype=np.float64)),
+                            (index_path, feature.index.to_numpy())):
+            tmp_path = f"{path[:-4]}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, array)
+            os.replace(tmp_path, path)
+        is_frame = isinstance(feature, pd.DataFrame)
+        meta = {
+            "key": key,
+            "name": None if is_frame else feature.name,
+            "columns": list(feature.columns) if is_frame else None,
+            "index_name": feature.index.name,
+        }
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as meta_file:
+            json.dump(meta, meta_file, default=str)
+        os.replace(tmp_path, meta_path)
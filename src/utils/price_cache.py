@@ -0,0 +1,145 @@
+"""
+Range aware local cache in front of the remote price service (price_utils.get_prices).
+Fetched candles are kept in a price store, with the intervals already fetched in a coverage.json sidecar:
+only the missing bars are requested, in chunks of bars fetched concurrently.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src import settings
+from src.models.token import Pair
+from src.utils import enums, price_ingestion, price_store, timeseries_utils
+
+# (pair, period, from_dt, to_dt) -> date/open/high/low/close frame, None on errors
+Fetch = Callable[[Pair, enums.TimeseriesPeriodEnum, Optional[datetime], Optional[datetime]], Optional[pd.DataFrame]]
+COVERAGE_FILE = "coverage.json"
+COLUMNS = ["date", "open", "high", "low", "close"]
+
+
+def series_to_frame(series: price_store.OhlcSeries, start: int = 0, end: int = None) -> pd.DataFrame:
+    rows = slice(start, end)
+    columns = {"date": series.date[rows].astype("datetime64[s]").astype("datetime64[ns]")}
+    columns.update({field: getattr(series, field)[rows] for field in COLUMNS[1:]})
+    return pd.DataFrame(columns)
+
+
+def merge_intervals(intervals: List[List[int]]) -> List[List[int]]:
+    """
+    Union of half open [start, end) intervals, sorted
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class PriceCache:
+    fetch: Fetch
+    store_dir: str
+    chunk_bars: int  # bars per request
+    max_workers: int
+
+    def __init__(self, fetch: Fetch, store_dir: str = None, chunk_bars: int = None, max_workers: int = None):
+        self.fetch = fetch
+        self.store_dir = store_dir or settings.PRICE_CACHE_DIR
+        self.chunk_bars = chunk_bars or settings.PRICE_FETCH_CHUNK_BARS
+        self.max_workers = max_workers or settings.PRICE_FETCH_WORKERS
+
+    @staticmethod
+    def get_series_name(pair: Pair, period: enums.TimeseriesPeriodEnum) -> str:
+        return f"{pair}@{period.value}"
+
+    def get_prices(self, pair: Pair, period: enums.TimeseriesPeriodEnum,
+                   from_dt: datetime = None, to_dt: datetime = None) -> Optional[pd.DataFrame]:
+        if from_dt is None:
+            # unbounded ranges are not cached
+            return self.fetch(pair, period, from_dt, to_dt)
+        to_dt = to_dt or datetime.utcnow()
+        name = self.get_series_name(pair, period)
+        chunks = self.get_missing_chunks(name, period, from_dt, to_dt)
+        if chunks:
+            self.fetch_chunks(name, pair, period, chunks)
+        return self.read(name, from_dt, to_dt)
+
+    def get_missing_chunks(self, name: str, period: enums.TimeseriesPeriodEnum,
+                           from_dt: datetime, to_dt: datetime) -> List[Tuple[datetime, datetime]]:
+        """
+        (first, last) bar start of the runs of bars between from_dt and to_dt not fetched yet,
+        split every `chunk_bars` bars
+        """
+        dates = timeseries_utils.get_period_dates(from_dt, to_dt, period)
+        ts = dates.to_numpy(dtype="datetime64[s]").astype(np.int64)
+        missing = np.ones(len(ts), dtype=bool)
+        for start, end in self.read_coverage(name):
+            missing &= (ts < start) | (ts >= end)
+        positions = np.flatnonzero(missing)
+        if not len(positions):
+            return []
+        chunks = []
+        for run in np.split(positions, np.flatnonzero(np.diff(positions) != 1) + 1):
+            for offset in range(0, len(run), self.chunk_bars):
+                bars = run[offset:offset + self.chunk_bars]
+                chunks.append((dates[bars[0]].to_pydatetime(), dates[bars[-1]].to_pydatetime()))
+        return chunks
+
+    def fetch_chunks(self, name: str, pair: Pair, period: enums.TimeseriesPeriodEnum,
+                     chunks: List[Tuple[datetime, datetime]]):
+        if len(chunks) == 1:
+            results = [self.fetch(pair, period, *chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+                results = list(executor.map(lambda chunk: self.fetch(pair, period, *chunk), chunks))
+
+        # the bar still open is fetched again next time
+        open_bar = timeseries_utils.datetime_to_epoch(timeseries_utils.get_period_start(datetime.utcnow(), period))
+        frames, covered = [], []
+        for (first, last), df in zip(chunks, results):
+            if df is None:
+                # failed requests are retried on the next call
+                continue
+            if len(df):
+                frames.append(price_ingestion.normalize_chunk(df.rename(columns=str.lower)))
+            start = timeseries_utils.datetime_to_epoch(first)
+            end = min(timeseries_utils.datetime_to_epoch(timeseries_utils.get_next_period_start(last, period)),
+                      open_bar)
+            if end > start:
+                covered.append([start, end])
+        if frames:
+            if price_store.has_series(name, self.store_dir):
+                frames.insert(0, series_to_frame(price_store.read_series(name, self.store_dir)))
+            price_store.write_series(name, pd.concat(frames, ignore_index=True), self.store_dir)
+        if covered:
+            # written after the candles, an interrupted fetch is fetched again
+            self.write_coverage(name, merge_intervals(self.read_coverage(name) + covered))
+
+    def read(self, name: str, from_dt: datetime, to_dt: datetime) -> pd.DataFrame:
+        if not price_store.has_series(name, self.store_dir):
+            return pd.DataFrame(columns=COLUMNS)
+        series = price_store.read_series(name, self.store_dir)
+        start = np.searchsorted(series.date, timeseries_utils.datetime_to_epoch(from_dt), side="left")
+        end = np.searchsorted(series.date, timeseries_utils.datetime_to_epoch(to_dt), side="right")
+        return series_to_frame(series, start, end)
+
+    def read_coverage(self, name: str) -> List[List[int]]:
+        path = os.path.join(price_store.get_series_dir(name, self.store_dir), COVERAGE_FILE)
+        if not os.path.isfile(path):
+            return []
+        with open(path) as coverage_file:
+            return json.load(coverage_file)
+
+    def write_coverage(self, name: str, intervals: List[List[int]]):
+        series_dir = price_store.get_series_dir(name, self.store_dir)
+        os.makedirs(series_dir, exist_ok=True)
+        path = os.path.join(series_dir, COVERAGE_FILE)
+        with open(path + ".tmp", "w") as coverage_file:
+            json.dump(intervals, coverage_file)
+        os.replace(path + ".tmp", path)
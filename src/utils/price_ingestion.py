@@ -0,0 +1,130 @@
+"""
+Streaming OHLC ingestion into the price store: sources are read in chunks of rows,
+so memory stays bounded whatever the size of the dumps.
+"""
+import json
+import re
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.utils import price_store, timeseries_utils
+
+DEFAULT_CHUNK_SIZE = 100_000  # rows
+READ_SIZE = 1 << 20  # bytes
+OHLC_COLUMNS = {"t": "date", "o": "open", "h": "high", "l": "low", "c": "close"}
+SEPARATORS = re.compile(r"[\s,]*")
+
+
+def iter_json_records(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[dict]]:
+    """
+    Records of a JSON array, `chunk_size` at a time, without loading the whole file
+    """
+    decoder = json.JSONDecoder()
+    records = []
+    with open(path) as json_file:
+        buffer = json_file.read(READ_SIZE)
+        pos = SEPARATORS.match(buffer).end()
+        if buffer[pos:pos + 1] != "[":
+            raise ValueError(f"{path}: not a JSON array")
+        pos += 1
+        eof = False
+        while True:
+            pos = SEPARATORS.match(buffer, pos).end()
+            if buffer[pos:pos + 1] == "]":
+                break
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # record split across reads
+                data = json_file.read(READ_SIZE)
+                eof = not data
+                buffer = buffer[pos:] + data
+                pos = 0
+                continue
+            records.append(record)
+            if len(records) == chunk_size:
+                yield records
+                records = []
+    if records:
+        yield records
+
+
+def iter_json_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Candles of a {"t": epoch, "o": {"o", "h", "l", "c"}} JSON dump
+    """
+    for records in iter_json_records(path, chunk_size):
+        # flattened by hand, pd.json_normalize is an order of magnitude slower on flat layouts
+        columns = {"date": [record["t"] for record in records]}
+        for key in "ohlc":
+            columns[OHLC_COLUMNS[key]] = [(record.get("o") or {}).get(key) for record in records]
+        yield normalize_chunk(pd.DataFrame(columns))
+
+
+def iter_csv_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    for df in pd.read_csv(path, chunksize=chunk_size):
+        yield normalize_chunk(df.rename(columns=str.lower))
+
+
+def to_utc_dates(dates: pd.Series) -> pd.Series:
+    """
+    Naive UTC datetimes from epoch seconds, naive UTC strings or timezone aware strings
+    """
+    if pd.api.types.is_numeric_dtype(dates):
+        return pd.to_datetime(dates, unit="s")
+    return pd.to_datetime(dates, utc=True).dt.tz_convert(None)
+
+
+def normalize_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[["date", "open", "high", "low", "close"]].copy()
+    df["date"] = to_utc_dates(df["date"])
+    for field in ("open", "high", "low", "close"):
+        df[field] = pd.to_numeric(df[field], errors="coerce")
+    return df.sort_values("date", kind="stable")
+
+
+def align_chunk(df: pd.DataFrame, step: int, after: Optional[int] = None) -> pd.DataFrame:
+    """
+    Candles on a regular grid of `step` seconds starting right after the epoch `after` (or at the first candle),
+    missing candles are NaN rows
+    """
+    ts = df["date"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+    ts = ts - ts % step
+    if after is not None:
+        keep = ts > after
+        df, ts = df[keep], ts[keep]
+    if not len(ts):
+        return df.iloc[:0]
+    start = after + step if after is not None else ts[0]
+    grid = np.arange(start, ts[-1] + 1, step)
+    df = df.assign(date=ts).drop_duplicates("date", keep="last").set_index("date").reindex(grid)
+    df.index = pd.DatetimeIndex(grid.astype("datetime64[s]"), name="date")
+    return df
+
+
+def ingest(pair_name: str, chunks: Iterable[pd.DataFrame], fill_chunks: Iterable[pd.DataFrame] = (),
+           start_date: datetime = None, step: int = timeseries_utils.SECONDS_IN_HOUR, store_dir: str = None) -> dict:
+    """
+    Append the candles of `chunks` (sorted by date) newer than the stored series of `pair_name`,
+    then fill the NaN candles with `fill_chunks` (secondary sources, any order).
+    """
+    end = None
+    if price_store.has_series(pair_name, store_dir):
+        end = price_store.read_index(pair_name, store_dir)["end"]
+    appended = filled = 0
+    for df in chunks:
+        if start_date is not None:
+            df = df[df["date"] >= start_date]
+        df = align_chunk(df, step, end)
+        if len(df):
+            appended += price_store.append_series(pair_name, df, store_dir)
+            end = price_store.read_index(pair_name, store_dir)["end"]
+    if price_store.has_series(pair_name, store_dir):
+        for df in fill_chunks:
+            filled += price_store.fill_series(pair_name, df, store_dir)
+    return {"appended": appended, "filled": filled}
@@ -0,0 +1,328 @@
+"""
+Columnar on-disk OHLC store.
+Every pair is a directory holding one .npy file per field plus an index.json sidecar,
+fields are opened memory-mapped so testers and worker processes share the same pages.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from src import settings
+from src.models.candle import Candle
+from src.utils import enums, timeseries_utils
+from src.utils.exception_utils import MissingPriceException
+
+FIELDS: Dict[str, type] = {
+    "date": np.int64,  # epoch seconds (UTC)
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+}
+INDEX_FILE = "index.json"
+STORE_VERSION = 1
+
+
+class OhlcSeries:
+    pair_name: str
+    date: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    step: Optional[int]  # seconds between bars, None if the series is not regular
+
+    def __init__(self, pair_name: str, step: Optional[int] = None, **fields: np.ndarray):
+        self.pair_name = pair_name
+        self.step = step
+        for field in FIELDS:
+            setattr(self, field, fields[field])
+
+    def __len__(self):
+        return len(self.date)
+
+    def __repr__(self):
+        return f"OhlcSeries[{self.pair_name} x {len(self)}]"
+
+    @classmethod
+    def from_df(cls, pair_name: str, df: pd.DataFrame) -> "OhlcSeries":
+        """
+        In-memory series from date/open/high/low/close columns or a DatetimeIndex (any case)
+        """
+        df = df.rename(columns=str.lower)
+        if "date" not in df.columns:
+            df = df.rename_axis("date").reset_index()
+        df = df.sort_values("date", kind="stable").drop_duplicates("date", keep="last")
+        dates = pd.to_datetime(df["date"])
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_convert(None)
+
+        arrays = {"date": dates.to_numpy(dtype="datetime64[s]").astype(np.int64)}
+        for field in FIELDS:
+            if field != "date":
+                arrays[field] = df[field].to_numpy(dtype=FIELDS[field])
+        steps = np.unique(np.diff(arrays["date"]))
+        return cls(pair_name, step=int(steps[0]) if len(steps) == 1 else None, **arrays)
+
+    def to_df(self) -> pd.DataFrame:
+        """
+        DataFrame in the price_utils.get_ohlc_prices format, OHLC columns are not copied
+        """
+        index = pd.DatetimeIndex(self.date.astype("datetime64[s]"), name="Date")
+        columns = {"Open": self.open, "High": self.high, "Low": self.low, "Close": self.close}
+        return pd.DataFrame(columns, index=index, copy=False)
+
+    def get_offset(self, dt: datetime) -> int:
+        """
+        Bar offset of the candle containing `dt`: plain epoch arithmetic on regular series,
+        binary search otherwise
+        """
+        ts = timeseries_utils.datetime_to_epoch(dt)
+        if self.step:
+            offset = (ts - int(self.date[0])) // self.step if len(self) else -1
+        else:
+            ts -= ts % timeseries_utils.SECONDS_IN_HOUR
+            offset = int(np.searchsorted(self.date, ts))
+            if offset < len(self) and self.date[offset] != ts:
+                offset = -1
+        if not 0 <= offset < len(self):
+            raise MissingPriceException(f"{self.pair_name}: no candle for {dt}")
+        return offset
+
+    def get_offsets(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        ts = dates.to_numpy(dtype="datetime64[s]").astype(np.int64)
+        if self.step:
+            offsets = (ts - (self.date[0] if len(self) else 0)) // self.step
+        else:
+            ts = ts - ts % timeseries_utils.SECONDS_IN_HOUR
+            offsets = np.searchsorted(self.date, ts)
+            offsets[self.date[np.minimum(offsets, len(self) - 1)] != ts] = -1
+        missing = (offsets < 0) | (offsets >= len(self))
+        if missing.any():
+            raise MissingPriceException(f"{self.pair_name}: no candle for {dates[np.argmax(missing)]}")
+        return offsets
+
+    def get_candle(self, dt: datetime) -> Candle:
+        offset = self.get_offset(dt)
+        candle = Candle(timeseries_utils.epoch_to_datetime(self.date[offset]),
+                        float(self.open[offset]), float(self.high[offset]),
+                        float(self.low[offset]), float(self.close[offset]))
+        if candle.close != candle.close:  # NaN gap
+            raise MissingPriceException(f"{self.pair_name}: no price for {dt}")
+        return candle
+
+    def get_candles(self, dates: pd.DatetimeIndex) -> pd.DataFrame:
+        """
+        Candles aligned to `dates` (vectorized get_candle)
+        """
+        offsets = self.get_offsets(dates)
+        candles = pd.DataFrame({"Open": self.open[offsets], "High": self.high[offsets],
+                                "Low": self.low[offsets], "Close": self.close[offsets]}, index=dates)
+        missing = candles["Close"].isna().to_numpy()
+        if missing.any():
+            raise MissingPriceException(f"{self.pair_name}: no price for {dates[np.argmax(missing)]}")
+        return candles
+
+
+def resample_series(series: OhlcSeries, period: enums.TimeseriesPeriodEnum) -> OhlcSeries:
+    """
+    Bars of `period` aggregated from a finer series, labeled by their start (timeseries_utils.get_period_starts).
+    Gaps (NaN candles) are skipped, periods without any candle are NaN bars.
+    """
+    valid = ~np.isnan(series.close)
+    date = series.date[valid]
+    labels = timeseries_utils.get_period_starts(date, period)
+    bar_dates, first = np.unique(labels, return_index=True)
+    last = np.append(first[1:], len(date)) - 1
+    arrays = {
+        "date": bar_dates,
+        "open": series.open[valid][first],
+        "high": np.fmax.reduceat(series.high[valid], first) if len(first) else np.empty(0),
+        "low": np.fmin.reduceat(series.low[valid], first) if len(first) else np.empty(0),
+        "close": series.close[valid][last],
+    }
+    step = None
+    if period.get_time_unit() not in (enums.TimeUnitEnum.MONTH, enums.TimeUnitEnum.YEAR) and len(bar_dates):
+        # regular grid, missing periods become NaN bars
+        step = period.get_period_value_sec()
+        grid = np.arange(bar_dates[0], bar_dates[-1] + 1, step)
+        offsets = (bar_dates - grid[0]) // step
+        for field in FIELDS:
+            if field != "date":
+                full = np.full(len(grid), np.nan)
+                full[offsets] = arrays[field]
+                arrays[field] = full
+        arrays["date"] = grid
+    return OhlcSeries(f"{series.pair_name}@{period.value}", step=step, **arrays)
+
+
+def get_series_dir(pair_name: str, store_dir: str = None) -> str:
+    return os.path.join(store_dir or settings.PRICE_STORE_DIR, pair_name)
+
+
+def has_series(pair_name: str, store_dir: str = None) -> bool:
+    return os.path.isfile(os.path.join(get_series_dir(pair_name, store_dir), INDEX_FILE))
+
+
+def read_index(pair_name: str, store_dir: str = None) -> dict:
+    with open(os.path.join(get_series_dir(pair_name, store_dir), INDEX_FILE)) as index_file:
+        return json.load(index_file)
+
+
+def read_series(pair_name: str, store_dir: str = None, mmap_mode: Optional[str] = "r") -> OhlcSeries:
+    series_dir = get_series_dir(pair_name, store_dir)
+    index = read_index(pair_name, store_dir)
+    # the index length is authoritative, fields may hold rows of an append in progress
+    fields = {field: np.load(os.path.join(series_dir, f"{field}.npy"), mmap_mode=mmap_mode)[:index["length"]]
+              for field in FIELDS}
+    return OhlcSeries(pair_name, step=index.get("step"), **fields)
+
+
+def write_series(pair_name: str, df: pd.DataFrame, store_dir: str = None) -> OhlcSeries:
+    """
+    Write `df` (date/open/high/low/close columns or a DatetimeIndex, any case) as the stored series of `pair_name`.
+    The index is written last, so readers never see a half written series.
+    """
+    series = OhlcSeries.from_df(pair_name, df)
+    arrays = {field: getattr(series, field) for field in FIELDS}
+
+    series_dir = get_series_dir(pair_name, store_dir)
+    os.makedirs(series_dir, exist_ok=True)
+    index_path = os.path.join(series_dir, INDEX_FILE)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    for field, array in arrays.items():
+        tmp_path = os.path.join(series_dir, f"{field}.tmp.npy")
+        np.save(tmp_path, array)
+        os.replace(tmp_path, os.path.join(series_dir, f"{field}.npy"))
+    _write_index(pair_name, store_dir, arrays["date"], series.step)
+    return read_series(pair_name, store_dir)
+
+
+def write_regular_series(pair_name: str, start: int, step: int, length: int, chunks: Iterable[Dict[str, np.ndarray]],
+                         store_dir: str = None) -> OhlcSeries:
+    """
+    Write a regular series of `length` bars from epoch `start` as the stored series of `pair_name`,
+    `chunks` yield consecutive open/high/low/close arrays. Fields are filled memory-mapped one chunk at a time,
+    rows not covered by the chunks are NaN candles. The index is written last.
+    """
+    series_dir = get_series_dir(pair_name, store_dir)
+    os.makedirs(series_dir, exist_ok=True)
+    index_path = os.path.join(series_dir, INDEX_FILE)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    arrays = {field: np.lib.format.open_memmap(os.path.join(series_dir, f"{field}.tmp.npy"), mode="w+",
+                                               dtype=FIELDS[field], shape=(length,))
+              for field in FIELDS}
+    offset = 0
+    for chunk in chunks:
+        end = min(offset + len(chunk["close"]), length)
+        arrays["date"][offset:end] = start + step * np.arange(offset, end, dtype=np.int64)
+        for field in FIELDS:
+            if field != "date":
+                arrays[field][offset:end] = chunk[field][:end - offset]
+        offset = end
+        if offset == length:
+            break
+    arrays["date"][offset:] = start + step * np.arange(offset, length, dtype=np.int64)
+    for field in FIELDS:
+        if field != "date":
+            arrays[field][offset:] = np.nan
+    for array in arrays.values():
+        array.flush()
+    arrays.clear()
+    for field in FIELDS:
+        os.replace(os.path.join(series_dir, f"{field}.tmp.npy"), os.path.join(series_dir, f"{field}.npy"))
+    _write_index(pair_name, store_dir, np.load(os.path.join(series_dir, "date.npy"), mmap_mode="r"), step)
+    return read_series(pair_name, store_dir)
+
+
+def append_series(pair_name: str, df: pd.DataFrame, store_dir: str = None) -> int:
+    """
+    Append the rows of `df` newer than the stored series (the series is created if missing).
+    Fields are extended in place and the index is rewritten last. Returns the number of appended rows.
+    """
+    if not has_series(pair_name, store_dir):
+        return len(write_series(pair_name, df, store_dir))
+    index = read_index(pair_name, store_dir)
+    new = OhlcSeries.from_df(pair_name, df)
+    rows = new.date > index["end"] if index["length"] else np.ones(len(new), dtype=bool)
+    if not rows.any():
+        return 0
+
+    series_dir = get_series_dir(pair_name, store_dir)
+    for field in FIELDS:
+        _append_npy(os.path.join(series_dir, f"{field}.npy"), index["length"],
+                    getattr(new, field)[rows].astype(FIELDS[field]))
+    date = np.load(os.path.join(series_dir, "date.npy"), mmap_mode="r")[:index["length"] + int(rows.sum())]
+    step = index["step"]
+    if index["length"] > 1:
+        steps = np.unique(np.diff(date[index["length"] - 1:]))
+        step = step if len(steps) == 1 and steps[0] == step else None
+    else:
+        # a single stored candle has no step yet
+        steps = np.unique(np.diff(date))
+        step = int(steps[0]) if len(steps) == 1 else None
+    _write_index(pair_name, store_dir, date, step)
+    return int(rows.sum())
+
+
+def fill_series(pair_name: str, df: pd.DataFrame, store_dir: str = None) -> int:
+    """
+    Replace the NaN candles of the stored series with the candles of `df` at the same dates.
+    Returns the number of filled candles.
+    """
+    series = read_series(pair_name, store_dir, mmap_mode="r+")
+    other = OhlcSeries.from_df(pair_name, df)
+    offsets = np.searchsorted(series.date, other.date)
+    found = offsets < len(series)
+    found[found] = series.date[offsets[found]] == other.date[found]
+    offsets, rows = offsets[found], np.flatnonzero(found)
+    missing = np.isnan(series.close[offsets]) & ~np.isnan(other.close[rows])
+    offsets, rows = offsets[missing], rows[missing]
+    for field in FIELDS:
+        if field != "date":
+            getattr(series, field)[offsets] = getattr(other, field)[rows]
+            getattr(series, field).flush()
+    return len(offsets)
+
+
+def _append_npy(path: str, length: int, array: np.ndarray):
+    # numpy leaves room in the .npy header for the shape to grow, rows are written past `length`
+    with open(path, "r+b") as npy_file:
+        version = np.lib.format.read_magic(npy_file)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) \
+            else np.lib.format.read_array_header_2_0
+        _, fortran_order, dtype = read_header(npy_file)
+        data_offset = npy_file.tell()
+        npy_file.seek(data_offset + length * dtype.itemsize)
+        npy_file.write(array.astype(dtype).tobytes())
+        npy_file.truncate()
+        npy_file.seek(0)
+        header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": fortran_order,
+                  "shape": (length + len(array),)}
+        write_header = np.lib.format.write_array_header_1_0 if version == (1, 0) \
+            else np.lib.format.write_array_header_2_0
+        write_header(npy_file, header)
+        if npy_file.tell() != data_offset:
+            raise IOError(f"{path}: cannot grow the npy header in place")
+
+
+def _write_index(pair_name: str, store_dir: Optional[str], date: np.ndarray, step: Optional[int]):
+    index_path = os.path.join(get_series_dir(pair_name, store_dir), INDEX_FILE)
+    index = {
+        "version": STORE_VERSION,
+        "pair": pair_name,
+        "length": len(date),
+        "start": int(date[0]) if len(date) else None,
+        "end": int(date[-1]) if len(date) else None,
+        "step": step,
+        "fields": {field: np.dtype(dtype).str for field, dtype in FIELDS.items()},
+    }
+    with open(index_path + ".tmp", "w") as index_file:
+        json.dump(index, index_file)
+    os.replace(index_path + ".tmp", index_path)
@@ -1,33 +1,108 @@
 import base64
 import json
+import os
+import threading
 from datetime import datetime
+from typing import Dict, Tuple
 
-import boto3
 import pandas as pd
 
 from src import settings
+from src.models.candle import Candle
 from src.models.token import Pair
-from src.utils import enums, token_utils
+from src.utils import enums, price_cache, price_store, token_utils
+from src.utils.singleton import Singleton
 
-DEFAULT_PAIR = token_utils.PairFactory().get_pair_by_name("BTC", settings.ACCOUNT_BALANCE_CURRENCY)
+DEFAULT_PAIR_NAME = ("BTC", settings.ACCOUNT_BALANCE_CURRENCY)
 
+# one read-only frame per pair and process, backed by the memory-mapped store
+_OHLC_PRICES: Dict[str, pd.DataFrame] = {}
+# boto3 clients are thread safe, creating them is not
+_LAMBDA_CLIENT = None
+_LAMBDA_CLIENT_LOCK = threading.Lock()
 
-def get_ohlc_prices(pair: Pair = DEFAULT_PAIR, from_dt: datetime = None, to_dt: datetime = None) -> pd.DataFrame:
-    df = pd.read_pickle("resources/BTCUSD_price.pickle")
-    df = df[['date', 'open', 'high', 'low', 'close']]
-    df['date'] = pd.to_datetime(df['date'])
-    rename_cols = {'date': 'Date', 'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close'}
-    df.rename(columns=rename_cols, inplace=True)
-    df = df.set_index('Date')
-    if from_dt:
-        df = df.loc[:from_dt]
-    if to_dt:
-        df = df.loc[to_dt:]
+
+def __getattr__(name: str):
+    if name == 'DEFAULT_PAIR':
+        return get_default_pair()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_default_pair() -> Pair:
+    return token_utils.PairFactory().get_pair_by_name(*DEFAULT_PAIR_NAME)
+
+
+def get_ohlc_series(pair: Pair = None) -> price_store.OhlcSeries:
+    pair_name = str(pair or get_default_pair())
+    if not price_store.has_series(pair_name):
+        # first use: convert the legacy pickle into the columnar store
+        df = pd.read_pickle(os.path.join(settings.RESOURCES_DIR, f"{pair_name}_price.pickle"))
+        price_store.write_series(pair_name, df[['date', 'open', 'high', 'low', 'close']])
+    return price_store.read_series(pair_name)
+
+
+def get_ohlc_prices(pair: Pair = None, from_dt: datetime = None, to_dt: datetime = None) -> pd.DataFrame:
+    pair = pair or get_default_pair()
+    pair_name = str(pair)
+    if pair_name not in _OHLC_PRICES:
+        _OHLC_PRICES[pair_name] = get_ohlc_series(pair).to_df()
+    df = _OHLC_PRICES[pair_name]
+    if from_dt or to_dt:
+        df = df.loc[from_dt:to_dt]
     return df
 
 
+class PriceRegistry(metaclass=Singleton):
+    """
+    Process wide OHLC series keyed by Pair, loaded lazily from the price store.
+    Coarser periods are resampled from the stored series on first use and kept with it.
+    """
+    series: Dict[Pair, price_store.OhlcSeries]
+    resampled: Dict[Tuple[Pair, enums.TimeseriesPeriodEnum], price_store.OhlcSeries]
+
+    def __init__(self):
+        self.series = {}
+        self.resampled = {}
+
+    def register(self, pair: Pair, series: price_store.OhlcSeries):
+        self.series[pair] = series
+        for key in [key for key in self.resampled if key[0] == pair]:
+            del self.resampled[key]
+
+    def clear(self):
+        self.series.clear()
+        self.resampled.clear()
+
+    def get_series(self, pair: Pair, period: enums.TimeseriesPeriodEnum = None) -> price_store.OhlcSeries:
+        series = self.series.get(pair)
+        if series is None:
+            series = self.series[pair] = get_ohlc_series(pair)
+        if period is None or period.get_period_value_sec() == series.step:
+            return series
+        resampled = self.resampled.get((pair, period))
+        if resampled is None:
+            resampled = self.resampled[(pair, period)] = price_store.resample_series(series, period)
+        return resampled
+
+    def get_candle(self, pair: Pair, dt: datetime, period: enums.TimeseriesPeriodEnum = None) -> Candle:
+        return self.get_series(pair, period).get_candle(dt)
+
+    def get_candles(self, pair: Pair, dates: pd.DatetimeIndex,
+                    period: enums.TimeseriesPeriodEnum = None) -> pd.DataFrame:
+        return self.get_series(pair, period).get_candles(dates)
+
+
+def get_lambda_client():
+    global _LAMBDA_CLIENT
+    with _LAMBDA_CLIENT_LOCK:
+        if _LAMBDA_CLIENT is None:
+            import boto3
+            _LAMBDA_CLIENT = boto3.client('lambda', region_name='eu-west-1')
+    return _LAMBDA_CLIENT
+
+
 def get_prices(pair, period, from_dt, to_dt):
-    client = boto3.client('lambda', region_name='eu-west-1')
+    client = get_lambda_client()
     FIND_PRICES = "CryptoApp-FindPrices"
     body = {
         "pair_name": str(pair),
@@ -54,7 +129,9 @@ def get_prices(pair, period, from_dt, to_dt):
         return pd.DataFrame(res['body'])
 
 
-def get_prices_controller(pair: Pair = DEFAULT_PAIR,
+def get_prices_controller(pair: Pair = None,
                           period: enums.TimeseriesPeriodEnum = enums.TimeseriesPeriodEnum.ONE_HOURS,
-                          from_dt: datetime = None, to_dt: datetime = None) -> pd.DataFrame:
-    return get_prices(pair, period, from_dt, to_dt)
+                          from_dt: datetime = None, to_dt: datetime = None,
+                          cache: price_cache.PriceCache = None) -> pd.DataFrame:
+    cache = cache or price_cache.PriceCache(get_prices)
+    return cache.get_prices(pair or get_default_pair(), period, from_dt, to_dt)
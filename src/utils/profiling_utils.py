@@ -0,0 +1,109 @@
+"""
+Opt-in instrumentation of the backtest bar loop: wall time and call count per stage,
+optional cProfile and tracemalloc hooks and a JSON serializable report.
+Stages may nest (matching runs inside orders), their times are inclusive.
+Disabled (the default) a stage is a shared no-op context manager.
+"""
+import cProfile
+import contextlib
+import json
+import pstats
+import time
+import tracemalloc
+from typing import Dict, Optional
+
+from src.utils.singleton import Singleton
+
+_NOOP = contextlib.nullcontext()
+TOP_FUNCTIONS = 30
+
+
+class Stage:
+    __slots__ = ('name', 'total', 'count', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.total = 0.
+        self.count = 0
+        self.start = 0.
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.total += time.perf_counter() - self.start
+        self.count += 1
+
+
+class StageProfiler(metaclass=Singleton):
+    enabled: bool
+    stages: Dict[str, Stage]
+    profile: Optional[cProfile.Profile]
+    trace_memory: bool
+    started: float
+    elapsed: float
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = {}
+        self.profile = None
+        self.trace_memory = False
+        self.started = self.elapsed = 0.
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NOOP
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name)
+        return stage
+
+    def start(self, cprofile: bool = False, trace_memory: bool = False):
+        self.enabled = True
+        self.stages = {}
+        self.elapsed = 0.
+        if cprofile:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.trace_memory = True
+        self.started = time.perf_counter()
+
+    def stop(self) -> dict:
+        self.elapsed = time.perf_counter() - self.started
+        self.enabled = False
+        if self.profile:
+            self.profile.disable()
+        report = self.get_report()
+        if self.trace_memory:
+            tracemalloc.stop()
+            self.trace_memory = False
+        self.profile = None
+        return report
+
+    def get_report(self) -> dict:
+        elapsed = self.elapsed or time.perf_counter() - self.started
+        report = {
+            "elapsed": elapsed,
+            "stages": {name: {"total": stage.total, "count": stage.count,
+                              "mean": stage.total / stage.count if stage.count else 0.,
+                              "share": stage.total / elapsed if elapsed else 0.}
+                       for name, stage in self.stages.items()},
+        }
+        if self.profile:
+            stats = pstats.Stats(self.profile).stats
+            functions = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+            report["functions"] = [{"function": f"{path}:{line}({name})", "calls": calls, "tottime": tottime,
+                                    "cumtime": cumtime}
+                                   for (path, line, name), (_, calls, tottime, cumtime, _) in functions]
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            report["memory"] = {"current": current, "peak": peak}
+        return report
+
+
+def write_report(report: dict, path: str):
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
@@ -0,0 +1,166 @@
+"""
+Seeded synthetic OHLC series for scale tests and benchmarks: geometric brownian motion,
+Merton jump-diffusion and Markov regime switching, with optional gaps and NaN candles.
+Bars are generated vectorized one block at a time, each block from its own child seed,
+so any length is produced in bounded memory and a series is a prefix of every longer one.
+"""
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from src.utils import price_store, timeseries_utils
+
+SECONDS_IN_YEAR = 365 * timeseries_utils.SECONDS_IN_DAY
+BLOCK_BARS = 1 << 16
+
+
+class MarketRegime:
+    """
+    Annualized drift and volatility of the log price, jumps arrive `jump_intensity` times a year
+    with normally distributed log sizes (no jumps: geometric brownian motion)
+    """
+    drift: float
+    volatility: float
+    jump_intensity: float
+    jump_mean: float
+    jump_std: float
+
+    def __init__(self, **params):
+        self.drift = params.get('drift', 0.)
+        self.volatility = params.get('volatility', 0.6)
+        self.jump_intensity = params.get('jump_intensity', 0.)
+        self.jump_mean = params.get('jump_mean', 0.)
+        self.jump_std = params.get('jump_std', 0.)
+
+    def __repr__(self):
+        return f"MarketRegime[{self.drift:+.2f} vol {self.volatility:.2f} jumps {self.jump_intensity:g}/y]"
+
+
+# SyntheticMarket params by model name
+PRESETS: Dict[str, dict] = {
+    "gbm": {},
+    "jump_diffusion": {
+        "regimes": [MarketRegime(drift=0.3, volatility=0.6, jump_intensity=12, jump_mean=-0.01, jump_std=0.05)],
+    },
+    "regime_switching": {
+        "regimes": [MarketRegime(drift=0.8, volatility=0.5),
+                    MarketRegime(drift=-0.9, volatility=1.1, jump_intensity=24, jump_mean=-0.02, jump_std=0.06)],
+        "switch_probability": 1 / 2000,
+    },
+}
+
+
+class SyntheticMarket:
+    """
+    Regimes switch with probability `switch_probability` per bar (to any other regime, uniformly).
+    Missing bars are NaN candles: outages start with probability `gap_probability` per bar and last
+    `gap_length` bars on average, single NaN candles appear with probability `nan_probability`.
+    The price keeps moving while it is not observed.
+    """
+    start: datetime
+    step: int  # seconds
+    initial_price: float
+    regimes: List[MarketRegime]
+    switch_probability: float
+    gap_probability: float
+    gap_length: float
+    nan_probability: float
+    seed: int
+    block_bars: int
+
+    def __init__(self, **params):
+        self.start = params.get('start', datetime(2010, 1, 1))
+        self.step = params.get('step', timeseries_utils.SECONDS_IN_HOUR)
+        self.initial_price = params.get('initial_price', 8000.)
+        self.regimes = params.get('regimes') or [MarketRegime()]
+        self.switch_probability = params.get('switch_probability', 0.) if len(self.regimes) > 1 else 0.
+        self.gap_probability = params.get('gap_probability', 0.)
+        self.gap_length = params.get('gap_length', 1.)
+        self.nan_probability = params.get('nan_probability', 0.)
+        self.seed = params.get('seed', 0)
+        self.block_bars = params.get('block_bars', BLOCK_BARS)
+
+    def iter_blocks(self, length: int) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Consecutive open/high/low/close arrays of `block_bars` bars (the last one shorter), `length` bars in total
+        """
+        dt = self.step / SECONDS_IN_YEAR
+        drift = np.array([(r.drift - r.volatility ** 2 / 2) * dt for r in self.regimes])
+        diffusion = np.array([r.volatility * np.sqrt(dt) for r in self.regimes])
+        jump_rate = np.array([r.jump_intensity * dt for r in self.regimes])
+        jump_mean = np.array([r.jump_mean for r in self.regimes])
+        jump_std = np.array([r.jump_std for r in self.regimes])
+        seeds = np.random.SeedSequence(self.seed)
+
+        log_price = np.log(self.initial_price)
+        regime = 0
+        gap_left = 0  # bars of an outage started in a previous block
+        n = self.block_bars
+        for block, offset in enumerate(range(0, length, n)):
+            # whole blocks are drawn from seeds that do not depend on the length asked for, the last one is cut
+            rng = np.random.default_rng(np.random.SeedSequence(seeds.entropy, spawn_key=(block,)))
+
+            if self.switch_probability:
+                switches = rng.random(n) < self.switch_probability
+                shifts = np.where(switches, rng.integers(1, len(self.regimes), n), 0)
+                regimes = (regime + np.cumsum(shifts)) % len(self.regimes)
+                regime = int(regimes[-1])
+            else:
+                regimes = np.zeros(n, dtype=np.intp)
+
+            returns = drift[regimes] + diffusion[regimes] * rng.standard_normal(n)
+            if jump_rate.any():
+                jumps = rng.poisson(jump_rate[regimes])
+                bars = np.flatnonzero(jumps)
+                returns[bars] += jumps[bars] * jump_mean[regimes[bars]] + \
+                    np.sqrt(jumps[bars]) * jump_std[regimes[bars]] * rng.standard_normal(len(bars))
+            log_close = log_price + np.cumsum(returns)
+            log_open = np.concatenate([[log_price], log_close[:-1]])
+            log_price = float(log_close[-1])
+
+            # wicks: half normal excursions scaled by the bar volatility
+            wicks = np.abs(rng.standard_normal((2, n))) * diffusion[regimes] / 2
+            open_, close = np.exp(log_open), np.exp(log_close)
+            high = np.maximum(open_, close) * np.exp(wicks[0])
+            low = np.minimum(open_, close) * np.exp(-wicks[1])
+
+            missing = np.zeros(n, dtype=bool)
+            if gap_left:
+                missing[:gap_left] = True
+                gap_left = max(gap_left - n, 0)
+            if self.gap_probability:
+                starts = np.flatnonzero(rng.random(n) < self.gap_probability)
+                ends = starts + rng.geometric(1 / max(self.gap_length, 1.), len(starts))
+                # +1 at every outage start, -1 after its end
+                marks = np.zeros(n + 1, dtype=np.int64)
+                np.add.at(marks, starts, 1)
+                np.add.at(marks, np.minimum(ends, n), -1)
+                missing |= np.cumsum(marks[:-1]) > 0
+                if len(ends):
+                    gap_left = max(gap_left, int(ends.max()) - n)
+            if self.nan_probability:
+                missing |= rng.random(n) < self.nan_probability
+            for field in (open_, high, low, close):
+                field[missing] = np.nan
+            size = min(n, length - offset)
+            yield {"open": open_[:size], "high": high[:size], "low": low[:size], "close": close[:size]}
+
+    def generate(self, length: int) -> pd.DataFrame:
+        """
+        `length` bars in memory, in the price_utils.get_ohlc_prices format
+        """
+        blocks = list(self.iter_blocks(length))
+        start = timeseries_utils.datetime_to_epoch(self.start)
+        index = pd.DatetimeIndex((start + self.step * np.arange(length)).astype("datetime64[s]"), name="Date")
+        return pd.DataFrame({column: np.concatenate([block[column.lower()] for block in blocks]) if blocks else []
+                             for column in ("Open", "High", "Low", "Close")}, index=index)
+
+    def write(self, pair_name: str, length: int, store_dir: str = None) -> price_store.OhlcSeries:
+        """
+        `length` bars written block by block as the stored series of `pair_name` (price_utils.get_ohlc_series)
+        """
+        start = timeseries_utils.datetime_to_epoch(self.start)
+        return price_store.write_regular_series(pair_name, start, self.step, length, self.iter_blocks(length),
+                                                store_dir)
@@ -1,29 +1,91 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
 
 from src.utils import enums
 from src.utils.exception_utils import TimeUnitNotSupportedException
 
 SECONDS_IN_HOUR = 60 * 60
 SECONDS_IN_DAY = 24 * SECONDS_IN_HOUR
+EPOCH = datetime(1970, 1, 1)
+WEEK_ORIGIN = 4 * SECONDS_IN_DAY  # weeks start on monday, 1970-01-05
 
 
-def get_previous_period_end(dt: datetime, period: enums.TimeseriesPeriodEnum) -> datetime:
+def datetime_to_epoch(dt: datetime) -> int:
+    # naive datetimes are UTC, as in the price store
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - EPOCH) // timedelta(seconds=1)
+
+
+def epoch_to_datetime(ts: int) -> datetime:
+    return EPOCH + timedelta(seconds=int(ts))
+
+
+def get_period_starts(ts: np.ndarray, period: enums.TimeseriesPeriodEnum) -> np.ndarray:
+    """
+    Start (epoch seconds) of the bar containing every epoch in `ts`.
+    Hours and days are aligned to the epoch (4HRS bars start at 0, 4, 8... UTC), weeks start on monday,
+    months and years are calendar months and years.
+    """
+    ts = np.asarray(ts, dtype=np.int64)
     time_unit = period.get_time_unit()
     period_value = period.get_period_value()
-    if time_unit == enums.TimeUnitEnum.SECOND:
-        raise NotImplementedError('not implemented')
-    elif time_unit == enums.TimeUnitEnum.MINUTE:
+    if time_unit in (enums.TimeUnitEnum.HOUR, enums.TimeUnitEnum.DAY, enums.TimeUnitEnum.WEEK):
+        step = period.get_period_value_sec()
+        origin = WEEK_ORIGIN if time_unit == enums.TimeUnitEnum.WEEK else 0
+        return (ts - origin) // step * step + origin
+    elif time_unit in (enums.TimeUnitEnum.MONTH, enums.TimeUnitEnum.YEAR):
+        step = period_value * 12 if time_unit == enums.TimeUnitEnum.YEAR else period_value
+        months = ts.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64) // step * step
+        return months.astype("datetime64[M]").astype("datetime64[s]").astype(np.int64)
+    elif time_unit in (enums.TimeUnitEnum.SECOND, enums.TimeUnitEnum.MINUTE):
         raise NotImplementedError('not implemented')
-    elif time_unit == enums.TimeUnitEnum.HOUR:
-        new_hour = dt.hour
-        while new_hour % period_value > 0:
-            new_hour -= 1
-        new_date = dt.replace(hour=new_hour, minute=0, second=0, microsecond=0)
-    elif time_unit == enums.TimeUnitEnum.DAY:
-        new_date = dt.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=period_value - 1)
+    raise TimeUnitNotSupportedException()
+
+
+def get_period_start(dt: datetime, period: enums.TimeseriesPeriodEnum) -> datetime:
+    return epoch_to_datetime(get_period_starts(np.array([datetime_to_epoch(dt)]), period)[0])
+
+
+def get_next_period_start(dt: datetime, period: enums.TimeseriesPeriodEnum) -> datetime:
+    start = get_period_start(dt, period)
+    time_unit = period.get_time_unit()
+    if time_unit == enums.TimeUnitEnum.MONTH:
+        months = start.month - 1 + period.get_period_value()
+        return start.replace(year=start.year + months // 12, month=months % 12 + 1)
+    elif time_unit == enums.TimeUnitEnum.YEAR:
+        return start.replace(year=start.year + period.get_period_value())
+    return start + timedelta(seconds=period.get_period_value_sec())
+
+
+def get_period_dates(start_date: datetime, end_date: datetime, period: enums.TimeseriesPeriodEnum) -> pd.DatetimeIndex:
+    """
+    Start of every bar of `period` starting between start_date and end_date (both included)
+    """
+    first = get_period_start(start_date, period)
+    if first < start_date:
+        first = get_next_period_start(start_date, period)
+    time_unit = period.get_time_unit()
+    if time_unit in (enums.TimeUnitEnum.MONTH, enums.TimeUnitEnum.YEAR):
+        step = period.get_period_value() * (12 if time_unit == enums.TimeUnitEnum.YEAR else 1)
+        months = np.arange(np.datetime64(first, "M"), np.datetime64(end_date, "M") + 1, step)
+        dates = months.astype("datetime64[ns]")
     else:
-        raise TimeUnitNotSupportedException()
-    return new_date
+        dates = np.arange(np.datetime64(first, "ns"), np.datetime64(end_date, "ns") + 1,
+                          np.timedelta64(period.get_period_value_sec(), "s"))
+    return pd.DatetimeIndex(dates[dates <= np.datetime64(end_date, "ns")])
+
+
+def get_previous_period_end(dt: datetime, period: enums.TimeseriesPeriodEnum) -> datetime:
+    # start of the bar containing dt, the last bar of a test ending at dt
+    return get_period_start(dt, period)
+
+
+def get_test_dates(start_date: datetime, end_date: datetime, period: enums.TimeseriesPeriodEnum) -> pd.DatetimeIndex:
+    # grid of the testers: one bar per period, aligned to the period boundaries
+    return get_period_dates(start_date, get_previous_period_end(end_date, period), period)
 
 
 def get_date_diff_in_sec(date_diff: timedelta):
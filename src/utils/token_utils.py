@@ -1,9 +1,16 @@
-import requests
+import json
+import os
+from typing import Dict, Iterable, List, Optional
 
+from src import settings
 from src.models.token import Pair, Token
 from src.utils.exception_utils import UnknownTokenException
 from src.utils.singleton import Singleton
 
+COINBASE_CURRENCIES_URL = "https://api.exchange.coinbase.com/currencies"
+# kraken altname -> common symbol
+KRAKEN_SYMBOLS = {"XBT": "BTC", "XDG": "DOGE"}
+
 
 class PairFactory(metaclass=Singleton):
     def get_pair_by_name(self, base_name: str, quote_name) -> Pair:
@@ -11,14 +18,134 @@ class PairFactory(metaclass=Singleton):
         return pair
 
 
+class TokenCatalog(metaclass=Singleton):
+    """
+    Local token metadata: bundled snapshot < kraken assets file < local catalog file, field by field
+    (the kraken file only knows min sizes). Tokens are interned, every lookup of a symbol returns the same Token.
+    """
+    entries: Optional[Dict[str, dict]]
+    tokens: Dict[str, Token]
+
+    def __init__(self):
+        self.entries = None
+        self.tokens = {}
+
+    def load(self) -> Dict[str, dict]:
+        entries = {}
+        for source in (_read_catalog(settings.TOKEN_CATALOG_SNAPSHOT_FILE),
+                       _read_kraken_assets(settings.KRAKEN_TOKEN_INFO_FILE),
+                       _read_catalog(settings.TOKEN_CATALOG_FILE)):
+            for symbol, entry in source.items():
+                entries[symbol] = {"name": symbol, **entries.get(symbol, {}), **entry}
+        self.entries = entries
+        self.tokens = {}
+        return entries
+
+    def get(self, symbol: str) -> Optional[Token]:
+        symbol = symbol.upper()
+        token = self.tokens.get(symbol)
+        if token is None:
+            if self.entries is None:
+                self.load()
+            entry = self.entries.get(symbol)
+            if entry is None:
+                return None
+            token = self.tokens[symbol] = Token(**entry)
+        return token
+
+    def add(self, entries: Iterable[dict], persist: bool = True):
+        if self.entries is None:
+            self.load()
+        new_entries = {e["symbol"].upper(): e for e in entries}
+        for symbol in new_entries:
+            self.tokens.pop(symbol, None)
+        self.entries.update(new_entries)
+        if persist:
+            catalog = _read_catalog(settings.TOKEN_CATALOG_FILE)
+            catalog.update(new_entries)
+            _write_catalog(settings.TOKEN_CATALOG_FILE, catalog)
+
+    def clear(self):
+        self.entries = None
+        self.tokens = {}
+
+
 def get_token_info(token_name: str) -> Token:
+    """
+    Get token info from the local catalog, see TokenCatalog and refresh_token_catalog.
+    Falls back to https://api.exchange.coinbase.com/ only if settings.TOKEN_CATALOG_ONLINE
+    """
+    catalog = TokenCatalog()
+    token = catalog.get(token_name)
+    if token is not None:
+        return token
+
+    if not settings.TOKEN_CATALOG_ONLINE:
+        raise UnknownTokenException(f"{token_name}: not in token catalog, run cmd_refresh_token_catalog.py")
+    catalog.add([fetch_token_info(token_name)])
+    return catalog.get(token_name)
+
+
+def fetch_token_info(token_name: str) -> dict:
     """
     Get token info from https://api.exchange.coinbase.com/
     """
-    token_info_url = f"https://api.exchange.coinbase.com/currencies/{token_name}"
-    resp = requests.get(url=token_info_url)
-    resp_json = resp.json()
+    import requests
+    try:
+        resp = requests.get(url=f"{COINBASE_CURRENCIES_URL}/{token_name}")
+        resp_json = resp.json()
+    except (requests.RequestException, ValueError) as exc:
+        raise UnknownTokenException(f"{token_name}: {exc}")
     if resp.status_code == 200:
-        return Token(name=resp_json["name"], symbol=resp_json["id"], min_size=resp_json["min_size"])
+        return _coinbase_to_entry(resp_json)
     else:
         raise UnknownTokenException(f"{token_name}: {resp_json['message']}")
+
+
+def refresh_token_catalog(token_names: List[str] = None) -> int:
+    """
+    Download token info from coinbase into settings.TOKEN_CATALOG_FILE (all currencies if no token is given)
+    """
+    import requests
+    if token_names:
+        entries = [fetch_token_info(token_name) for token_name in token_names]
+    else:
+        try:
+            resp = requests.get(url=COINBASE_CURRENCIES_URL)
+            resp.raise_for_status()
+            entries = [_coinbase_to_entry(c) for c in resp.json()]
+        except (requests.RequestException, ValueError) as exc:
+            raise UnknownTokenException(f"cannot download token catalog: {exc}")
+    TokenCatalog().add(entries)
+    return len(entries)
+
+
+def _coinbase_to_entry(currency: dict) -> dict:
+    return {"name": currency["name"], "symbol": currency["id"], "min_size": str(currency["min_size"])}
+
+
+def _read_catalog(path: str) -> Dict[str, dict]:
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as catalog_file:
+        return {symbol.upper(): entry for symbol, entry in json.load(catalog_file).items()}
+
+
+def _write_catalog(path: str, catalog: Dict[str, dict]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.tmp", "w") as catalog_file:
+        json.dump(dict(sorted(catalog.items())), catalog_file, indent=4)
+    os.replace(f"{path}.tmp", path)
+
+
+def _read_kraken_assets(path: str) -> Dict[str, dict]:
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as assets_file:
+        assets = json.load(assets_file)
+    assets = assets.get("result", assets)
+    entries = {}
+    for asset in assets.values():
+        symbol = KRAKEN_SYMBOLS.get(asset["altname"], asset["altname"]).upper()
+        entries[symbol] = {"symbol": symbol, "min_size": f"1E-{asset['decimals']}"}
+    return entries
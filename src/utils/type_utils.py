@@ -12,6 +12,16 @@ def to_decimal_old(value: Union[int, float, str, Decimal, None], precision: int
     return value
 
 
+def strtobool(value: str) -> bool:
+    # distutils.util.strtobool without importing distutils
+    value = value.lower()
+    if value in ('y', 'yes', 't', 'true', 'on', '1'):
+        return True
+    elif value in ('n', 'no', 'f', 'false', 'off', '0'):
+        return False
+    raise ValueError(f"invalid truth value {value!r}")
+
+
 def timestamp_to_datetime(ts: Union[str, int]) -> datetime:
     ts = int(ts)
     return datetime.fromtimestamp(ts)
@@ -0,0 +1,51 @@
+from datetime import datetime
+from typing import Callable
+
+import pandas as pd
+import pytest
+
+from src.models.token import Pair
+from src.utils import price_store, price_utils, token_utils
+from src.utils.synthetic_prices import SyntheticMarket
+
+PRICES_START = datetime(2020, 1, 1)
+PRICES_END = datetime(2020, 2, 1)
+
+
+@pytest.fixture
+def pair_btcusd() -> Pair:
+    return Pair(token_utils.get_token_info("BTC"), token_utils.get_token_info("USD"))
+
+
+@pytest.fixture
+def price_registry() -> price_utils.PriceRegistry:
+    registry = price_utils.PriceRegistry()
+    yield registry
+    registry.clear()
+
+
+@pytest.fixture
+def register_prices(price_registry) -> Callable[..., pd.DataFrame]:
+    """
+    register(pair, df=None, end=PRICES_END, **params) registers the prices `df` of `pair`, by default
+    seeded SyntheticMarket prices (SyntheticMarket params, hourly bars from PRICES_START to `end` included).
+    The registry is cleared after the test.
+    """
+    def register(pair: Pair, df: pd.DataFrame = None, end: datetime = PRICES_END, **params) -> pd.DataFrame:
+        if df is None:
+            market = SyntheticMarket(**{"start": PRICES_START, **params})
+            df = market.generate(int((end - market.start).total_seconds()) // market.step + 1)
+        price_registry.register(pair, price_store.OhlcSeries.from_df(str(pair), df))
+        return df
+    return register
+
+
+@pytest.fixture
+def ohlc_params() -> dict:
+    # register_prices params of ohlc_prices, override it in a module to test on other prices
+    return {}
+
+
+@pytest.fixture
+def ohlc_prices(pair_btcusd, register_prices, ohlc_params) -> pd.DataFrame:
+    return register_prices(pair_btcusd, **ohlc_params)
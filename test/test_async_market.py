@@ -0,0 +1,154 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from src.connections.exchange_connection import ConnectionPool, ExchangeConnector
+from src.connections.mock_connection import AsyncMockConnector
+from src.markets.async_market import AsyncMarket
+from src.markets.mock_market import MockMarket
+from src.models.order import Order
+from src.services.fake_exchange import FakeExchangeServer
+from src.utils import enums
+from src.utils.exception_utils import ExchangeException, MissingPriceException
+
+BALANCE = {"BTC": "1", "USD": "100000"}
+
+
+pytestmark = pytest.mark.usefixtures("ohlc_prices")
+
+
+@pytest.fixture
+def ohlc_params() -> dict:
+    return {"end": datetime(2020, 1, 3)}
+
+
+def new_orders(pair) -> list:
+    return [
+        Order(pair=pair, direction=enums.OrderDirectionEnum.BUY, order_type=enums.OrderTypeEnum.MARKET, qty="0.1"),
+        Order(pair=pair, direction=enums.OrderDirectionEnum.SELL, order_type=enums.OrderTypeEnum.MARKET, qty="0.2",
+              qty_type=enums.QtyTypeEnum.PERCENTAGE),
+        Order(pair=pair, direction=enums.OrderDirectionEnum.BUY, order_type=enums.OrderTypeEnum.MARKET, qty="500",
+              qty_unit_type=enums.QtyUnitTypeEnum.QUOTE),
+        Order(pair=pair, direction=enums.OrderDirectionEnum.HODL),
+    ]
+
+
+def run_sync(pair, dates) -> list:
+    market = MockMarket(BALANCE)
+    values = []
+    for dt in dates:
+        market.add_orders(execution_date=dt, orders=new_orders(pair))
+        values.append(market.get_account_balance(execution_date=dt).value)
+    return values
+
+
+async def run_async(market: AsyncMarket, pair, dates) -> list:
+    values = []
+    for dt in dates:
+        await market.add_orders(execution_date=dt, orders=new_orders(pair))
+        values.append((await market.get_account_balance(execution_date=dt)).value)
+    return values
+
+
+def get_dates(bars: int = 5) -> list:
+    return [datetime(2020, 1, 1, 1) + timedelta(hours=i) for i in range(bars)]
+
+
+def test_async_mock_market_matches_mock_market(pair_btcusd):
+    dates = get_dates()
+    values = asyncio.run(run_async(AsyncMarket(AsyncMockConnector(BALANCE)), pair_btcusd, dates))
+
+    assert values == run_sync(pair_btcusd, dates)
+    assert values[0] != values[-1]
+
+
+def test_exchange_connector_round_trip(pair_btcusd):
+    dt = datetime(2020, 1, 1, 1)
+
+    async def run():
+        async with FakeExchangeServer(initial_balance=BALANCE) as server:
+            connector = ExchangeConnector(account="alice", host=server.host, port=server.port)
+            market = AsyncMarket(connector)
+            order = Order(pair=pair_btcusd, direction=enums.OrderDirectionEnum.BUY,
+                          order_type=enums.OrderTypeEnum.LIMIT, qty="0.1", price="7000")
+            sent = await market.add_order(execution_date=dt, order=order)
+            open_orders = await market.get_open_orders(execution_date=dt)
+            with pytest.raises(MissingPriceException):
+                await market.get_instant_price(pair_btcusd, datetime(2021, 1, 1))
+            price = await market.get_instant_price(pair_btcusd, dt)
+            await market.close()
+            return server, sent, open_orders, price
+
+    server, sent, open_orders, price = asyncio.run(run())
+
+    assert sent.status == enums.OrderStatusEnum.OPEN
+    remote_orders = server.accounts["alice"].get_open_orders(execution_date=dt)
+    assert [o.order_id for o in open_orders] == [sent.order_id] == [o.order_id for o in remote_orders]
+    assert open_orders[0].qty == Decimal("0.1") and open_orders[0].price == Decimal("7000")
+    assert price.price > 0
+    # errors come back as responses, the connection is reused
+    assert server.connections == 1 and server.requests == 4
+
+
+def test_markets_share_a_connection_pool(pair_btcusd):
+    dates = get_dates()
+
+    async def run():
+        async with FakeExchangeServer(initial_balance=BALANCE, latency=0.002) as server:
+            pool = ConnectionPool(server.host, server.port, max_size=4)
+            markets = [AsyncMarket(ExchangeConnector(account=f"account-{i}", pool=pool)) for i in range(20)]
+            values = await asyncio.gather(*(run_async(market, pair_btcusd, dates) for market in markets))
+            await pool.close()
+            return server, pool, values
+
+    server, pool, values = asyncio.run(run())
+
+    assert len(server.accounts) == 20
+    assert pool.opened <= 4 and server.connections == pool.opened
+    assert server.max_in_flight > 1
+    expected = run_sync(pair_btcusd, dates)
+    assert all(v == expected for v in values)
+
+
+def test_connections_closed_by_the_exchange(pair_btcusd):
+    dt = datetime(2020, 1, 1, 1)
+    exchange = FakeExchangeServer(initial_balance=BALANCE)
+    accepted = []
+
+    async def serve(reader, writer):
+        accepted.append(writer)
+        line = await reader.readline()
+        if len(accepted) == 1:
+            # dropped during the request
+            writer.close()
+            return
+        request = json.loads(line)
+        writer.write(json.dumps({"id": request["id"], "result": exchange.handle(request)}).encode() + b"\n")
+        await writer.drain()
+        if len(accepted) == 2:
+            # dropped while idle in the pool
+            writer.close()
+            return
+        await exchange._serve(reader, writer)
+
+    async def run():
+        server = await asyncio.start_server(serve, "127.0.0.1", 0)
+        pool = ConnectionPool("127.0.0.1", server.sockets[0].getsockname()[1], max_size=1)
+        market = AsyncMarket(ExchangeConnector(account="alice", pool=pool))
+        with pytest.raises(ExchangeException):
+            await market.get_instant_price(pair_btcusd, dt)
+        prices = [await market.get_instant_price(pair_btcusd, dt)]
+        await asyncio.sleep(0.05)
+        prices += [await market.get_instant_price(pair_btcusd, dt) for _ in range(2)]
+        await market.close()
+        server.close()
+        await server.wait_closed()
+        return pool, prices
+
+    pool, prices = asyncio.run(run())
+
+    assert pool.opened == len(accepted) == 3
+    assert len({price.price for price in prices}) == 1
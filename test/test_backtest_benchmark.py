@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from src import backtest_benchmark
+from src.utils import price_utils
+
+
+@pytest.fixture
+def results(tmp_path):
+    cases = backtest_benchmark.get_cases(str(tmp_path), scale=0.01)
+    yield backtest_benchmark.run_suite(cases, repeat=1)
+    price_utils.PriceRegistry().clear()
+
+
+def test_synthetic_ohlc():
+    df = backtest_benchmark.get_synthetic_ohlc(1000, seed=3)
+
+    assert len(df) == 1000 and df.index.name == "Date"
+    assert (df["High"] >= df[["Open", "Close"]].max(axis=1)).all()
+    assert (df["Low"] <= df[["Open", "Close"]].min(axis=1)).all()
+    assert df.equals(backtest_benchmark.get_synthetic_ohlc(1000, seed=3))
+
+
+def test_run_suite(results):
+    assert set(results) == {"engine_hodl", "engine_dca", "token_amount_arithmetic", "account_balance_value",
+                            "formula_indicators", "price_loading", "synthetic_prices"}
+    for result in results.values():
+        assert result.best > 0 and result.best <= result.median
+        assert result.throughput > 0
+        assert result.peak_bytes > 0
+
+
+def test_run_suite_names(tmp_path):
+    cases = backtest_benchmark.get_cases(str(tmp_path), scale=0.01)
+    assert list(backtest_benchmark.run_suite(cases, repeat=1, names=["token_amount_arithmetic"])) == \
+        ["token_amount_arithmetic"]
+
+
+def test_baseline_roundtrip(results, tmp_path):
+    path = str(tmp_path / "baseline" / "benchmark.json")
+    backtest_benchmark.write_results(results, path, scale=0.01)
+    with open(path) as json_file:
+        assert json.load(json_file)["scale"] == 0.01
+
+    baseline = backtest_benchmark.read_results(path)
+    assert {name: result.to_dict() for name, result in baseline.items()} == \
+        {name: result.to_dict() for name, result in results.items()}
+    assert not backtest_benchmark.compare(results, baseline)["regression"].any()
+
+
+def test_compare_regression(results):
+    baseline = {name: backtest_benchmark.BenchmarkResult.from_dict(name, result.to_dict())
+                for name, result in results.items()}
+    baseline["engine_dca"].best = results["engine_dca"].best / 2
+    baseline["price_loading"].peak_bytes = results["price_loading"].peak_bytes // 2
+    del baseline["engine_hodl"]
+
+    report = backtest_benchmark.compare(results, baseline, tolerance=0.2)
+    assert list(report.index[report["regression"]]) == ["engine_dca", "price_loading"]
+    assert report.loc["engine_dca", "time_ratio"] == pytest.approx(2)
+    # no baseline, nothing to compare
+    assert not report.loc["engine_hodl", "regression"]
+
+
+def test_compare_other_scale(results, tmp_path):
+    path = str(tmp_path / "benchmark.json")
+    backtest_benchmark.write_results(results, path, scale=0.01)
+    baseline = backtest_benchmark.read_results(path)
+    assert {result.scale for result in baseline.values()} == {0.01}
+
+    # a run at twice the scale: same throughput, more memory for the fixed costs too
+    doubled = {name: backtest_benchmark.BenchmarkResult.from_dict(name, result.to_dict())
+               for name, result in results.items()}
+    for result in doubled.values():
+        result.scale, result.units, result.best = 0.02, result.units * 2, result.best * 2
+        result.peak_bytes = result.peak_bytes * 2 + 10_000_000
+
+    report = backtest_benchmark.compare(doubled, baseline, tolerance=0.2)
+    assert not report["regression"].any()
+    assert report["memory_ratio"].isna().all()
+    assert report["note"].str.contains("scale 0.02 vs baseline 0.01").all()
+
+    doubled["engine_dca"].best *= 2
+    report = backtest_benchmark.compare(doubled, baseline, tolerance=0.2)
+    assert list(report.index[report["regression"]]) == ["engine_dca"]
@@ -0,0 +1,211 @@
+import json
+import random
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import backtest_engine
+from src.backtest_engine import StrategyTester, VectorizedStrategyTester
+from src.backtest_recorder import ResultRecorder
+from src.models.order import Order
+from src.models.strategy import StrategyAction
+from src.services import formula_service, indicator_service
+from src.strategies.base_strategy import DollarCostAveragingStrategy, HodlStrategy
+from src.utils import enums, profiling_utils
+
+
+pytestmark = pytest.mark.usefixtures("ohlc_prices")
+
+
+@pytest.mark.parametrize("strategy_cls", [HodlStrategy, DollarCostAveragingStrategy])
+def test_vectorized_matches_event_engine(pair_btcusd, strategy_cls):
+    params = dict(start_test_date=datetime(2020, 1, 2), end_test_date=datetime(2020, 1, 9), pair=pair_btcusd)
+    engine = StrategyTester(strategy=strategy_cls(), **params)
+    engine.start_strategy_test()
+    expected = engine.test_result_to_df()
+
+    vectorized = VectorizedStrategyTester(strategy=strategy_cls(), **params)
+    res = vectorized.start_strategy_test()
+
+    assert list(expected.columns) == list(res.columns)
+    assert (expected['action'] == res['action']).all()
+    assert (expected['execution_date'] == res['execution_date']).all()
+    for col in ['value', 'BTC', 'USD']:
+        assert np.allclose(expected[col].astype(float), res[col], atol=0.01)
+
+
+@pytest.mark.parametrize("period, bars", [(enums.TimeseriesPeriodEnum.ONE_DAY, 13),
+                                          (enums.TimeseriesPeriodEnum.ONE_WEEK, 2)])
+def test_coarse_period(pair_btcusd, ohlc_prices, period, bars):
+    params = dict(start_test_date=datetime(2020, 1, 2), end_test_date=datetime(2020, 1, 14, 5), pair=pair_btcusd,
+                  period=period, show_progress=False)
+    engine = StrategyTester(strategy=DollarCostAveragingStrategy(), **params)
+    engine.start_strategy_test()
+    expected = engine.test_result_to_df()
+
+    assert len(expected) == bars
+    # first bar of the period: open of its first hour
+    first_date = expected['execution_date'].iloc[0]
+    candle = engine.market.get_candle(pair_btcusd, first_date.to_pydatetime())
+    assert candle.open == ohlc_prices.loc[first_date, 'Open']
+
+    res = VectorizedStrategyTester(strategy=DollarCostAveragingStrategy(), **params).start_strategy_test()
+    assert (expected['execution_date'] == res['execution_date']).all()
+    assert np.allclose(expected['value'].astype(float), res['value'], atol=0.01)
+
+
+def test_evaluate_result(pair_btcusd):
+    engine = StrategyTester(strategy=DollarCostAveragingStrategy(), start_test_date=datetime(2020, 1, 2),
+                            end_test_date=datetime(2020, 1, 9), pair=pair_btcusd, show_progress=False)
+    res = engine.evaluate_result(engine.start_strategy_test())
+
+    assert len(res.__dict__[str(enums.TimeseriesHorizonEnum.MONTH_TO_DATE)]) == len(engine.results)
+    assert res.metrics["bars"] == len(engine.results)
+    assert res.metrics["turnover"] > 0
+
+
+class EmaTrendStrategy(HodlStrategy):
+    def __init__(self):
+        self.indicators = {"ema": indicator_service.EmaIndicator(window=12)}
+        self.ema = []
+
+    def _execute(self, **params):
+        self.ema.append(self.indicators["ema"].value)
+        return super()._execute(**params)
+
+
+def test_strategy_indicators(pair_btcusd, ohlc_prices):
+    strategy = EmaTrendStrategy()
+    engine = StrategyTester(strategy=strategy, start_test_date=datetime(2020, 1, 2), end_test_date=datetime(2020, 1, 9),
+                            pair=pair_btcusd, show_progress=False)
+    engine.start_strategy_test()
+
+    dates = engine.test_result_to_df()['execution_date']
+    expected = formula_service.get_ema(ohlc_prices.loc[dates.iloc[0]:dates.iloc[-1], 'Close'], window=12)
+    np.testing.assert_allclose(strategy.ema, expected, rtol=1e-9)
+
+
+class RoundTripStrategy(HodlStrategy):
+    # buys and sells the same quantity on every bar
+    def action_to_order(self, action):
+        return [Order(pair=action.pair, direction=direction, order_type=enums.OrderTypeEnum.MARKET, qty="0.001")
+                for direction in (enums.OrderDirectionEnum.BUY, enums.OrderDirectionEnum.SELL)]
+
+
+def test_many_orders_per_bar(pair_btcusd):
+    engine = StrategyTester(strategy=RoundTripStrategy(), start_test_date=datetime(2020, 1, 2),
+                            end_test_date=datetime(2020, 1, 3), pair=pair_btcusd, show_progress=False,
+                            initial_balance={"BTC": "1", "USD": "1000"})
+    engine.start_strategy_test()
+
+    dates = engine.get_dates()
+    assert len(engine.market.connector.service.orders.archive) == 2 * len(dates)
+    # the buy fee is paid in BTC
+    balance = engine.market.get_account_balance(execution_date=dates[-1].to_pydatetime())
+    assert balance.get_token_amount_by_symbol("BTC").amount == 1 - len(dates) * Decimal("0.0000024")
+
+
+class LimitLadderStrategy(EmaTrendStrategy):
+    # a resting limit buy every 10 bars, DCA buys in between
+    def __init__(self):
+        super().__init__()
+        self.dca = DollarCostAveragingStrategy("10")
+
+    def _execute(self, **params):
+        action = super()._execute(**params)
+        bar = len(self.ema)
+        if bar % 10 == 0:
+            return StrategyAction(pair=self.pair, direction=enums.OrderDirectionEnum.BUY,
+                                  order_type=enums.OrderTypeEnum.LIMIT, qty="0.001", price=str(7900 - bar))
+        if bar % 3 == 0:
+            return self.dca.execute(pair=self.pair, execute_date=self.execute_date)
+        return action
+
+
+def test_checkpoint_and_resume(pair_btcusd, tmp_path):
+    params = dict(start_test_date=datetime(2020, 1, 2), end_test_date=datetime(2020, 1, 12), pair=pair_btcusd,
+                  show_progress=False)
+    random.seed(1)
+    engine = StrategyTester(strategy=LimitLadderStrategy(), **params)
+    engine.start_strategy_test()
+    expected = engine.test_result_to_df()
+
+    random.seed(1)
+    checkpoint_path = str(tmp_path / "test.ckpt")
+    segment = StrategyTester(strategy=LimitLadderStrategy(), checkpoint_path=checkpoint_path, checkpoint_every=7,
+                             segment_bars=50, **params)
+    segment.start_strategy_test()
+    assert segment.cursor == 50 and not segment.is_complete
+    # nothing that stops pickling on newer interpreters (itertools objects)
+    with open(checkpoint_path, "rb") as checkpoint_file:
+        assert b"itertools" not in checkpoint_file.read()
+    segments = 1
+    while True:
+        # every segment in a "new process": nothing but the checkpoint file is shared
+        random.seed(segments)
+        resumed = StrategyTester.resume(checkpoint_path)
+        segments += 1
+        if resumed.is_complete:
+            break
+
+    assert segments == 5
+    pd.testing.assert_frame_equal(resumed.test_result_to_df(), expected)
+    assert resumed.strategy.ema == engine.strategy.ema
+    open_orders = resumed.market.get_open_orders(execution_date=resumed.get_dates()[-1].to_pydatetime())
+    assert [o.order_id for o in open_orders] == \
+           [o.order_id for o in engine.market.get_open_orders(execution_date=engine.get_dates()[-1].to_pydatetime())]
+    assert open_orders
+
+
+class SmallChunksRecorder(ResultRecorder):
+    def __init__(self, capacity: int = None, chunk_size: int = 64, spill_dir: str = None):
+        super().__init__(capacity, chunk_size, spill_dir)
+
+
+def test_resume_spilled_results(pair_btcusd, tmp_path, monkeypatch):
+    monkeypatch.setattr(backtest_engine, "ResultRecorder", SmallChunksRecorder)
+    params = dict(strategy=DollarCostAveragingStrategy(), start_test_date=datetime(2020, 1, 2),
+                  end_test_date=datetime(2020, 1, 12), pair=pair_btcusd, show_progress=False)
+    expected = StrategyTester(**params)
+    expected.start_strategy_test()
+
+    checkpoint_path = str(tmp_path / "test.ckpt")
+    spill_params = dict(params, checkpoint_path=checkpoint_path, results_spill_dir=str(tmp_path / "results"))
+    StrategyTester(segment_bars=200, **spill_params).start_strategy_test()
+    assert len(list((tmp_path / "results").glob("chunk_*.npz"))) == 3
+
+    # a restarted process builds its tester again before resuming
+    StrategyTester(**spill_params)
+    resumed = StrategyTester.resume(checkpoint_path)
+    assert resumed.is_complete
+    pd.testing.assert_frame_equal(resumed.test_result_to_df(), expected.test_result_to_df())
+
+
+def test_profile_report(pair_btcusd, tmp_path):
+    report_path = str(tmp_path / "profile.json")
+    engine = StrategyTester(strategy=DollarCostAveragingStrategy(), start_test_date=datetime(2020, 1, 2),
+                            end_test_date=datetime(2020, 1, 4), pair=pair_btcusd, show_progress=False, profile=True,
+                            profile_cprofile=True, profile_tracemalloc=True, profile_report_path=report_path)
+    engine.start_strategy_test()
+    bars = len(engine.get_dates())
+
+    with open(report_path) as report_file:
+        report = json.load(report_file)
+    assert report == json.loads(json.dumps(engine.profile_report))
+    stages = report["stages"]
+    assert {"strategy", "orders", "normalization", "matching", "balance", "valuation", "recording"} <= set(stages)
+    assert all(stages[name]["count"] == bars for name in ("strategy", "orders", "normalization", "recording"))
+    assert stages["orders"]["total"] >= stages["normalization"]["total"]
+    assert report["functions"] and report["memory"]["peak"] > 0
+    assert not profiling_utils.StageProfiler().enabled
+
+
+def test_profile_disabled(pair_btcusd):
+    engine = StrategyTester(strategy=HodlStrategy(), start_test_date=datetime(2020, 1, 2),
+                            end_test_date=datetime(2020, 1, 3), pair=pair_btcusd, show_progress=False)
+    engine.start_strategy_test()
+    assert engine.profile_report is None
+    assert profiling_utils.StageProfiler().stage("strategy") is profiling_utils.StageProfiler().stage("orders")
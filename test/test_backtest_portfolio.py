@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from src.backtest_engine import StrategyTester
+from src.backtest_portfolio import PortfolioTester, Sleeve
+from src.models.token import Pair
+from src.services import indicator_service
+from src.strategies.base_strategy import DollarCostAveragingStrategy, HodlStrategy
+from src.utils import token_utils
+
+START, END = datetime(2020, 1, 2), datetime(2020, 1, 6)
+BALANCE = {"BTC": "1", "ETH": "10", "USD": "10000"}
+
+
+@pytest.fixture
+def pair_ethusd() -> Pair:
+    return Pair(token_utils.get_token_info("ETH"), token_utils.get_token_info("USD"))
+
+
+@pytest.fixture(autouse=True)
+def ohlc_prices(pair_btcusd, pair_ethusd, register_prices):
+    register_prices(pair_btcusd)
+    register_prices(pair_ethusd, seed=1, initial_price=150.)
+
+
+class EmaStrategy(HodlStrategy):
+    def __init__(self):
+        self.indicators = {"ema": indicator_service.EmaIndicator(window=12)}
+
+
+def run_alone(strategy, pair) -> pd.DataFrame:
+    tester = StrategyTester(strategy=strategy, pair=pair, start_test_date=START, end_test_date=END,
+                            initial_balance=BALANCE, show_progress=False)
+    tester.start_strategy_test()
+    return tester.test_result_to_df()
+
+
+def test_sleeves_match_separate_runs(pair_btcusd, pair_ethusd):
+    sleeves = [Sleeve(strategy=DollarCostAveragingStrategy("50"), pair=pair_btcusd),
+               Sleeve(strategy=DollarCostAveragingStrategy("20", hour=10), pair=pair_ethusd),
+               Sleeve(strategy=HodlStrategy(), pair=pair_ethusd)]
+    tester = PortfolioTester(sleeves=sleeves, start_test_date=START, end_test_date=END, initial_balance=BALANCE,
+                             show_progress=False)
+    tester.start_strategy_test()
+
+    expected = [run_alone(DollarCostAveragingStrategy("50"), pair_btcusd),
+                run_alone(DollarCostAveragingStrategy("20", hour=10), pair_ethusd),
+                run_alone(HodlStrategy(), pair_ethusd)]
+    for sleeve, df in zip(sleeves, expected):
+        pd.testing.assert_frame_equal(tester.test_result_to_df(sleeve.name), df)
+    assert len(tester.markets) == 3
+    summary = tester.evaluate_result()
+    assert list(summary.index) == [s.name for s in sleeves]
+    assert summary.loc[sleeves[0].name, "bars"] == len(tester.get_dates())
+
+
+def test_shared_account(pair_btcusd, pair_ethusd):
+    sleeves = [Sleeve(strategy=DollarCostAveragingStrategy("50"), pair=pair_btcusd, account="main"),
+               Sleeve(strategy=DollarCostAveragingStrategy("50"), pair=pair_ethusd, account="main")]
+    tester = PortfolioTester(sleeves=sleeves, start_test_date=START, end_test_date=END, initial_balance=BALANCE,
+                             show_progress=False)
+    tester.start_strategy_test()
+
+    account = tester.get_account_result("main")
+    assert len(tester.markets) == 1
+    assert account["USD"].iloc[-1] == pytest.approx(10000 - 100 * len(tester.get_dates()), abs=0.01)
+    assert (account["BTC"].diff().dropna() > 0).all() and (account["ETH"].diff().dropna() > 0).all()
+    pd.testing.assert_frame_equal(tester.test_result_to_df(sleeves[1].name).drop(columns="action"), account)
+
+
+def test_bar_data_is_looked_up_once(pair_btcusd, monkeypatch):
+    sleeves = [Sleeve(strategy=EmaStrategy(), pair=pair_btcusd, name=f"ema_{i}") for i in range(3)]
+    tester = PortfolioTester(sleeves=sleeves, start_test_date=START, end_test_date=END, initial_balance=BALANCE,
+                             show_progress=False)
+    lookups = []
+    get_candle = tester.prices.get_candle
+    monkeypatch.setattr(tester.prices, "get_candle", lambda *args: lookups.append(args) or get_candle(*args))
+
+    tester.start_strategy_test()
+
+    # the candle of the indicators, the marks of BTC and ETH for the three accounts
+    assert len(lookups) == 3 * len(tester.get_dates())
+    values = {s.strategy.indicators["ema"].value for s in sleeves}
+    assert len(values) == 1 and values.pop() is not None
+
+
+def test_unique_sleeve_names(pair_btcusd):
+    with pytest.raises(ValueError):
+        PortfolioTester(sleeves=[Sleeve(strategy=HodlStrategy(), pair=pair_btcusd) for _ in range(2)])
@@ -0,0 +1,77 @@
+import pickle
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from src.backtest_recorder import ResultRecorder
+from src.models.strategy import StrategyAction
+from src.models.token import Pair, TokenAmount
+from src.models.user import AccountBalance
+from src.utils import enums
+
+
+def record_bars(recorder: ResultRecorder, pair: Pair, bars: int):
+    balance = AccountBalance([TokenAmount(pair.base, "0.1"), TokenAmount(pair.quote, "1000")])
+    buy = StrategyAction(pair=pair, direction=enums.OrderDirectionEnum.BUY, order_type=enums.OrderTypeEnum.MARKET,
+                         qty=1)
+    hodl = StrategyAction(pair=pair, direction=enums.OrderDirectionEnum.HODL)
+    for i in range(bars):
+        balance.balance[1].amount -= Decimal("1.01")
+        balance.value = Decimal(i)
+        recorder.record(datetime(2020, 1, 1) + timedelta(hours=i), balance, buy if i % 2 else hodl)
+
+
+def test_record_to_df(pair_btcusd):
+    recorder = ResultRecorder(capacity=2, chunk_size=4)
+    record_bars(recorder, pair_btcusd, 11)
+    df = recorder.to_df()
+    assert len(recorder) == 11 and recorder.capacity == 14
+    assert list(df.columns) == ["execution_date", "value", "BTC", "USD", "action"]
+    assert df["execution_date"].iloc[10] == datetime(2020, 1, 1, 10)
+    assert df["USD"].iloc[10] == pytest.approx(1000 - 11 * 1.01)
+    assert list(df["action"].iloc[:3]) == ["hodl", "buy", "hodl"]
+    assert np.array_equal(df["value"], np.arange(11))
+
+
+def test_record_spill_to_disk(pair_btcusd, tmp_path):
+    in_memory = ResultRecorder(chunk_size=4)
+    spilled = ResultRecorder(chunk_size=4, spill_dir=str(tmp_path))
+    record_bars(in_memory, pair_btcusd, 11)
+    record_bars(spilled, pair_btcusd, 11)
+    assert spilled.spilled == 8 and spilled.capacity == 4
+    assert len(list(tmp_path.glob("chunk_*.npz"))) == 2
+    assert in_memory.to_df().equals(spilled.to_df())
+
+
+def test_spill_dir_reused(pair_btcusd, tmp_path):
+    record_bars(ResultRecorder(chunk_size=4, spill_dir=str(tmp_path)), pair_btcusd, 13)
+    recorder = ResultRecorder(chunk_size=4, spill_dir=str(tmp_path))
+    record_bars(recorder, pair_btcusd, 6)
+    expected = ResultRecorder(chunk_size=4)
+    record_bars(expected, pair_btcusd, 6)
+
+    assert len(list(tmp_path.glob("chunk_*.npz"))) == 1
+    assert len(recorder) == len(recorder.to_df()) == 6
+    assert recorder.to_df().equals(expected.to_df())
+
+
+def test_pickle_and_discard_unknown_chunks(pair_btcusd, tmp_path):
+    recorder = ResultRecorder(chunk_size=4, spill_dir=str(tmp_path))
+    record_bars(recorder, pair_btcusd, 6)
+    saved = pickle.dumps(recorder)
+    assert len(saved) < 2000
+
+    # the run goes on and spills, then crashes: the saved state is resumed
+    record_bars(recorder, pair_btcusd, 6)
+    assert len(list(tmp_path.glob("chunk_*.npz"))) == 2
+    resumed: ResultRecorder = pickle.loads(saved)
+    resumed.discard_unknown_chunks()
+    assert len(list(tmp_path.glob("chunk_*.npz"))) == 1
+
+    record_bars(resumed, pair_btcusd, 5)
+    expected = ResultRecorder(chunk_size=4)
+    record_bars(expected, pair_btcusd, 6)
+    record_bars(expected, pair_btcusd, 5)
+    assert resumed.to_df().equals(expected.to_df())
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from src import backtest_sweep
+from src.strategies.base_strategy import DollarCostAveragingStrategy
+
+
+pytestmark = pytest.mark.usefixtures("ohlc_prices")
+
+
+@pytest.fixture
+def tasks(pair_btcusd):
+    windows = [(datetime(2020, 1, 2), datetime(2020, 1, 9)), (datetime(2020, 1, 9), datetime(2020, 1, 16))]
+    return backtest_sweep.build_tasks(DollarCostAveragingStrategy, pair_btcusd, windows,
+                                      param_grid={"amount": ["10", "50"], "hour": [None, 12]}, seed=42)
+
+
+def test_build_tasks(tasks):
+    assert len(tasks) == 8
+    assert len({t.seed for t in tasks}) == 8
+    assert tasks[3].strategy_params == {"amount": "50", "hour": 12}
+
+
+def test_run_sweep_in_process(tasks):
+    results = list(backtest_sweep.run_sweep(tasks, max_workers=1))
+    df = backtest_sweep.sweep_to_df(results)
+    assert list(df["task_id"]) == list(range(8))
+    buys = results[1].result["action"].eq("buy").sum()  # one buy a day at 12:00
+    assert buys == 7
+    assert (df["max_drawdown"] <= 0).all()
+
+
+def test_run_sweep_process_pool_is_deterministic(tasks):
+    serial = backtest_sweep.sweep_to_df(backtest_sweep.run_sweep(tasks, max_workers=1))
+    parallel = backtest_sweep.sweep_to_df(backtest_sweep.run_sweep(tasks, max_workers=2))
+    cols = ["task_id", "end_value", "rate_of_return", "max_drawdown"]
+    pd.testing.assert_frame_equal(serial[cols], parallel[cols])
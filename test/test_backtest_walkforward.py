@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import backtest_walkforward
+from src.models.strategy import StrategyAction, StrategySignal
+from src.models.token import Pair
+from src.services import formula_service
+from src.strategies.base_strategy import Strategy
+from src.utils import enums
+from src.utils.feature_cache import FeatureCache
+
+
+class EmaTrendStrategy(Strategy):
+    """
+    Long 0.05 BTC above the EMA, flat below it (vectorized only)
+    """
+
+    def __init__(self, window: int = 21):
+        self.window = window
+
+    def _execute(self, **params) -> StrategyAction:
+        raise NotImplementedError()
+
+    def action_to_order(self, action: StrategyAction):
+        raise NotImplementedError()
+
+    def generate_signal(self, pair: Pair, dates: pd.DatetimeIndex, prices: pd.DataFrame, **params) -> StrategySignal:
+        ema = formula_service.get_feature_window(pair, "ema", dates[0], dates[-1], window=self.window)
+        target = np.where(prices["Close"].to_numpy() > ema.reindex(dates).to_numpy(), 0.05, 0.)
+        return StrategySignal.from_target_position(pair, target)
+
+
+pytestmark = pytest.mark.usefixtures("ohlc_prices")
+
+
+@pytest.fixture(autouse=True)
+def cache() -> FeatureCache:
+    cache = FeatureCache()
+    cache_dir = cache.cache_dir
+    cache.cache_dir = None
+    cache.clear()
+    yield cache
+    cache.cache_dir = cache_dir
+    cache.clear()
+
+
+@pytest.fixture
+def windows():
+    return backtest_walkforward.get_windows(datetime(2020, 1, 2), datetime(2020, 1, 20),
+                                            enums.TimeseriesPeriodEnum.ONE_HOURS, train_bars=96, test_bars=48)
+
+
+def test_get_windows(windows):
+    # 433 bars: 96 train bars, then test windows of 48 bars until the end, the last one has a single bar
+    assert len(windows) == 8
+    assert windows[0].train_start == datetime(2020, 1, 2) and windows[0].train_end == datetime(2020, 1, 5, 23)
+    assert windows[0].test_start == datetime(2020, 1, 6) and windows[0].test_end == datetime(2020, 1, 7, 23)
+    for previous, window in zip(windows, windows[1:]):
+        assert window.test_start == previous.test_end + pd.Timedelta(hours=1)
+        assert window.train_start == previous.train_start + pd.Timedelta(hours=48)
+    assert windows[-1].test_start == windows[-1].test_end == datetime(2020, 1, 20)
+
+    overlapping = backtest_walkforward.get_windows(datetime(2020, 1, 2), datetime(2020, 1, 20),
+                                                   enums.TimeseriesPeriodEnum.ONE_HOURS, 96, 48, step_bars=24)
+    assert len(overlapping) == 15
+    with pytest.raises(ValueError):
+        backtest_walkforward.get_windows(datetime(2020, 1, 2), datetime(2020, 1, 20),
+                                         enums.TimeseriesPeriodEnum.ONE_HOURS, 96, 0)
+
+
+def test_run_walk_forward(pair_btcusd, windows, cache):
+    res = backtest_walkforward.run_walk_forward(EmaTrendStrategy, pair_btcusd, windows,
+                                                param_grid={"window": [5, 21, 50]}, max_workers=1)
+
+    assert len(res.in_sample) == len(windows) * 3
+    assert list(res.metrics.index) == [w.window_id for w in windows]
+    for window_id, row in res.metrics.iterrows():
+        train = res.in_sample[res.in_sample["start_test_date"] == windows[window_id].train_start]
+        assert row["window"] == train.loc[train["sharpe_ratio"].idxmax(), "window"]
+        assert row["in_sample_sharpe_ratio"] == train["sharpe_ratio"].max()
+    # indicators are computed once over the whole history, whatever the number of windows
+    assert cache.misses == 3
+
+    equity = res.equity
+    assert len(equity) == sum(res.metrics["bars"])
+    assert equity["execution_date"].is_monotonic_increasing and equity["execution_date"].is_unique
+    assert equity["execution_date"].iloc[0] == windows[0].test_start
+    # every window continues from the end of the previous one
+    for window_id in res.metrics.index[1:]:
+        window = equity[equity["window_id"] == window_id]["value"]
+        start = res.metrics.loc[window_id, "start_value"]
+        assert window.iloc[-1] / window.iloc[0] == pytest.approx(res.metrics.loc[window_id, "end_value"] / start)
+    assert res.summary["bars"] == len(equity)
+
+
+def test_run_walk_forward_process_pool(pair_btcusd, windows):
+    params = dict(param_grid={"window": [5, 21]}, objective="rate_of_return")
+    serial = backtest_walkforward.run_walk_forward(EmaTrendStrategy, pair_btcusd, windows, max_workers=1, **params)
+    parallel = backtest_walkforward.run_walk_forward(EmaTrendStrategy, pair_btcusd, windows, max_workers=2, **params)
+
+    pd.testing.assert_frame_equal(serial.metrics, parallel.metrics)
+    pd.testing.assert_frame_equal(serial.equity, parallel.equity)
@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.services import formula_service
+from src.utils import price_store, price_utils
+from src.utils.feature_cache import FeatureCache
+
+
+pytestmark = pytest.mark.usefixtures("ohlc_prices")
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path) -> FeatureCache:
+    cache = FeatureCache()
+    max_bytes, cache_dir = cache.max_bytes, cache.cache_dir
+    cache.max_bytes, cache.cache_dir = 1 << 20, None
+    cache.clear()
+    yield cache
+    cache.max_bytes, cache.cache_dir = max_bytes, cache_dir
+    cache.clear()
+
+
+def test_get_feature(pair_btcusd, ohlc_prices, cache):
+    res = formula_service.get_feature(pair_btcusd, "ema", window=21)
+    pd.testing.assert_series_equal(res, formula_service.get_ema(ohlc_prices['Close'], window=21),
+                                   check_index_type=False, check_freq=False)
+    assert formula_service.get_feature(pair_btcusd, "ema", window=21) is res
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    formula_service.get_feature(pair_btcusd, "ema", window=12)
+    formula_service.get_feature(pair_btcusd, "ema", from_dt=datetime(2020, 1, 10), window=21)
+    formula_service.get_feature(pair_btcusd, "ema", field='Open', window=21)
+    assert (cache.hits, cache.misses) == (1, 4)
+
+    stoch = formula_service.get_feature(pair_btcusd, "stoch", window=14)
+    pd.testing.assert_frame_equal(stoch, formula_service.get_stoch(ohlc_prices, window=14),
+                                  check_index_type=False, check_freq=False)
+
+
+def test_get_feature_window(pair_btcusd, ohlc_prices, cache):
+    windows = [(datetime(2020, 1, 2), datetime(2020, 1, 9)), (datetime(2020, 1, 5), datetime(2020, 1, 12))]
+    full = formula_service.get_ema(ohlc_prices['Close'], window=21)
+    for from_dt, to_dt in windows:
+        res = formula_service.get_feature_window(pair_btcusd, "ema", from_dt, to_dt, window=21)
+        assert res.index[0] == from_dt and res.index[-1] == to_dt
+        np.testing.assert_allclose(res, full.loc[from_dt:to_dt])
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_prices_changed(pair_btcusd, ohlc_prices, cache):
+    res = formula_service.get_feature(pair_btcusd, "ma", window=5)
+    df = ohlc_prices.copy()
+    df.iloc[10:20] *= 2
+    price_utils.PriceRegistry().register(pair_btcusd, price_store.OhlcSeries.from_df(str(pair_btcusd), df))
+
+    new = formula_service.get_feature(pair_btcusd, "ma", window=5)
+    assert cache.misses == 2
+    assert not new.equals(res)
+
+
+def test_lru_byte_budget(pair_btcusd, ohlc_prices, cache):
+    nbytes = len(ohlc_prices) * 16  # values + index
+    cache.max_bytes = 2 * nbytes
+    for window in (2, 3, 4):
+        formula_service.get_feature(pair_btcusd, "ma", window=window)
+    assert len(cache) == 2
+    assert cache.size == 2 * nbytes
+
+    formula_service.get_feature(pair_btcusd, "ma", window=4)
+    formula_service.get_feature(pair_btcusd, "ma", window=2)
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_disk_tier(pair_btcusd, ohlc_prices, cache, tmp_path):
+    cache.cache_dir = str(tmp_path)
+    expected = formula_service.get_feature(pair_btcusd, "stoch", window=14)
+    atr = formula_service.get_feature(pair_btcusd, "atr", window=14)
+
+    # another process: empty memory, same directory
+    cache.clear()
+    res = formula_service.get_feature(pair_btcusd, "stoch", window=14)
+    assert (cache.hits, cache.misses) == (1, 0)
+    pd.testing.assert_frame_equal(res, expected, check_freq=False)
+    pd.testing.assert_series_equal(formula_service.get_feature(pair_btcusd, "atr", window=14), atr,
+                                   check_freq=False)
+
+    # the directory is shared with other files
+    (tmp_path / "notes.json").write_text("{}")
+    (tmp_path / "prices").mkdir()
+    cache.clear(disk=True)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["notes.json", "prices"]
@@ -0,0 +1,78 @@
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import settings
+from src.services import formula_service
+from src.utils.enums import TimeseriesHorizonEnum
+
+
+@pytest.fixture
+def values() -> pd.Series:
+    dates = pd.date_range(datetime(2016, 6, 1), datetime(2018, 3, 1), freq="6h")
+    values = 1000 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, len(dates))))
+    return pd.Series(values, index=dates)
+
+
+def naive_time_weighted_rate_of_return(values: pd.Series, horizon: TimeseriesHorizonEnum) -> pd.Series:
+    rr = {}
+    for dt, val in values.items():
+        start_dt = horizon.get_horizon_start_date(dt.to_pydatetime())
+        try:
+            start_val = values.loc[start_dt]
+        except KeyError:
+            start_val = Decimal("0")
+        rr[dt] = formula_service.get_rate_of_return(start_val, val)
+    return pd.Series(rr, dtype=float)
+
+
+@pytest.mark.parametrize("horizon", list(TimeseriesHorizonEnum))
+def test_time_weighted_rate_of_return(values, horizon):
+    if horizon == TimeseriesHorizonEnum.INCEPTION:
+        values = values[settings.BIG_BANG_DATE:]
+    expected = naive_time_weighted_rate_of_return(values, horizon)
+    res = formula_service.get_time_weighted_rate_of_return(values, horizon)
+    pd.testing.assert_series_equal(res, expected, check_freq=False)
+    assert (res != 0).any()
+
+
+@pytest.mark.parametrize("horizon", list(TimeseriesHorizonEnum))
+def test_horizon_start_dates(values, horizon):
+    res = formula_service.get_horizon_start_dates(values.index, horizon)
+    assert [d.to_pydatetime() for d in res] == [horizon.get_horizon_start_date(d.to_pydatetime()) for d in values.index]
+
+
+@pytest.mark.parametrize("period", [1, 3, 30])
+def test_rolling_rate_of_return(values, period):
+    expected = values.rolling(window=period + 1, min_periods=0).apply(
+        lambda x: formula_service.get_rate_of_return(x[0], x[-1]), raw=True)
+    res = formula_service.get_rolling_rate_of_return(values, period)
+    pd.testing.assert_series_equal(res, expected.rename("value"), check_freq=False)
+
+
+def test_metrics(values):
+    result = pd.DataFrame({"execution_date": values.index, "value": values.to_numpy(),
+                           settings.ACCOUNT_BALANCE_CURRENCY: 0., "action": "HODL"})
+    result.loc[10:, settings.ACCOUNT_BALANCE_CURRENCY] = -500.
+
+    metrics = formula_service.get_metrics(result)
+
+    returns = values.pct_change().dropna()
+    assert metrics["bars"] == len(values)
+    assert metrics["rate_of_return"] == pytest.approx(values.iloc[-1] / values.iloc[0] - 1)
+    assert metrics["max_drawdown"] == pytest.approx(formula_service.get_max_drawdown(values))
+    assert metrics["max_drawdown_date"] == (values / values.cummax()).idxmin()
+    assert metrics["volatility"] == pytest.approx(returns.std() * np.sqrt(4 * 365))
+    assert metrics["sharpe_ratio"] == pytest.approx(returns.mean() / returns.std() * np.sqrt(4 * 365))
+    assert abs(metrics["sortino_ratio"]) > abs(metrics["sharpe_ratio"]) > 0
+    assert np.sign(metrics["sortino_ratio"]) == np.sign(metrics["sharpe_ratio"])
+    assert metrics["turnover"] == pytest.approx(500 / values.mean())
+
+
+def test_metrics_flat():
+    dates = pd.date_range(datetime(2020, 1, 1), periods=10, freq="h")
+    metrics = formula_service.get_metrics(pd.DataFrame({"execution_date": dates, "value": 100.}))
+    assert metrics["rate_of_return"] == metrics["sharpe_ratio"] == metrics["max_drawdown"] == 0
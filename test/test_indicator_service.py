@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.candle import Candle
+from src.services import formula_service, indicator_service
+from src.utils.enums import PivotTypeEnum
+
+
+@pytest.fixture
+def ohlc_prices() -> pd.DataFrame:
+    dates = pd.date_range(datetime(2020, 1, 1), periods=500, freq="h", name="Date")
+    rng = np.random.default_rng(0)
+    close = 8000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+    df = pd.DataFrame({"Open": close * (1 + rng.normal(0, 0.002, len(dates))), "Close": close}, index=dates)
+    df["High"] = df[["Open", "Close"]].max(axis=1) * (1 + rng.uniform(0, 0.005, len(dates)))
+    df["Low"] = df[["Open", "Close"]].min(axis=1) * (1 - rng.uniform(0, 0.005, len(dates)))
+    # a few flat candles
+    df.iloc[100:120] = 8000.
+    return df
+
+
+def stream(indicator: indicator_service.Indicator, df: pd.DataFrame, attr: str = "value") -> pd.Series:
+    values = []
+    for row in df.itertuples():
+        indicator.update(Candle(row.Index, row.Open, row.High, row.Low, row.Close))
+        values.append(getattr(indicator, attr))
+    return pd.Series(values, index=df.index, dtype=float)
+
+
+@pytest.mark.parametrize("window", [1, 5, 21])
+def test_ema(ohlc_prices, window):
+    expected = formula_service.get_ema(ohlc_prices["Close"], window=window)
+    np.testing.assert_allclose(stream(indicator_service.EmaIndicator(window), ohlc_prices), expected, rtol=1e-9)
+
+
+def test_ema_no_fillna(ohlc_prices):
+    expected = formula_service.get_ema(ohlc_prices["Close"], window=10, fillna=False)
+    np.testing.assert_allclose(stream(indicator_service.EmaIndicator(10, fillna=False), ohlc_prices), expected,
+                               rtol=1e-9)
+
+
+@pytest.mark.parametrize("window", [1, 5, 21])
+def test_sma(ohlc_prices, window):
+    expected = formula_service.get_ma(ohlc_prices["Close"], window=window)
+    np.testing.assert_allclose(stream(indicator_service.SmaIndicator(window), ohlc_prices), expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize("window", [2, 14])
+def test_rsi(ohlc_prices, window):
+    expected = formula_service.get_rsi(ohlc_prices["Close"], window=window)
+    np.testing.assert_allclose(stream(indicator_service.RsiIndicator(window), ohlc_prices), expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize("window", [3, 14])
+def test_stoch(ohlc_prices, window):
+    expected = formula_service.get_stoch(ohlc_prices, window=window)
+    indicator = indicator_service.StochIndicator(window)
+    values = stream(indicator, ohlc_prices)
+    np.testing.assert_allclose(values, expected["Stoch"], rtol=1e-9)
+    indicator = indicator_service.StochIndicator(window)
+    np.testing.assert_allclose(stream(indicator, ohlc_prices, "signal"), expected["Stoch Signal"], rtol=1e-9)
+
+
+@pytest.mark.parametrize("window", [1, 14])
+def test_atr(ohlc_prices, window):
+    expected = formula_service.get_atr(ohlc_prices, window=window)
+    np.testing.assert_allclose(stream(indicator_service.AtrIndicator(window), ohlc_prices), expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize("pivot_type", [PivotTypeEnum.HIGH, PivotTypeEnum.LOW])
+def test_pivot(ohlc_prices, pivot_type):
+    neighborhood = 5
+    expected = formula_service.get_pivot(ohlc_prices["Close"], pivot_type, neighborhood)
+    values = stream(indicator_service.PivotIndicator(pivot_type, neighborhood), ohlc_prices)
+    # every flag is known neighborhood bars later, the last ones need future bars
+    lagged = values.shift(-neighborhood).iloc[:-neighborhood]
+    assert (lagged.astype(bool) == expected.iloc[:-neighborhood]).all()
+    assert values.iloc[:neighborhood].isna().all()
@@ -0,0 +1,129 @@
+import random
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from src.models.candle import Candle
+from src.models.order import Order
+from src.models.order_book import OrderBook
+from src.models.token import Pair, Token
+from src.services.matching_engine import MatchingEngine
+from src.utils import enums
+from src.utils.exception_utils import InvalidOrderPriceException
+
+BUY, SELL = enums.OrderDirectionEnum.BUY, enums.OrderDirectionEnum.SELL
+DT = datetime(2020, 1, 1)
+
+
+@pytest.fixture
+def pair() -> Pair:
+    return Pair(Token(name="Bitcoin", symbol="BTC", min_size="0.00000001"),
+                Token(name="US Dollar", symbol="USD", min_size="0.01"))
+
+
+@pytest.fixture
+def book() -> OrderBook:
+    return OrderBook()
+
+
+def add(engine, book, pair, direction, order_type, price, price2=None) -> Order:
+    order = Order(pair=pair, direction=direction, order_type=order_type, qty="1", price=price, price2=price2,
+                  status=enums.OrderStatusEnum.OPEN)
+    book.add(order)
+    engine.add(order)
+    return order
+
+
+def fill_prices(fills) -> dict:
+    return {o.order_id: Decimal(str(p)) for o, p in fills}
+
+
+def test_limit_and_stop_orders(pair, book):
+    engine = MatchingEngine(enums.IntrabarPathEnum.OHLC)
+    buy_limit = add(engine, book, pair, BUY, enums.OrderTypeEnum.LIMIT, "95")
+    buy_far = add(engine, book, pair, BUY, enums.OrderTypeEnum.LIMIT, "80")
+    sell_limit = add(engine, book, pair, SELL, enums.OrderTypeEnum.LIMIT, "108")
+    sell_stop = add(engine, book, pair, SELL, enums.OrderTypeEnum.STOP_LOSS, "92")
+    buy_stop = add(engine, book, pair, BUY, enums.OrderTypeEnum.STOP_LOSS, "120")
+    sell_tp = add(engine, book, pair, SELL, enums.OrderTypeEnum.TAKE_PROFIT, "105")
+
+    fills = engine.match(pair, Candle(DT, 100, 110, 90, 100), book)
+
+    # open -> high -> low: the sells above the open fill first
+    assert [o.order_id for o, _ in fills] == [sell_tp.order_id, sell_limit.order_id,
+                                              buy_limit.order_id, sell_stop.order_id]
+    assert fill_prices(fills)[buy_limit.order_id] == Decimal("95")
+    assert len(engine) == 2
+    assert engine.match(pair, Candle(DT, 100, 110, 90, 100), book) == []
+    assert {buy_far.order_id, buy_stop.order_id} == set(engine.versions)
+
+
+def test_gap_fills_at_open(pair, book):
+    engine = MatchingEngine()
+    buy_limit = add(engine, book, pair, BUY, enums.OrderTypeEnum.LIMIT, "95")
+    sell_stop = add(engine, book, pair, SELL, enums.OrderTypeEnum.STOP_LOSS, "92")
+
+    fills = fill_prices(engine.match(pair, Candle(DT, 85, 88, 84, 86), book))
+
+    assert fills == {buy_limit.order_id: Decimal("85"), sell_stop.order_id: Decimal("85")}
+
+
+@pytest.mark.parametrize("path, expected", [
+    (enums.IntrabarPathEnum.OHLC, "110"),
+    (enums.IntrabarPathEnum.OLHC, "90"),
+    (enums.IntrabarPathEnum.NEAREST, "90"),
+])
+def test_bracket_first_leg_wins(pair, book, path, expected):
+    engine = MatchingEngine(path)
+    bracket = add(engine, book, pair, SELL, enums.OrderTypeEnum.TAKE_PROFIT_STOP_LOSS_LIMIT, "110", "90")
+
+    fills = engine.match(pair, Candle(DT, 98, 112, 88, 100), book)
+
+    assert fill_prices(fills) == {bracket.order_id: Decimal(expected)}
+    assert engine.match(pair, Candle(DT, 98, 112, 88, 100), book) == []
+
+
+def test_stop_limit_rests_after_trigger(pair, book):
+    engine = MatchingEngine(enums.IntrabarPathEnum.OLHC)
+    # stop at 95, then sell no lower than 97: the price only comes back above 97 in the next bar
+    order = add(engine, book, pair, SELL, enums.OrderTypeEnum.STOP_LOSS_LIMIT, "95", "97")
+
+    assert engine.match(pair, Candle(DT, 100, 96, 90, 93), book) == []
+    assert engine.match(pair, Candle(DT, 100, 96, 90, 93), book) == []
+    assert engine.match(pair, Candle(datetime(2020, 1, 1, 1), 93, 96, 92, 95), book) == []
+
+    fills = engine.match(pair, Candle(datetime(2020, 1, 1, 2), 95, 98, 94, 97), book)
+    assert fill_prices(fills) == {order.order_id: Decimal("97")}
+
+
+def test_marketable_stop_limit_fills_at_trigger(pair, book):
+    engine = MatchingEngine(enums.IntrabarPathEnum.OHLC)
+    order = add(engine, book, pair, BUY, enums.OrderTypeEnum.STOP_LOSS_LIMIT, "105", "106")
+
+    assert fill_prices(engine.match(pair, Candle(DT, 100, 110, 99, 101), book)) == {order.order_id: Decimal("105")}
+
+
+def test_missing_price2(pair, book):
+    with pytest.raises(InvalidOrderPriceException):
+        add(MatchingEngine(), book, pair, SELL, enums.OrderTypeEnum.STOP_LOSS_LIMIT, "95")
+
+
+def test_many_resting_orders(pair, book):
+    engine = MatchingEngine(enums.IntrabarPathEnum.OHLC)
+    rnd = random.Random(0)
+    orders = [add(engine, book, pair, rnd.choice([BUY, SELL]), enums.OrderTypeEnum.LIMIT, str(rnd.randint(50, 150)))
+              for _ in range(5000)]
+    candles = [Candle(DT, 100 + i, 100 + i + 3, 100 + i - 3, 100 + i) for i in range(-40, 40)]
+
+    filled = {}
+    for candle in candles:
+        filled.update(fill_prices(engine.match(pair, candle, book)))
+
+    expected = set()
+    for order in orders:
+        if order.direction == BUY and any(c.low <= order.price for c in candles):
+            expected.add(order.order_id)
+        if order.direction == SELL and any(c.high >= order.price for c in candles):
+            expected.add(order.order_id)
+    assert set(filled) == expected
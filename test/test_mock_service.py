@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import settings
+from src.markets.mock_market import MockMarket
+from src.models.order import Order
+from src.utils import enums
+from src.utils.exception_utils import NotEnoughMoneyException
+
+
+@pytest.fixture(autouse=True)
+def ohlc_prices(pair_btcusd, register_prices) -> pd.DataFrame:
+    # a ramp from 8000 to 9000, the fills below are computed by hand on it
+    dates = pd.date_range(datetime(2020, 1, 1), datetime(2020, 1, 3), freq="h", name="Date")
+    close = np.linspace(8000, 9000, len(dates))
+    df = pd.DataFrame({"Open": close, "High": close + 50, "Low": close - 50, "Close": close}, index=dates)
+    return register_prices(pair_btcusd, df)
+
+
+@pytest.fixture
+def market() -> MockMarket:
+    return MockMarket({"BTC": "1", "USD": "100000"})
+
+
+def new_order(pair, direction, order_type=enums.OrderTypeEnum.MARKET, qty="0.01", price=None) -> Order:
+    return Order(pair=pair, direction=direction, order_type=order_type, qty=qty, price=price)
+
+
+def test_order_ids_are_unique(market, pair_btcusd):
+    dt = datetime(2020, 1, 1, 1)
+    orders = [market.add_order(execution_date=dt, order=new_order(pair_btcusd, enums.OrderDirectionEnum.BUY))
+              for _ in range(3)]
+
+    assert len({o.order_id for o in orders}) == 3
+    assert market.get_orders_info(execution_date=dt, order_ids=[orders[1].order_id, "missing"]) == [orders[1]]
+    assert all(o.status == enums.OrderStatusEnum.CLOSED for o in orders)
+    assert market.get_open_orders(execution_date=dt) == []
+
+
+def test_limit_orders_are_archived_when_filled(market, pair_btcusd):
+    dt = datetime(2020, 1, 1, 1)
+    buy = market.add_order(execution_date=dt, order=new_order(
+        pair_btcusd, enums.OrderDirectionEnum.BUY, enums.OrderTypeEnum.LIMIT, price="7900"))
+    sell = market.add_order(execution_date=dt, order=new_order(
+        pair_btcusd, enums.OrderDirectionEnum.SELL, enums.OrderTypeEnum.LIMIT, price="8200"))
+    book = market.connector.service.orders
+
+    assert market.get_open_orders(execution_date=dt) == [buy, sell]
+    assert book.get_open_orders(direction=enums.OrderDirectionEnum.SELL) == [sell]
+
+    # high reaches 8200 at 08:00
+    fill_dt = dt + timedelta(hours=7)
+    balance = market.get_account_balance(execution_date=fill_dt)
+
+    assert sell.status == enums.OrderStatusEnum.CLOSED
+    assert book.archive == {sell.order_id: sell}
+    assert market.get_open_orders(execution_date=fill_dt) == [buy]
+    assert market.get_orders_info(execution_date=fill_dt, order_ids=[sell.order_id]) == [sell]
+    # 100000 - 79 (buy reserved) + 82 * (1 - 0.24%)
+    assert balance.get_token_amount_by_symbol("USD").amount == Decimal("100002.80")
+
+
+def test_resting_buy_refunds_reserved_quote(market, pair_btcusd):
+    dt = datetime(2020, 1, 1, 1)
+    # marketable limit: fills at the 01:00 open (8020.83) instead of 8100
+    limit = market.add_order(execution_date=dt, order=new_order(
+        pair_btcusd, enums.OrderDirectionEnum.BUY, enums.OrderTypeEnum.LIMIT, price="8100"))
+    stop = market.add_order(execution_date=dt, order=new_order(
+        pair_btcusd, enums.OrderDirectionEnum.BUY, enums.OrderTypeEnum.STOP_LOSS, price="8200"))
+    balance = market.get_account_balance(execution_date=dt)
+
+    assert limit.status == enums.OrderStatusEnum.CLOSED
+    assert limit.info.cost == Decimal("80.21")
+    assert stop.status == enums.OrderStatusEnum.OPEN
+    assert balance.get_token_amount_by_symbol("USD").amount == Decimal("100000") - Decimal("80.21") - Decimal("82")
+
+    market.get_account_balance(execution_date=dt + timedelta(hours=7))
+    assert stop.status == enums.OrderStatusEnum.CLOSED
+    assert stop.info.exec_price == Decimal("8200")
+
+
+def new_batch(pair) -> list:
+    return [new_order(pair, enums.OrderDirectionEnum.BUY, qty="0.01"),
+            new_order(pair, enums.OrderDirectionEnum.SELL, qty="0.02"),
+            Order(pair=pair, direction=enums.OrderDirectionEnum.BUY, order_type=enums.OrderTypeEnum.MARKET, qty="500",
+                  qty_unit_type=enums.QtyUnitTypeEnum.QUOTE),
+            Order(pair=pair, direction=enums.OrderDirectionEnum.HODL)]
+
+
+def test_add_orders_matches_add_order(market, pair_btcusd, monkeypatch):
+    dt = datetime(2020, 1, 1, 1)
+    sequential = MockMarket({"BTC": "1", "USD": "100000"})
+    for order in new_batch(pair_btcusd):
+        sequential.add_order(execution_date=dt, order=order)
+    lookups = []
+    get_instant_price = market.connector.get_instant_price
+    monkeypatch.setattr(market.connector, "get_instant_price", lambda **p: lookups.append(p) or get_instant_price(**p))
+    orders = new_batch(pair_btcusd)
+
+    assert market.add_orders(execution_date=dt, orders=orders) == orders
+
+    assert len(lookups) == 1
+    assert len({o.order_id for o in orders[:3]}) == 3
+    assert all(o.status == enums.OrderStatusEnum.CLOSED for o in orders[:3])
+    assert dict(market.get_account_balance(execution_date=dt)) == dict(sequential.get_account_balance(execution_date=dt))
+
+
+def test_add_orders_percentages_of_one_snapshot(market, pair_btcusd):
+    dt = datetime(2020, 1, 1, 1)
+    orders = [Order(pair=pair_btcusd, direction=enums.OrderDirectionEnum.SELL, order_type=enums.OrderTypeEnum.MARKET,
+                    qty="50", qty_type=enums.QtyTypeEnum.PERCENTAGE) for _ in range(2)]
+
+    market.add_orders(execution_date=dt, orders=orders)
+
+    assert [o.qty for o in orders] == [Decimal("0.5"), Decimal("0.5")]
+    assert market.get_account_balance(execution_date=dt).get_token_amount_by_symbol("BTC").amount == Decimal("0")
+
+
+def test_add_orders_all_or_nothing(market, pair_btcusd, monkeypatch):
+    monkeypatch.setattr(settings, "NEGATIVE_BALANCE_AMOUNT", False)
+    dt = datetime(2020, 1, 1, 1)
+    orders = [new_order(pair_btcusd, enums.OrderDirectionEnum.BUY, enums.OrderTypeEnum.LIMIT, qty="5", price="7900"),
+              new_order(pair_btcusd, enums.OrderDirectionEnum.SELL, qty="1.5")]
+
+    with pytest.raises(NotEnoughMoneyException):
+        market.add_orders(execution_date=dt, orders=orders)
+
+    assert market.get_open_orders(execution_date=dt) == []
+    balance = market.connector.get_account_balance(execution_date=dt)
+    assert balance.get_token_amount_by_symbol("BTC").amount == Decimal("1")
+    assert balance.get_token_amount_by_symbol("USD").amount == Decimal("100000")
+
+    # the sale of the first order pays for the second one
+    orders = [new_order(pair_btcusd, enums.OrderDirectionEnum.SELL, qty="1"),
+              new_order(pair_btcusd, enums.OrderDirectionEnum.BUY, enums.OrderTypeEnum.LIMIT, qty="13", price="7900")]
+    market.add_orders(execution_date=dt, orders=orders)
+    assert market.get_open_orders(execution_date=dt) == [orders[1]]
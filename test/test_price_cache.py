@@ -0,0 +1,122 @@
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.token import Pair, Token
+from src.utils import enums, price_utils
+from src.utils.price_cache import PriceCache, merge_intervals
+
+ONE_HOURS = enums.TimeseriesPeriodEnum.ONE_HOURS
+
+
+@pytest.fixture
+def pair() -> Pair:
+    return Pair(Token(name="Bitcoin", symbol="BTC", min_size="0.00000001"),
+                Token(name="US Dollar", symbol="USD", min_size="0.01"))
+
+
+class StubLambda:
+    """
+    The remote price service: hourly candles as JSON records with string dates
+    """
+
+    def __init__(self, start: datetime = datetime(2020, 1, 1), periods: int = 24 * 30):
+        dates = pd.date_range(start, periods=periods, freq="h")
+        close = np.arange(len(dates), dtype=float)
+        self.prices = pd.DataFrame({"date": dates, "open": close, "high": close + 1, "low": close - 1, "close": close})
+        self.calls = []
+        self.fail = False
+        self.lock = threading.Lock()
+
+    def __call__(self, pair, period, from_dt, to_dt):
+        with self.lock:
+            self.calls.append((from_dt, to_dt))
+        if self.fail:
+            return None
+        df = self.prices
+        df = df[(df["date"] >= (from_dt or datetime.min)) & (df["date"] <= (to_dt or datetime.max))]
+        return pd.DataFrame(df.assign(date=df["date"].astype(str)).to_dict("records"))
+
+
+@pytest.fixture
+def stub() -> StubLambda:
+    return StubLambda()
+
+
+@pytest.fixture
+def cache(tmp_path, stub) -> PriceCache:
+    return PriceCache(stub, store_dir=str(tmp_path), chunk_bars=10, max_workers=4)
+
+
+def expected(stub, from_dt, to_dt) -> pd.DataFrame:
+    df = stub.prices
+    return df[(df["date"] >= from_dt) & (df["date"] <= to_dt)].reset_index(drop=True)
+
+
+def test_merge_intervals():
+    assert merge_intervals([[5, 8], [0, 2], [2, 4], [7, 9]]) == [[0, 4], [5, 9]]
+
+
+def test_fetch_in_chunks_then_cached(pair, cache, stub):
+    from_dt, to_dt = datetime(2020, 1, 2), datetime(2020, 1, 3, 10)
+
+    df = cache.get_prices(pair, ONE_HOURS, from_dt, to_dt)
+
+    pd.testing.assert_frame_equal(df, expected(stub, from_dt, to_dt))
+    assert len(stub.calls) == 4  # 35 bars
+    assert sorted(stub.calls)[0] == (from_dt, datetime(2020, 1, 2, 9))
+    stub.calls.clear()
+    pd.testing.assert_frame_equal(cache.get_prices(pair, ONE_HOURS, from_dt, to_dt), df)
+    pd.testing.assert_frame_equal(cache.get_prices(pair, ONE_HOURS, datetime(2020, 1, 2, 5), datetime(2020, 1, 2, 7)),
+                                  expected(stub, datetime(2020, 1, 2, 5), datetime(2020, 1, 2, 7)))
+    assert stub.calls == []
+
+
+def test_fetch_missing_intervals_only(pair, cache, stub):
+    cache.get_prices(pair, ONE_HOURS, datetime(2020, 1, 2), datetime(2020, 1, 2, 5))
+    cache.get_prices(pair, ONE_HOURS, datetime(2020, 1, 2, 12), datetime(2020, 1, 2, 15))
+    stub.calls.clear()
+
+    df = cache.get_prices(pair, ONE_HOURS, datetime(2020, 1, 1, 22), datetime(2020, 1, 2, 17))
+
+    assert sorted(stub.calls) == [(datetime(2020, 1, 1, 22), datetime(2020, 1, 1, 23)),
+                                  (datetime(2020, 1, 2, 6), datetime(2020, 1, 2, 11)),
+                                  (datetime(2020, 1, 2, 16), datetime(2020, 1, 2, 17))]
+    pd.testing.assert_frame_equal(df, expected(stub, datetime(2020, 1, 1, 22), datetime(2020, 1, 2, 17)))
+
+
+def test_failed_fetch_is_retried(pair, cache, stub):
+    stub.fail = True
+    assert cache.get_prices(pair, ONE_HOURS, datetime(2020, 1, 2), datetime(2020, 1, 2, 3)).empty
+    stub.fail = False
+
+    df = cache.get_prices(pair, ONE_HOURS, datetime(2020, 1, 2), datetime(2020, 1, 2, 3))
+
+    assert len(stub.calls) == 2
+    assert df["close"].tolist() == [24., 25., 26., 27.]
+
+
+def test_open_bar_is_fetched_again(pair, tmp_path):
+    now = datetime.utcnow()
+    stub = StubLambda(now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=5), periods=6)
+    cache = PriceCache(stub, store_dir=str(tmp_path), chunk_bars=100)
+
+    assert len(cache.get_prices(pair, ONE_HOURS, now - timedelta(hours=6))) == 6
+    stub.calls.clear()
+    cache.get_prices(pair, ONE_HOURS, now - timedelta(hours=6))
+
+    assert len(stub.calls) == 1 and stub.calls[0][0] == stub.prices["date"].iloc[-1]
+
+
+def test_unbounded_range_is_not_cached(pair, cache, stub):
+    assert len(cache.get_prices(pair, ONE_HOURS)) == len(stub.prices)
+    assert stub.calls == [(None, None)]
+
+
+def test_get_prices_controller(pair, cache, stub):
+    df = price_utils.get_prices_controller(pair, ONE_HOURS, datetime(2020, 1, 2), datetime(2020, 1, 2, 3), cache=cache)
+
+    assert df["close"].tolist() == [24., 25., 26., 27.]
@@ -0,0 +1,109 @@
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import settings
+from src.utils import price_ingestion, price_store
+
+T0 = int(datetime(2020, 1, 1).timestamp() - datetime(1970, 1, 1).timestamp())
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch) -> str:
+    monkeypatch.setattr(settings, "PRICE_STORE_DIR", str(tmp_path / "price_store"))
+    return settings.PRICE_STORE_DIR
+
+
+def write_json_dump(path, hours, gaps=()) -> str:
+    records = [{"t": T0 + h * 3600, "o": {} if h in gaps else {"o": h - 1., "h": h + 2., "l": h - 2., "c": float(h)}}
+               for h in hours]
+    with open(path, "w") as json_file:
+        json.dump(records, json_file, indent=1)
+    return str(path)
+
+
+def write_csv_dump(path, hours) -> str:
+    dates = pd.to_datetime([T0 + h * 3600 for h in hours], unit="s").tz_localize("UTC").tz_convert("Europe/Rome")
+    pd.DataFrame({"Date": dates.astype(str), "Open": 1000., "High": 1002., "Low": 998., "Close": 1001.}) \
+        .to_csv(path, index=False)
+    return str(path)
+
+
+def test_json_records_split_across_reads(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_ingestion, "READ_SIZE", 7)
+    path = write_json_dump(tmp_path / "dump.json", range(10))
+
+    chunks = list(price_ingestion.iter_json_records(path, chunk_size=4))
+
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert [r["t"] for c in chunks for r in c] == [T0 + h * 3600 for h in range(10)]
+
+
+def test_json_chunks(tmp_path):
+    path = write_json_dump(tmp_path / "dump.json", range(5), gaps={2})
+
+    df = pd.concat(price_ingestion.iter_json_chunks(path, chunk_size=2))
+
+    assert list(df.columns) == ["date", "open", "high", "low", "close"]
+    assert df["date"].iloc[0] == datetime(2020, 1, 1)
+    assert df["close"].isna().tolist() == [False, False, True, False, False]
+
+
+def test_csv_chunks_to_utc(tmp_path):
+    path = write_csv_dump(tmp_path / "dump.csv", range(3))
+
+    df = pd.concat(price_ingestion.iter_csv_chunks(path, chunk_size=2))
+
+    assert df["date"].tolist() == [datetime(2020, 1, 1, h) for h in range(3)]
+
+
+def test_ingest(tmp_path, store_dir, monkeypatch):
+    monkeypatch.setattr(price_ingestion, "READ_SIZE", 64)
+    # hour 5 is missing, hour 7 has no prices, hour 7 is in the csv
+    json_path = write_json_dump(tmp_path / "dump.json", [h for h in range(12) if h != 5], gaps={7})
+    csv_path = write_csv_dump(tmp_path / "dump.csv", [5, 7, 40])
+
+    counts = price_ingestion.ingest("BTCUSD", price_ingestion.iter_json_chunks(json_path, chunk_size=3),
+                                    price_ingestion.iter_csv_chunks(csv_path), start_date=datetime(2020, 1, 1, 2))
+
+    assert counts == {"appended": 10, "filled": 2}
+    series = price_store.read_series("BTCUSD")
+    assert series.step == 3600
+    assert series.date[0] == T0 + 2 * 3600 and series.date[-1] == T0 + 11 * 3600
+    assert np.array_equal(series.close, [2., 3., 4., 1001., 6., 1001., 8., 9., 10., 11.])
+
+
+def test_ingest_appends_new_candles_only(tmp_path, store_dir):
+    price_ingestion.ingest("BTCUSD", price_ingestion.iter_json_chunks(write_json_dump(tmp_path / "a.json", range(6))))
+    before = price_store.read_series("BTCUSD")
+    assert isinstance(before.close, np.memmap)
+
+    # overlapping dump with a hole after the stored end
+    path = write_json_dump(tmp_path / "b.json", [3, 4, 5, 6, 9])
+    counts = price_ingestion.ingest("BTCUSD", price_ingestion.iter_json_chunks(path))
+
+    assert counts == {"appended": 4, "filled": 0}
+    series = price_store.read_series("BTCUSD")
+    assert series.step == 3600
+    assert len(series) == 10 and price_store.read_index("BTCUSD")["length"] == 10
+    assert np.array_equal(series.close[:7], np.arange(7.))
+    assert np.isnan(series.close[7:9]).all() and series.close[9] == 9.
+    # the header grew in place, the file is still a plain .npy
+    assert np.load(f"{price_store.get_series_dir('BTCUSD')}/close.npy").shape == (10,)
+    assert price_ingestion.ingest("BTCUSD", price_ingestion.iter_json_chunks(path)) == {"appended": 0, "filled": 0}
+
+
+def test_append_series_irregular(store_dir):
+    dates = pd.to_datetime([T0, T0 + 3600, T0 + 7200], unit="s")
+    df = pd.DataFrame({"date": dates, "open": 1., "high": 1., "low": 1., "close": [1., 2., 3.]})
+    price_store.write_series("BTCUSD", df)
+
+    appended = price_store.append_series("BTCUSD", df.assign(date=dates + pd.Timedelta(minutes=150)))
+
+    assert appended == 3
+    series = price_store.read_series("BTCUSD")
+    assert series.step is None
+    assert np.array_equal(series.close, [1., 2., 3., 1., 2., 3.])
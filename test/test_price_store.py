@@ -0,0 +1,135 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import settings
+from src.models.token import Pair, Token
+from src.utils import enums, price_store, price_utils
+from src.utils.exception_utils import MissingPriceException
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch) -> str:
+    monkeypatch.setattr(settings, "PRICE_STORE_DIR", str(tmp_path / "price_store"))
+    monkeypatch.setattr(settings, "RESOURCES_DIR", str(tmp_path))
+    monkeypatch.setattr(price_utils, "_OHLC_PRICES", {})
+    return settings.PRICE_STORE_DIR
+
+
+@pytest.fixture
+def raw_prices() -> pd.DataFrame:
+    dates = pd.date_range(datetime(2020, 1, 1), periods=48, freq="h")
+    close = np.linspace(100, 200, len(dates))
+    return pd.DataFrame({"date": dates, "open": close - 1, "high": close + 2, "low": close - 2, "close": close,
+                         "volume": 1.})
+
+
+def test_write_and_read_series(store_dir, raw_prices):
+    price_store.write_series("BTCUSD", raw_prices)
+    series = price_store.read_series("BTCUSD")
+    assert isinstance(series.close, np.memmap)
+    assert series.date.dtype == np.int64 and series.close.dtype == np.float64
+    assert series.step == 3600
+    assert series.date[0] == int(datetime(2020, 1, 1).timestamp() - datetime(1970, 1, 1).timestamp())
+    assert np.array_equal(series.close, raw_prices["close"].to_numpy())
+    assert price_store.read_index("BTCUSD")["length"] == 48
+
+
+def test_to_df_does_not_copy(store_dir, raw_prices):
+    series = price_store.write_series("BTCUSD", raw_prices)
+    df = series.to_df()
+    assert list(df.columns) == ["Open", "High", "Low", "Close"]
+    assert df.index[0] == datetime(2020, 1, 1)
+    assert np.shares_memory(df["Close"].to_numpy(), series.close)
+
+
+def test_get_ohlc_prices_converts_pickle_once(store_dir, raw_prices, tmp_path):
+    raw_prices.to_pickle(tmp_path / "BTCUSD_price.pickle")
+    df = price_utils.get_ohlc_prices(from_dt=datetime(2020, 1, 1, 10), to_dt=datetime(2020, 1, 1, 20))
+    assert price_store.has_series("BTCUSD")
+    assert df.index[0] == datetime(2020, 1, 1, 10) and df.index[-1] == datetime(2020, 1, 1, 20)
+    assert price_utils.get_ohlc_prices() is price_utils.get_ohlc_prices()
+
+
+def test_get_candle_by_offset(store_dir, raw_prices):
+    series = price_store.write_series("BTCUSD", raw_prices)
+    candle = series.get_candle(datetime(2020, 1, 1, 5, 30))
+    assert series.get_offset(datetime(2020, 1, 1, 5, 30)) == 5
+    assert candle.date == datetime(2020, 1, 1, 5)
+    assert candle['Close'] == raw_prices["close"].iloc[5]
+    assert candle.mean() == raw_prices.iloc[5][["open", "high", "low", "close"]].mean()
+    with pytest.raises(MissingPriceException):
+        series.get_candle(datetime(2019, 12, 31, 23))
+    with pytest.raises(MissingPriceException):
+        series.get_candle(datetime(2020, 1, 3))
+
+
+def test_get_candle_irregular_series(store_dir, raw_prices):
+    series = price_store.write_series("BTCUSD", raw_prices.drop(index=[3, 4]))
+    assert series.step is None
+    assert series.get_candle(datetime(2020, 1, 1, 5)).close == raw_prices["close"].iloc[5]
+    with pytest.raises(MissingPriceException):
+        series.get_candle(datetime(2020, 1, 1, 4))
+
+
+def test_price_registry_is_keyed_by_pair(store_dir, raw_prices):
+    pair = price_utils.DEFAULT_PAIR
+    price_store.write_series(str(pair), raw_prices)
+    registry = price_utils.PriceRegistry()
+    registry.clear()
+    candle = registry.get_candle(Pair(pair.base, pair.quote), datetime(2020, 1, 2))
+    assert candle.close == raw_prices["close"].iloc[24]
+    assert list(registry.series) == [pair]
+    registry.clear()
+
+
+@pytest.mark.parametrize("period, rule", [
+    (enums.TimeseriesPeriodEnum.FOUR_HOURS, "4h"),
+    (enums.TimeseriesPeriodEnum.ONE_DAY, "D"),
+    (enums.TimeseriesPeriodEnum.ONE_WEEK, "W-MON"),
+    (enums.TimeseriesPeriodEnum.ONE_MONTH, "MS"),
+])
+def test_resample_series(period, rule):
+    dates = pd.date_range(datetime(2020, 1, 1, 5), datetime(2020, 4, 3), freq="h", name="date")
+    close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, len(dates)))
+    df = pd.DataFrame({"open": close + 0.5, "high": close + 2, "low": close - 2, "close": close}, index=dates)
+    df.iloc[30:40] = np.nan
+
+    res = price_store.resample_series(price_store.OhlcSeries.from_df("BTCUSD", df), period).to_df()
+
+    expected = df.resample(rule, label="left", closed="left").agg(
+        {"open": "first", "high": "max", "low": "min", "close": "last"})
+    expected.columns = ["Open", "High", "Low", "Close"]
+    pd.testing.assert_frame_equal(res, expected, check_names=False, check_freq=False, check_index_type=False)
+
+
+def test_price_registry_resampled_candles(raw_prices):
+    pair = Pair(Token(name="Bitcoin", symbol="BTC", min_size="0.00000001"),
+                Token(name="US Dollar", symbol="USD", min_size="0.01"))
+    registry = price_utils.PriceRegistry()
+    registry.register(pair, price_store.OhlcSeries.from_df(str(pair), raw_prices))
+    try:
+        candle = registry.get_candle(pair, datetime(2020, 1, 2, 13), enums.TimeseriesPeriodEnum.ONE_DAY)
+        assert candle.date == datetime(2020, 1, 2)
+        assert (candle.open, candle.close) == (raw_prices["open"].iloc[24], raw_prices["close"].iloc[47])
+        assert registry.get_series(pair, enums.TimeseriesPeriodEnum.ONE_HOURS) is registry.series[pair]
+        assert registry.get_series(pair, enums.TimeseriesPeriodEnum.ONE_DAY) is \
+            registry.get_series(pair, enums.TimeseriesPeriodEnum.ONE_DAY)
+    finally:
+        registry.clear()
+
+
+def test_write_regular_series(store_dir, raw_prices):
+    chunks = [{field: raw_prices[field].to_numpy()[i:i + 10] for field in ("open", "high", "low", "close")}
+              for i in range(0, 40, 10)]
+    start = int(datetime(2020, 1, 1).timestamp() - datetime(1970, 1, 1).timestamp())
+    series = price_store.write_regular_series("BTCUSD", start, 3600, 48, iter(chunks))
+
+    assert series.step == 3600 and len(series) == 48
+    assert price_store.read_index("BTCUSD")["end"] == start + 47 * 3600
+    assert np.array_equal(series.date, raw_prices["date"].to_numpy(dtype="datetime64[s]").astype(np.int64))
+    assert np.array_equal(series.close[:40], raw_prices["close"].to_numpy()[:40])
+    # rows past the chunks are gaps
+    assert np.isnan(series.close[40:]).all()
@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_TIME_BUDGET = float(os.getenv('IMPORT_TIME_BUDGET', "2.0"))  # seconds, cold interpreter
+LAZY_MODULES = ['boto3', 'ta', 'requests', 'tqdm', 'distutils']
+
+STARTUP_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import src.backtest_engine
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "modules": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+@pytest.fixture(scope="module")
+def startup() -> dict:
+    proc = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=ROOT_DIR, capture_output=True, text=True,
+                          check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_import_does_not_load_optional_dependencies(startup):
+    assert startup["modules"] == []
+
+
+def test_import_time_budget(startup):
+    assert startup["elapsed"] < IMPORT_TIME_BUDGET
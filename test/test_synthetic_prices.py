@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import settings
+from src.models.token import Pair, Token
+from src.utils import price_utils
+from src.utils.exception_utils import MissingPriceException
+from src.utils.synthetic_prices import PRESETS, MarketRegime, SyntheticMarket
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch) -> str:
+    monkeypatch.setattr(settings, "PRICE_STORE_DIR", str(tmp_path / "price_store"))
+    monkeypatch.setattr(price_utils, "_OHLC_PRICES", {})
+    return settings.PRICE_STORE_DIR
+
+
+@pytest.mark.parametrize("preset", list(PRESETS))
+def test_generate(preset):
+    df = SyntheticMarket(seed=1, block_bars=1000, **PRESETS[preset]).generate(5000)
+
+    assert len(df) == 5000 and list(df.columns) == ["Open", "High", "Low", "Close"]
+    assert df.index.name == "Date" and (df.index.to_series().diff().dropna() == pd.Timedelta(hours=1)).all()
+    assert (df["Open"].iloc[1:].to_numpy() == df["Close"].iloc[:-1].to_numpy()).all()
+    assert (df["High"] >= df[["Open", "Close"]].max(axis=1)).all()
+    assert (df["Low"] <= df[["Open", "Close"]].min(axis=1)).all()
+    assert (df["Low"] > 0).all()
+
+
+def test_seeded_and_prefix_of_longer_series():
+    market = SyntheticMarket(seed=7, block_bars=1000, gap_probability=1e-3, gap_length=50, nan_probability=1e-3,
+                             **PRESETS["regime_switching"])
+    df = market.generate(4321)
+
+    assert df.equals(SyntheticMarket(seed=7, block_bars=1000, gap_probability=1e-3, gap_length=50,
+                                     nan_probability=1e-3, **PRESETS["regime_switching"]).generate(4321))
+    assert df.equals(market.generate(9000).iloc[:4321])
+    assert not df.equals(SyntheticMarket(seed=8, block_bars=1000).generate(4321))
+
+
+def test_regimes_volatility():
+    calm, wild = MarketRegime(volatility=0.2), MarketRegime(volatility=2.)
+    returns = {}
+    for name, regime in (("calm", calm), ("wild", wild)):
+        close = SyntheticMarket(seed=0, regimes=[regime]).generate(20000)["Close"]
+        returns[name] = np.log(close).diff().std() * np.sqrt(24 * 365)
+    assert returns["calm"] == pytest.approx(0.2, rel=0.05)
+    assert returns["wild"] == pytest.approx(2., rel=0.05)
+
+
+def test_gaps():
+    df = SyntheticMarket(seed=3, block_bars=500, gap_probability=1e-3, gap_length=100).generate(20000)
+    missing = df["Close"].isna()
+
+    assert 0 < missing.mean() < 0.5
+    assert df[missing].isna().all(axis=None)
+    # outages are runs of bars, longer than single NaN candles on average
+    runs = (missing & ~missing.shift(fill_value=False)).sum()
+    assert missing.sum() / runs > 10
+
+
+def test_write_feeds_price_registry(store_dir):
+    pair = Pair(Token(name="Synthetic", symbol="SYN", min_size="0.00000001"),
+                Token(name="US Dollar", symbol="USD", min_size="0.01"))
+    market = SyntheticMarket(start=datetime(2021, 1, 1), seed=2, block_bars=1000, nan_probability=0.01)
+    series = market.write(str(pair), 3000)
+
+    assert series.step == 3600 and len(series) == 3000
+    df = price_utils.get_ohlc_prices(pair)
+    assert df.equals(market.generate(3000))
+    registry = price_utils.PriceRegistry()
+    try:
+        first_nan = df.index[df["Close"].isna()][0].to_pydatetime()
+        with pytest.raises(MissingPriceException):
+            registry.get_candle(pair, first_nan)
+        assert registry.get_candle(pair, datetime(2021, 1, 1)).open == df["Open"].iloc[0]
+    finally:
+        registry.clear()
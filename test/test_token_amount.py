@@ -160,3 +160,20 @@ def test_token_amount_div_price(token_usd, token_btc):
     price = PairSpotPrice(pair=pair, price=300)
     res = token_amount / price  # USD / (USD/BTC) = BTC
     assert TokenAmount(token_btc, Decimal("3.33333333")) == res
+
+
+def test_token_amount_units(token_usd, token_btc):
+    token_amount = TokenAmount(token_usd, "12.345")  # half even
+    assert 1234 == token_amount.units
+    assert TokenAmount.from_units(token_usd, 1234) == token_amount
+    assert not hasattr(token_amount, "__dict__")
+    token_amount.units += 1
+    assert Decimal("12.35") == token_amount.amount
+    assert 10 ** 8 == TokenAmount(token_btc, 1).units
+
+
+def test_token_amount_set_amount(token_usd):
+    token_amount = TokenAmount(token_usd, 10)
+    token_amount.amount += Decimal("0.004")
+    assert Decimal("10.00") == token_amount.amount
+    assert token_amount.amount.as_tuple().exponent == -2
@@ -1,5 +1,10 @@
+import json
+from decimal import Decimal
+
 import pytest
+import requests
 
+from src import settings
 from src.models.token import Token
 from src.utils import token_utils
 from src.utils.exception_utils import UnknownTokenException
@@ -20,3 +25,56 @@ def test_pair_factory():
     factory = token_utils.PairFactory()
     pair = factory.get_pair_by_name(base_name="BTC", quote_name="USD")
     assert pair.base.name == 'Bitcoin' and pair.quote.name == 'United States Dollar'
+
+
+def test_get_token_info_is_interned():
+    assert token_utils.get_token_info("BTC") is token_utils.get_token_info("btc")
+
+
+@pytest.fixture
+def token_catalog_file(tmp_path, monkeypatch) -> str:
+    monkeypatch.setattr(settings, "TOKEN_CATALOG_FILE", str(tmp_path / "token_catalog.json"))
+    token_utils.TokenCatalog().clear()
+    yield settings.TOKEN_CATALOG_FILE
+    token_utils.TokenCatalog().clear()
+
+
+def test_refresh_token_catalog(token_catalog_file, monkeypatch):
+    class Response:
+        status_code = 200
+
+        def json(self):
+            return {"id": "DOGE", "name": "Dogecoin", "min_size": "0.1"}
+
+    monkeypatch.setattr(requests, "get", lambda url: Response())
+    with pytest.raises(UnknownTokenException):
+        token_utils.get_token_info("DOGE")
+    assert token_utils.refresh_token_catalog(["DOGE"]) == 1
+    token_utils.TokenCatalog().clear()
+    assert token_utils.get_token_info("DOGE").name == "Dogecoin"
+    with open(token_catalog_file) as catalog_file:
+        assert "DOGE" in json.load(catalog_file)
+
+
+def test_token_catalog_precedence(token_catalog_file, tmp_path, monkeypatch):
+    snapshot_file, kraken_file = tmp_path / "snapshot.json", tmp_path / "kraken_assets.json"
+    snapshot_file.write_text(json.dumps({
+        "BTC": {"name": "Bitcoin", "symbol": "BTC", "min_size": "0.00000001"},
+        "ETH": {"name": "Ethereum", "symbol": "ETH", "min_size": "0.00000001"},
+    }))
+    kraken_file.write_text(json.dumps({"result": {
+        "XXBT": {"altname": "XBT", "decimals": 10},
+        "XETH": {"altname": "ETH", "decimals": 10},
+        "XXDG": {"altname": "XDG", "decimals": 8},
+    }}))
+    with open(token_catalog_file, "w") as catalog_file:
+        json.dump({"ETH": {"name": "Ether", "symbol": "ETH", "min_size": "0.0001"}}, catalog_file)
+    monkeypatch.setattr(settings, "TOKEN_CATALOG_SNAPSHOT_FILE", str(snapshot_file))
+    monkeypatch.setattr(settings, "KRAKEN_TOKEN_INFO_FILE", str(kraken_file))
+
+    btc, eth, doge = (token_utils.get_token_info(symbol) for symbol in ("BTC", "ETH", "DOGE"))
+
+    # kraken min sizes override the snapshot, names are kept
+    assert (btc.name, btc.min_size) == ("Bitcoin", Decimal("1E-10"))
+    assert (eth.name, eth.min_size) == ("Ether", Decimal("0.0001"))
+    assert (doge.name, doge.min_size) == ("DOGE", Decimal("1E-8"))
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.models.token import Pair, PairSpotPrice, Token, TokenAmount
+from src.models.user import AccountBalance
+from src.services.valuation_service import PortfolioValuation
+
+USD = Token(name="US Dollar", symbol="USD", min_size="0.01")
+BTC = Token(name="Bitcoin", symbol="BTC", min_size="0.00000001")
+ETH = Token(name="Ether", symbol="ETH", min_size="0.000001")
+SOL = Token(name="Solana", symbol="SOL", min_size="0.0001")
+DT = datetime(2020, 1, 1)
+
+
+class Prices:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, pair: Pair, execution_date: datetime) -> PairSpotPrice:
+        self.calls.append((pair.base.symbol, execution_date))
+        hours = (execution_date - DT) // timedelta(hours=1)
+        return PairSpotPrice(pair=pair, price={"BTC": 8000 + hours, "ETH": 150 + hours / 3, "SOL": 1}[pair.base.symbol])
+
+
+def naive_value(balance: AccountBalance, prices: Prices, execution_date: datetime) -> Decimal:
+    total = Decimal("0")
+    for token_amount in balance.balance:
+        price = Decimal("1") if token_amount.token == USD else prices(Pair(token_amount.token, USD), execution_date)
+        total += (token_amount * price).amount
+    return total
+
+
+def test_equity_matches_full_revaluation():
+    balance = AccountBalance([TokenAmount(USD, "1000"), TokenAmount(BTC, "0.5"), TokenAmount(ETH, "3.333333")])
+    valuation = PortfolioValuation(Prices(), USD)
+
+    for hour in range(48):
+        dt = DT + timedelta(hours=hour)
+        if hour % 5 == 0:
+            balance.balance[1].amount += Decimal("0.01")
+            balance.balance[0].amount -= Decimal("80.17")
+        assert valuation.update(balance, dt) == naive_value(balance, Prices(), dt)
+        assert valuation.equity == naive_value(balance, Prices(), dt)
+
+
+def test_one_mark_per_pair_and_bar():
+    prices = Prices()
+    balance = AccountBalance([TokenAmount(USD, "1000"), TokenAmount(BTC, "0.5"), TokenAmount(SOL, "0")])
+    valuation = PortfolioValuation(prices, USD)
+
+    valuation.update(balance, DT)
+    valuation.update(balance, DT)
+    balance.balance[1].amount = Decimal("0.7")
+    assert valuation.update(balance, DT) == Decimal("1000") + Decimal("0.7") * 8000
+
+    # nothing held, no price lookup
+    assert prices.calls == [("BTC", DT)]
+    valuation.update(balance, DT + timedelta(hours=1))
+    assert prices.calls == [("BTC", DT), ("BTC", DT + timedelta(hours=1))]
+
+
+def test_unchanged_positions_are_not_revalued():
+    balance = AccountBalance([TokenAmount(USD, "1000"), TokenAmount(SOL, "10")])
+    valuation = PortfolioValuation(Prices(), USD)
+    valuation.update(balance, DT)
+    positions = dict(valuation.positions)
+
+    valuation.update(balance, DT + timedelta(hours=1))
+
+    assert valuation.positions["SOL"] is positions["SOL"]
+    assert valuation.equity == Decimal("1010")
+
+
+def test_tokens_missing_from_balance():
+    valuation = PortfolioValuation(Prices(), USD)
+    assert valuation.update(AccountBalance([TokenAmount(USD, "1000"), TokenAmount(BTC, "1")]), DT) == \
+        Decimal("9000.00")
+
+    # all the BTC sold, the balance leaves the token out
+    assert valuation.update(AccountBalance([TokenAmount(USD, "9000")]), DT) == Decimal("9000.00")
+    assert list(valuation.positions) == ["USD"]
+
+
+def test_shared_marks():
+    prices, marks = Prices(), {}
+    balance = AccountBalance([TokenAmount(USD, "1000"), TokenAmount(BTC, "1")])
+    first, second = PortfolioValuation(prices, USD, marks), PortfolioValuation(prices, USD, marks)
+    in_eth = PortfolioValuation(prices, ETH, marks)
+
+    assert first.update(balance, DT) == second.update(balance, DT)
+    in_eth.update(AccountBalance([TokenAmount(BTC, "1")]), DT)
+
+    # one lookup per pair and bar, whatever the currency of the account
+    assert len(prices.calls) == 2
+    assert set(marks) == {Pair(BTC, USD), Pair(BTC, ETH)}